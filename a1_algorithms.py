@@ -13,10 +13,19 @@ As with other files, you may not change any of the public behaviour (attributes,
 methods) given in the starter code, but you can definitely add new attributes
 and methods to complete your work here.
 """
+import bisect
+import collections
 import csv
-from python_ta.contracts import check_contracts
+import gzip
+import itertools
+from typing import IO, Any, Collection, Iterator, Optional
+from a1_contracts import check_contracts
 
-from a1_entities import Person, Elevator
+from a1_entities import Person, PersonPool, Elevator, OccupiedFloors
+
+# The number of trips from the bottom floor to the top and back that somebody can
+# wait before CollectiveControl answers their call ahead of nearer ones
+OVERDUE_TRIPS = 1
 
 
 ###############################################################################
@@ -29,15 +38,25 @@ class ArrivalGenerator:
     This is an abstract class, and should not be instantiated directly.
     We have started two subclasses of this class down below.
 
+    Generators that make new people on every call to generate should make them
+    with new_person, so that a simulation can recycle people through a PersonPool
+    (see Simulation). Generators that hand out people they keep, such as
+    FileArrivals, set makes_new_people to False, so their people are never recycled.
+
     Instance Attributes:
     - max_floor: The maximum floor number for the building.
         Generated people must not have a starting or target floor
         beyond this floor.
+    - pool: the pool that new_person takes people from, or None
 
     Representation Invariants:
     - self.max_floor >= 2
     """
     max_floor: int
+    pool: Optional[PersonPool]
+
+    # Whether generate makes new people on every call
+    makes_new_people = True
 
     def __init__(self, max_floor: int) -> None:
         """Initialize a new ArrivalGenerator.
@@ -46,6 +65,21 @@ class ArrivalGenerator:
         - max_floor >= 2
         """
         self.max_floor = max_floor
+        self.pool = None
+
+    def new_person(self, start: int, target: int) -> Person:
+        """Return a new person with the given start and target floor, taken from
+        self.pool if there is one.
+        """
+        if self.pool is None:
+            return Person(start, target)
+        return self.pool.acquire(start, target)
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Return the state to pickle this generator with, leaving out its pool."""
+        state = self.__dict__.copy()
+        state['pool'] = None
+        return state
 
     def generate(self, round_num: int) -> dict[int, list[Person]]:
         """Return the new arrivals for the simulation at the given round.
@@ -63,6 +97,18 @@ class ArrivalGenerator:
         """
         raise NotImplementedError
 
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round at or after round_num with any new arrivals,
+        or None if nobody arrives from round_num on.
+
+        Simulations use this to skip ahead over rounds where nothing happens.
+        By default every round might have arrivals, so this returns round_num.
+
+        Preconditions:
+        - round_num >= 0
+        """
+        return round_num
+
 
 @check_contracts
 class SingleArrivals(ArrivalGenerator):
@@ -109,7 +155,7 @@ class SingleArrivals(ArrivalGenerator):
         [Person(start=1, target=2, wait_time=0)]
         """
         target = (round_num) % (self.max_floor - 1) + 2
-        arrival = {1: [Person(1, target)]}
+        arrival = {1: [self.new_person(1, target)]}
 
         return arrival
 
@@ -125,8 +171,17 @@ class FileArrivals(ArrivalGenerator):
     - Every key in self.arrival_data is between 1 and self.max_floor.
 
     We have provided some sample CSV files under the data/ folder.
+    The file may also be gzip-compressed.
     """
     arrival_data: dict[int, list[Person]]
+    # Private Instance Attributes:
+    # - _filename: the file the arrivals were read from
+    # - _arrival_rounds: the rounds that have at least one arrival, in increasing order
+    _filename: str
+    _arrival_rounds: list[int]
+
+    # generate hands out the people in arrival_data
+    makes_new_people = False
 
     def __init__(self, max_floor: int, filename: str) -> None:
         """Initialize a new FileArrivals algorithm from the given file.
@@ -140,8 +195,9 @@ class FileArrivals(ArrivalGenerator):
         # We've provided some of the "reading from csv files" boilerplate code
         # for you to help you get started.
         self.arrival_data = {}
+        self._filename = filename
 
-        with open(filename) as csvfile:
+        with _open_trace(filename) as csvfile:
             reader = csv.reader(csvfile)
             for line in reader:
                 round_num = int(line.pop(0))
@@ -151,6 +207,12 @@ class FileArrivals(ArrivalGenerator):
                     self.arrival_data[round_num].append(Person(int(line[i]), int(line[i + 1])))
                     i += 2
 
+        self._arrival_rounds = sorted(r for r in self.arrival_data if self.arrival_data[r])
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        """Pickle this generator as the arguments needed to read its file again."""
+        return FileArrivals, (self.max_floor, self._filename)
+
     def generate(self, round_num: int) -> dict[int, list[Person]]:
         """Return the new arrivals for the simulation at the given round.
 
@@ -185,6 +247,200 @@ class FileArrivals(ArrivalGenerator):
 
         return generated
 
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round at or after round_num with any new arrivals,
+        or None if nobody arrives from round_num on.
+
+        Preconditions:
+        - round_num >= 0
+        """
+        i = bisect.bisect_left(self._arrival_rounds, round_num)
+        if i == len(self._arrival_rounds):
+            return None
+        return self._arrival_rounds[i]
+
+
+@check_contracts
+class StreamingFileArrivals(ArrivalGenerator):
+    """Generate arrivals from a CSV file (possibly gzip-compressed) without loading
+    it into memory.
+
+    The file has the same format as for FileArrivals, and if a round appears on
+    more than one row, its last row wins, just like in FileArrivals. People are only
+    created when their round is generated.
+
+    The file is read one row ahead of the rounds being generated, starting over
+    from the top if an earlier round is generated again. If a row turns out to be
+    out of order, each round's row is found from then on through an index of byte
+    offsets into the file, which is built by reading the file once (rounds that were
+    generated before then only saw the rows before the first one out of order).
+    Seeking inside a gzip-compressed file is slow, so the rows of those must be
+    sorted by round.
+    """
+    # Private Instance Attributes:
+    # - _filename: the trace file
+    # - _file: the open trace file, read in binary mode
+    # - _sorted_rounds: True if the rows must be sorted by round, False if they
+    #     aren't (so _index is used), or None if that isn't known yet
+    # - _rows: the rounds read from _file in order, with the people in their last row
+    # - _head: the next round from _rows, or None if _file has been read to the end
+    # - _index: the byte offset of the last row of each round, if one has been built
+    # - _arrival_rounds: the rounds in _index with at least one arrival, in increasing order
+    # - _last_round: the latest round generated since _file was last read from the
+    #     top, or -1
+    _filename: str
+    _file: IO[bytes]
+    _sorted_rounds: Optional[bool]
+    _rows: Iterator[tuple[int, list[int]]]
+    _head: Optional[tuple[int, list[int]]]
+    _index: Optional[dict[int, int]]
+    _arrival_rounds: list[int]
+    _last_round: int
+
+    def __init__(self, max_floor: int, filename: str,
+                 sorted_rounds: Optional[bool] = None) -> None:
+        """Initialize a new StreamingFileArrivals algorithm from the given file.
+
+        sorted_rounds says whether the rows are sorted by round. If it is None, the
+        file is streamed until a row turns up out of order. If it is True but the
+        rows are not sorted, generate raises ValueError when it reaches the first
+        row out of order. If it is False, the offset index is built right away.
+
+        Raise ValueError if the file is gzip-compressed and its rows are not sorted.
+
+        Preconditions:
+        - <filename> refers to a valid CSV file, following the specified
+          format and restrictions from the assignment handout.
+        """
+        ArrivalGenerator.__init__(self, max_floor)
+        self._filename = filename
+        self._file = _open_trace(filename, 'rb')
+        self._sorted_rounds = sorted_rounds
+        self._index = None
+        self._arrival_rounds = []
+        self._rows = iter([])
+        self._head = None
+        try:
+            if sorted_rounds is False:
+                self._build_index()
+            self._rewind()
+        except ValueError:
+            self._file.close()
+            raise
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        """Pickle this generator as the arguments needed to open its file again and
+        get back to the latest round generated so far.
+        """
+        return _reopen_streaming_arrivals, (self.max_floor, self._filename,
+                                            self._sorted_rounds, self._last_round)
+
+    def close(self) -> None:
+        """Close the trace file."""
+        self._file.close()
+
+    def generate(self, round_num: int) -> dict[int, list[Person]]:
+        """Return the new arrivals for the simulation at the given round.
+
+        Order matters: if there two people with the same starting floor
+        in the returned list, the person who appears first in the list
+        is considered to have arrived at the floor first.
+
+        Note: only floors with at least one new arrival should be included
+        in the returned dictionary. In other words, there should not be
+        any empty lists in the returned dictionary.
+
+        Preconditions:
+        - round_num >= 0
+        """
+        self._skip_to(round_num)
+        self._last_round = max(self._last_round, round_num)
+
+        if self._index is not None:
+            if round_num not in self._index:
+                return {}
+            self._file.seek(self._index[round_num])
+            floors = _parse_row(self._file.readline())[1]
+        else:
+            if self._head is None or self._head[0] != round_num:
+                return {}
+            floors = self._head[1]
+
+        generated = {}
+        for i in range(0, len(floors), 2):
+            person = self.new_person(floors[i], floors[i + 1])
+            generated.setdefault(person.start, []).append(person)
+        return generated
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round at or after round_num with any new arrivals,
+        or None if nobody arrives from round_num on.
+
+        Preconditions:
+        - round_num >= 0
+        """
+        self._skip_to(round_num)
+        while self._index is None and self._head is not None and not self._head[1]:
+            self._advance()
+
+        if self._index is not None:
+            i = bisect.bisect_left(self._arrival_rounds, round_num)
+            return self._arrival_rounds[i] if i < len(self._arrival_rounds) else None
+        return None if self._head is None else self._head[0]
+
+    def _skip_to(self, round_num: int) -> None:
+        """Read past every round before round_num, starting over from the top of the
+        file if round_num is before the latest round generated.
+        """
+        if self._index is None and round_num < self._last_round:
+            self._rewind()
+        while self._index is None and self._head is not None and self._head[0] < round_num:
+            self._advance()
+
+    def _rewind(self) -> None:
+        """Start reading the file over from the top."""
+        self._last_round = -1
+        if self._index is None:
+            self._file.seek(0)
+            self._rows = _read_sorted_rows(self._file)
+            self._advance()
+
+    def _advance(self) -> None:
+        """Read the next round, switching to the offset index if it turns out to be
+        out of order and the rows weren't said to be sorted.
+        """
+        try:
+            self._head = next(self._rows, None)
+        except ValueError:
+            if self._sorted_rounds:
+                raise
+            self._sorted_rounds = False
+            self._head = None
+            self._build_index()
+
+    def _build_index(self) -> None:
+        """Index the byte offset of the last row of every round in the file.
+
+        Raise ValueError if the file is gzip-compressed.
+        """
+        if isinstance(self._file, gzip.GzipFile):
+            raise ValueError(f'the rows of {self._filename} are not sorted by round, '
+                             f'which is only supported for uncompressed traces')
+        self._file.seek(0)
+        index = {}
+        arrivals = {}
+        offset = 0
+        for line in iter(self._file.readline, b''):
+            row = _parse_row(line)
+            if row is not None:
+                index[row[0]] = offset
+                arrivals[row[0]] = bool(row[1])
+            offset += len(line)
+
+        self._index = index
+        self._arrival_rounds = sorted(r for r in arrivals if arrivals[r])
+
+
 ###############################################################################
 # Elevator moving algorithms
 ###############################################################################
@@ -203,20 +459,45 @@ class MovingAlgorithm:
     """
     def update_target_floors(self,
                              elevators: list[Elevator],
-                             waiting: dict[int, list[Person]],
+                             waiting: dict[int, Collection[Person]],
                              max_floor: int) -> None:
         """Updates elevator target floors.
 
         The parameters are:
         - elevators: a list of the system's elevators
-        - waiting: a dictionary mapping floor number to the list of people waiting on that floor
+        - waiting: a dictionary mapping floor number to the people waiting on that floor
         - max_floor: the maximum floor number in the simulation
 
+        During a simulation, each value in waiting is a FloorQueue, whose num_up and
+        num_down attributes give the number of people waiting to go up and down.
+
         Preconditions:
         - elevators, waiting, and max_floor are from the same simulation run
         """
         raise NotImplementedError
 
+    def reset(self) -> None:
+        """Forget everything this algorithm remembers about the simulation it has
+        been used in, so that it can be used in a simulation from the start.
+
+        By default, moving algorithms don't remember anything between rounds.
+        """
+
+    def idle_rounds(self, elevators: list[Elevator], max_floor: int) -> Optional[int]:
+        """Return how many rounds in a row update_target_floors would leave every
+        elevator's target floor unchanged, if nobody were waiting for or riding an
+        elevator, and each elevator moved one floor towards its target each round.
+        Return None if the target floors would never change.
+
+        Simulations use this to skip ahead over rounds where nothing happens.
+        By default this returns 0, which means no rounds can be skipped.
+
+        Preconditions:
+        - elevators and max_floor are from the same simulation run
+        - no elevator has any passengers
+        """
+        return 0
+
 
 @check_contracts
 class EndToEndLoop(MovingAlgorithm):
@@ -235,7 +516,7 @@ class EndToEndLoop(MovingAlgorithm):
 
     def update_target_floors(self,
                              elevators: list[Elevator],
-                             waiting: dict[int, list[Person]],
+                             waiting: dict[int, Collection[Person]],
                              max_floor: int) -> None:
         for ele in elevators:
             if ele.current_floor == 1:
@@ -243,6 +524,39 @@ class EndToEndLoop(MovingAlgorithm):
             if ele.current_floor == max_floor:
                 ele.target_floor = 1
 
+    def idle_rounds(self, elevators: list[Elevator], max_floor: int) -> Optional[int]:
+        """Return how many rounds in a row update_target_floors would leave every
+        elevator's target floor unchanged, if nobody were waiting for or riding an
+        elevator, and each elevator moved one floor towards its target each round.
+        Return None if the target floors would never change.
+
+        An elevator's target floor only changes when it is at the bottom or top floor,
+        so it stays the same until the elevator reaches its target if that is an end.
+
+        Preconditions:
+        - elevators and max_floor are from the same simulation run
+        - no elevator has any passengers
+
+        >>> elevators = [Elevator(1), Elevator(1)]
+        >>> EndToEndLoop().idle_rounds(elevators, 5)
+        0
+        >>> for ele in elevators:
+        ...     ele.target_floor = 5
+        >>> elevators[1].current_floor = 3
+        >>> EndToEndLoop().idle_rounds(elevators, 5)
+        2
+        """
+        rounds = None
+        for ele in elevators:
+            if ele.current_floor == 1 and ele.target_floor != max_floor \
+                    or ele.current_floor == max_floor and ele.target_floor != 1:
+                return 0
+            if ele.target_floor in (1, max_floor):
+                distance = abs(ele.target_floor - ele.current_floor)
+                if rounds is None or distance < rounds:
+                    rounds = distance
+        return rounds
+
 
 @check_contracts
 class FurthestFloor(MovingAlgorithm):
@@ -267,32 +581,399 @@ class FurthestFloor(MovingAlgorithm):
 
     def update_target_floors(self,
                              elevators: list[Elevator],
-                             waiting: dict[int, list[Person]],
+                             waiting: dict[int, Collection[Person]],
                              max_floor: int) -> None:
+        """Updates elevator target floors.
+
+        The furthest floor in either case is the lowest or the highest of the
+        candidate floors, so each elevator only needs those two. Passengers are
+        indexed by target floor (see PassengerIndex), and if waiting is a
+        WaitingFloors, the floors with people waiting are too. For any other
+        dictionary, the floors with people waiting are found once per round.
+        """
+        occupied = getattr(waiting, 'occupied', None)
+        if occupied is None:
+            occupied = OccupiedFloors()
+            for floor in waiting:
+                if waiting[floor]:
+                    occupied.add(floor)
 
         for ele in elevators:
             if len(ele.passengers) != 0:
-                max_dist = -1
-                for person in ele.passengers:
-                    target = person.target
-                    if abs(target - ele.current_floor) == max_dist:
-                        ele.target_floor = min(target, ele.target_floor)
-                    elif abs(target - ele.current_floor) > max_dist:
-                        ele.target_floor = target
-                        max_dist = abs(target - ele.current_floor)
-
-            elif len(ele.passengers) == 0 and ele.current_floor == ele.target_floor:
-                people = []
-                for key in waiting:
-                    people.extend(waiting[key])
-                # if len(people) != 0:
-                max_dist = -1
-                for person in people:
-                    if abs(person.start - ele.current_floor) == max_dist:
-                        ele.target_floor = min(person.start, ele.target_floor)
-                    elif abs(person.start - ele.current_floor) > max_dist:
-                        ele.target_floor = person.start
-                        max_dist = abs(person.start - ele.current_floor)
+                ele.target_floor = _furthest(ele.current_floor, ele.passengers.min_target(),
+                                             ele.passengers.max_target())
+
+            elif ele.current_floor == ele.target_floor and occupied:
+                ele.target_floor = _furthest(ele.current_floor, occupied.lowest(),
+                                             occupied.highest())
+
+    def idle_rounds(self, elevators: list[Elevator], max_floor: int) -> Optional[int]:
+        """Return how many rounds in a row update_target_floors would leave every
+        elevator's target floor unchanged, if nobody were waiting for or riding an
+        elevator, and each elevator moved one floor towards its target each round.
+        Return None if the target floors would never change.
+
+        With nobody waiting or riding, every target floor stays the same forever.
+
+        Preconditions:
+        - elevators and max_floor are from the same simulation run
+        - no elevator has any passengers
+        """
+        return None
+
+
+@check_contracts
+class CollectiveControl(MovingAlgorithm):
+    """A moving algorithm that sweeps each elevator up and down, answering the calls
+    going its way, like the collective control of real elevators.
+
+    A hall call is a floor and direction that somebody is waiting to go in, and a
+    car call is a floor that one of an elevator's passengers wants to go to (which
+    only counts for that elevator).
+
+    Algorithm description:
+
+    - Each elevator remembers the direction it is sweeping in. An elevator with
+      passengers keeps sweeping while it has car calls ahead of it, and otherwise
+      turns towards them (towards the nearest car call, if it was stopped and has
+      car calls on both sides).
+    - The elevators sweeping up split the up hall calls between them: each one that
+      isn't full answers the up calls above it, up to the floor of the next
+      elevator sweeping up above it, which answers the calls from there on. The
+      elevators sweeping down split the down hall calls the same way.
+    - An elevator sweeping with calls ahead of it (its car calls and the hall calls
+      it answers) heads for the nearest of them.
+    - Every other elevator is free. Free elevators are sent to the nearest hall call
+      that no sweeping elevator answers, the ones already moving first, so that
+      they keep heading for the same call. But a call where somebody has waited for
+      OVERDUE_TRIPS trips to the top floor and back is overdue, and overdue calls
+      get the nearest free elevator first, so that calls at the ends of the
+      building aren't starved by nearer ones. Once the free elevators sent to a call
+      can carry everybody waiting there, it gets no more of them. A free elevator
+      with no calls left to answer stops where it is.
+
+    An elevator that arrives at its target floor is stopped there, so it boards
+    people going either way, and then sweeps in the direction of its passengers.
+
+    Calls are kept as integer bitsets, with bit f set for floor f, so finding the
+    calls above or below an elevator is a couple of bit operations. A WaitingFloors
+    keeps its hall calls up to date, so they aren't looked for every round.
+    """
+    # Private Instance Attributes:
+    # - _directions: the direction each elevator is sweeping or heading in, by its
+    #   position in the list of elevators: 1 for up, -1 for down and 0 if it is
+    #   stopped
+    # - _quiet_rounds: the number of rounds before any hall call can be overdue
+    _directions: list[int]
+    _quiet_rounds: int
+
+    def __init__(self) -> None:
+        """Initialize a new CollectiveControl algorithm."""
+        self._directions = []
+        self._quiet_rounds = 0
+
+    def reset(self) -> None:
+        """Forget the direction each elevator is sweeping in."""
+        self._directions = []
+        self._quiet_rounds = 0
+
+    def update_target_floors(self,
+                             elevators: list[Elevator],
+                             waiting: dict[int, Collection[Person]],
+                             max_floor: int) -> None:
+        """Updates elevator target floors."""
+        if len(self._directions) != len(elevators):
+            self._directions = [0] * len(elevators)
+        self._quiet_rounds -= 1
+        car_calls = [ele.passengers.target_bits for ele in elevators]
+        up_floors, down_floors = self._update_directions(elevators, car_calls)
+        up_calls, down_calls = _hall_calls(waiting)
+        answered = self._split_hall_calls(elevators, (up_floors, down_floors),
+                                          (up_calls, down_calls))
+        free = self._head_for_calls(elevators, car_calls, answered)
+        if free:
+            unanswered = up_calls | down_calls
+            for calls in answered:
+                unanswered &= ~calls
+            overdue = self._overdue_calls(waiting, up_calls | down_calls, max_floor)
+            self._send_free_elevators(elevators, free, unanswered, waiting, overdue)
+
+    def _update_directions(self, elevators: list[Elevator],
+                           car_calls: list[int]) -> tuple[int, int]:
+        """Update the direction each of the given elevators with the given car calls
+        is sweeping in, and return the floors with one sweeping up and down.
+        """
+        directions = self._directions
+        up_floors = down_floors = 0
+        for i, ele in enumerate(elevators):
+            current = ele.current_floor
+            direction = directions[i]
+            calls = car_calls[i]
+            # Only look for a new direction if there are no car calls ahead
+            if calls and not (calls >> (current + 1) if direction > 0
+                              else direction < 0 and calls & ((1 << current) - 1)):
+                direction = directions[i] = _sweep_direction(calls, current, direction)
+            if direction > 0:
+                up_floors |= 1 << current
+            elif direction < 0:
+                down_floors |= 1 << current
+        return up_floors, down_floors
+
+    def _split_hall_calls(self, elevators: list[Elevator], sweeping: tuple[int, int],
+                          calls: tuple[int, int]) -> list[int]:
+        """Return the hall calls each of the given elevators answers, by position,
+        given the floors with an elevator sweeping up and down and the up and down
+        hall calls. Only the first elevator sweeping each way on a floor answers any.
+        """
+        answered = [0] * len(elevators)
+        first_up = first_down = 0
+        for i, direction in enumerate(self._directions):
+            current = elevators[i].current_floor if direction else 0
+            if direction > 0 and not first_up >> current & 1:
+                first_up |= 1 << current
+                ahead = sweeping[0] >> (current + 1)
+                reach = (1 << (current + (ahead & -ahead).bit_length() + 1)) - 1 if ahead else -1
+                answered[i] = calls[0] & reach & ~((1 << (current + 1)) - 1)
+            elif direction < 0 and not first_down >> current & 1:
+                first_down |= 1 << current
+                below = sweeping[1] & ((1 << current) - 1)
+                reach = -1 << (below.bit_length() - 1) if below else -1
+                answered[i] = calls[1] & reach & ((1 << current) - 1)
+            if answered[i] and len(elevators[i].passengers) >= elevators[i].capacity:
+                answered[i] = 0
+        return answered
+
+    def _head_for_calls(self, elevators: list[Elevator], car_calls: list[int],
+                        answered: list[int]) -> list[int]:
+        """Send each of the given elevators with calls ahead to the nearest of them,
+        given each one's car calls and the hall calls it answers, and return the
+        positions of the rest, which are free: the ones still moving first.
+        """
+        moving = []
+        stopped = []
+        for i, direction in enumerate(self._directions):
+            current = elevators[i].current_floor if direction else 0
+            calls = car_calls[i] | answered[i]
+            if direction > 0 and calls >> (current + 1):
+                above = calls >> (current + 1)
+                elevators[i].target_floor = current + (above & -above).bit_length()
+            elif direction < 0 and calls & ((1 << current) - 1):
+                elevators[i].target_floor = (calls & ((1 << current) - 1)).bit_length() - 1
+            elif direction:
+                moving.append(i)
+            else:
+                stopped.append(i)
+        return moving + stopped
+
+    def _overdue_calls(self, waiting: dict[int, Collection[Person]], calls: int,
+                       max_floor: int) -> list[int]:
+        """Return the overdue floors in the bitset calls, the longest wait first, if
+        enough rounds have passed since they were last looked at for any to be.
+        """
+        if self._quiet_rounds > 0:
+            return []
+        waits = []
+        while calls:
+            floor = (calls & -calls).bit_length() - 1
+            calls &= calls - 1
+            people = waiting[floor]
+            if hasattr(people, 'up'):
+                people = [queue[0] for queue in (people.up, people.down) if queue]
+            waits.append((max(person.wait_time for person in people), floor))
+        waits.sort(reverse=True)
+        max_wait = 2 * OVERDUE_TRIPS * (max_floor - 1)
+        self._quiet_rounds = max_wait - (waits[0][0] if waits else 0)
+        return [call for wait, call in waits if wait >= max_wait]
+
+    def _send_free_elevators(self, elevators: list[Elevator], free: list[int], calls: int,
+                             waiting: dict[int, Collection[Person]], overdue: list[int]) -> None:
+        """Send the free elevators, given by position, to the given overdue floors in
+        calls and then to the nearest calls, or stop them if there are none left.
+        """
+        sent = []
+        unserved = {}
+        for floor in [call for call in overdue if calls >> call & 1][:len(free)]:
+            i = min(free, key=lambda j: abs(elevators[j].current_floor - floor))
+            free.remove(i)
+            sent.append((i, floor))
+            unserved[floor] = len(waiting[floor]) - elevators[i].capacity
+            if unserved[floor] <= 0:
+                calls &= ~(1 << floor)
+        for i in free:
+            floor = elevators[i].current_floor
+            if calls:
+                floor = _nearest_floor(calls, floor)
+                unserved[floor] = unserved.get(floor, len(waiting[floor])) - elevators[i].capacity
+                if unserved[floor] <= 0:
+                    calls &= ~(1 << floor)
+            sent.append((i, floor))
+        for i, floor in sent:
+            current = elevators[i].current_floor
+            self._directions[i] = (floor > current) - (floor < current)
+            elevators[i].target_floor = floor
+
+    def idle_rounds(self, elevators: list[Elevator], max_floor: int) -> Optional[int]:
+        """Return how many rounds in a row update_target_floors would leave every
+        elevator's target floor unchanged, if nobody were waiting for or riding an
+        elevator, and each elevator moved one floor towards its target each round.
+        Return None if the target floors would never change.
+
+        With no calls, every elevator stops where it is, so the target floors never
+        change once every elevator has stopped.
+
+        Preconditions:
+        - elevators and max_floor are from the same simulation run
+        - no elevator has any passengers
+        """
+        if all(ele.target_floor == ele.current_floor for ele in elevators):
+            return None
+        return 0
+
+
+###############################################################################
+# Moving algorithm helpers
+###############################################################################
+def _hall_calls(waiting: dict[int, Collection[Person]]) -> tuple[int, int]:
+    """Return the floors where somebody is waiting to go up, and the floors where
+    somebody is waiting to go down, as bitsets with bit f set for floor f.
+
+    If waiting is a WaitingFloors, the calls it keeps track of are used.
+
+    >>> waiting = {2: [Person(2, 5), Person(2, 1)], 4: [Person(4, 3)], 6: []}
+    >>> [bin(calls) for calls in _hall_calls(waiting)]
+    ['0b100', '0b10100']
+    """
+    occupied = getattr(waiting, 'occupied', None)
+    if occupied is not None:
+        return occupied.up_calls, occupied.down_calls
+    up_calls = down_calls = 0
+    for floor, people in waiting.items():
+        for person in people:
+            up_calls |= (person.target > floor) << floor
+            down_calls |= (person.target < floor) << floor
+    return up_calls, down_calls
+
+
+def _sweep_direction(car_calls: int, current_floor: int, direction: int) -> int:
+    """Return the direction an elevator on current_floor with the given car calls
+    sweeps in next, if it was sweeping in the given direction: the same direction
+    while it has car calls ahead, and otherwise towards its car calls (the nearest of
+    them, if it has car calls on both sides and was stopped).
+
+    >>> _sweep_direction(0b100010, 3, -1), _sweep_direction(0b100010, 3, 0)
+    (-1, 1)
+    """
+    above = car_calls >> (current_floor + 1)
+    below = car_calls & ((1 << current_floor) - 1)
+    if (direction > 0 and above) or (direction < 0 and below):
+        return direction
+    if above and below and direction == 0:
+        return 1 if _nearest_floor(car_calls, current_floor) > current_floor else -1
+    return 1 if above else -1
+
+
+def _nearest_floor(floors: int, current_floor: int) -> int:
+    """Return the floor in the given bitset that is nearest to current_floor,
+    picking the higher floor if there is a tie.
+
+    Preconditions:
+    - floors != 0
+
+    >>> _nearest_floor(0b100100, 4)
+    5
+    >>> _nearest_floor(0b100100, 3)
+    2
+    """
+    above = floors >> current_floor
+    below = floors & ((1 << current_floor) - 1)
+    if not below:
+        return current_floor + (above & -above).bit_length() - 1
+    highest_below = below.bit_length() - 1
+    if above and (above & -above).bit_length() - 1 <= current_floor - highest_below:
+        return current_floor + (above & -above).bit_length() - 1
+    return highest_below
+
+
+def _furthest(current_floor: int, lowest: int, highest: int) -> int:
+    """Return whichever of lowest and highest is further from current_floor,
+    picking lowest if there is a tie.
+
+    Preconditions:
+    - lowest <= highest
+
+    >>> _furthest(3, 1, 5)
+    1
+    >>> _furthest(3, 2, 5)
+    5
+    """
+    if current_floor - lowest >= highest - current_floor:
+        return lowest
+    return highest
+
+
+###############################################################################
+# Trace file helpers
+###############################################################################
+def _open_trace(filename: str, mode: str = 'r') -> IO:
+    """Open the given arrival trace, decompressing it if it is gzip-compressed."""
+    with open(filename, 'rb') as file:
+        compressed = file.read(2) == b'\x1f\x8b'
+    if compressed:
+        return gzip.open(filename, mode if 'b' in mode else mode + 't')
+    return open(filename, mode)
+
+
+def _reopen_streaming_arrivals(max_floor: int, filename: str, sorted_rounds: Optional[bool],
+                               last_round: int) -> StreamingFileArrivals:
+    """Return a StreamingFileArrivals for the given file that has got as far as
+    last_round, as if it had generated that round.
+
+    When streaming, the rows before last_round are read past again.
+    """
+    arrivals = StreamingFileArrivals(max_floor, filename, sorted_rounds)
+    arrivals.next_arrival_round(max(last_round, 0))
+    arrivals._last_round = last_round
+    return arrivals
+
+
+def _parse_row(line: bytes) -> Optional[tuple[int, list[int]]]:
+    """Return the round and the start and target floors in the given CSV row,
+    or None if the row is blank.
+
+    >>> _parse_row(b'3,1,4,5,2\\n')
+    (3, [1, 4, 5, 2])
+    """
+    row = next(csv.reader([line.decode()]), [])
+    if not row:
+        return None
+    return int(row[0]), [int(value) for value in row[1:]]
+
+
+def _read_sorted_rows(file: IO[bytes]) -> Iterator[tuple[int, list[int]]]:
+    """Return an iterator over each round in the given trace with the floors in its
+    last row, which reads one row ahead.
+
+    The iterator raises ValueError when it reads a row of an earlier round than the
+    row before it, before it returns that row's round.
+
+    >>> import io
+    >>> list(_read_sorted_rows(io.BytesIO(b'0,1,2\\n2,3,1\\n\\n2,4,5\\n5,1,2\\n')))
+    [(0, [1, 2]), (2, [4, 5]), (5, [1, 2])]
+    """
+    rows = (row for row in map(_parse_row, iter(file.readline, b'')) if row is not None)
+    rounds = itertools.groupby(itertools.accumulate(rows, _sorted_row), key=lambda row: row[0])
+    return (collections.deque(group, maxlen=1)[0] for _, group in rounds)
+
+
+def _sorted_row(previous: tuple[int, list[int]],
+                row: tuple[int, list[int]]) -> tuple[int, list[int]]:
+    """Return row, which comes right after previous in a trace.
+
+    Raise ValueError if row is of an earlier round than previous.
+    """
+    if row[0] < previous[0]:
+        raise ValueError(f'trace rows are not sorted: round {row[0]} after {previous[0]}')
+    return row
 
 
 if __name__ == '__main__':
@@ -310,8 +991,9 @@ if __name__ == '__main__':
     # "Ctrl + /" or "⌘ + /".
     import python_ta
     python_ta.check_all(config={
-        'allowed-io': ['FileArrivals.__init__'],
-        'extra-imports': ['a1_entities', 'csv'],
+        'allowed-io': ['_open_trace'],
+        'extra-imports': ['a1_contracts', 'a1_entities', 'bisect', 'collections', 'csv',
+                          'gzip', 'itertools'],
         'max-nested-blocks': 4,
         'max-line-length': 100
     })
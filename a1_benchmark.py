@@ -0,0 +1,327 @@
+"""CSC148 Assignment 1 - Benchmarks
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains benchmarks for the simulation. Run it from the command line:
+
+    python a1_benchmark.py contracts --rounds 300
+
+reports how much python_ta contract checking slows down a headless simulation,
+by running the same workload with A1_CONTRACTS set to 'on', '10' and 'off'
+(see a1_contracts.py). Each mode runs in its own process, since the mode is
+fixed when the simulation modules are imported.
+
+    python a1_benchmark.py scenarios --baseline benchmarks.json
+
+runs each of the canonical scenarios in SCENARIOS (with contracts off, in its own
+process) and reports rounds per second, people per second and peak memory. It
+compares them with the results stored in the given baseline file, and exits with
+status 1 if any scenario got slower (or bigger) by more than the tolerance. Use
+--save-baseline to store new results. The scenarios draw seeded random arrivals
+from a1_traffic, so they need NumPy.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Optional
+
+# The A1_CONTRACTS values compared by measure_contract_overhead.
+CONTRACT_MODES = ['on', '10', 'off']
+
+# The relative change in a metric that counts as a regression by default.
+DEFAULT_TOLERANCE = 0.1
+
+
+###############################################################################
+# Contract checking overhead
+###############################################################################
+def time_contract_workload(num_rounds: int) -> float:
+    """Run the contract benchmark workload in this process, and return how many
+    seconds the simulation took.
+
+    Preconditions:
+    - num_rounds >= 1
+    """
+    import a1_algorithms
+    from a1_simulation import Simulation
+
+    config = {
+        'num_floors': 10,
+        'num_elevators': 4,
+        'elevator_capacity': 5,
+        'arrival_generator': a1_algorithms.SingleArrivals(10),
+        'moving_algorithm': a1_algorithms.FurthestFloor(),
+        'visualize': False
+    }
+    start = time.perf_counter()
+    Simulation(config).run(num_rounds)
+    return time.perf_counter() - start
+
+
+def measure_contract_overhead(num_rounds: int,
+                              modes: Optional[list[str]] = None) -> dict[str, float]:
+    """Return the number of seconds the contract benchmark workload takes under
+    each of the given A1_CONTRACTS modes.
+
+    Preconditions:
+    - num_rounds >= 1
+    """
+    if modes is None:
+        modes = CONTRACT_MODES
+
+    timings = {}
+    for mode in modes:
+        env = dict(os.environ, A1_CONTRACTS=mode)
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '_contracts-worker',
+             '--rounds', str(num_rounds)],
+            env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True)
+        timings[mode] = float(result.stdout.split()[-1])
+    return timings
+
+
+def format_contract_overhead(timings: dict[str, float]) -> str:
+    """Return a table of the given contract benchmark timings.
+
+    Slowdowns are relative to the 'off' mode, if it was measured.
+    """
+    baseline = timings.get('off')
+    lines = [f'{"A1_CONTRACTS":>12}  {"seconds":>9}  {"slowdown":>8}']
+    for mode, seconds in timings.items():
+        slowdown = f'{seconds / baseline:7.1f}x' if baseline else '       -'
+        lines.append(f'{mode:>12}  {seconds:9.3f}  {slowdown}')
+    return '\n'.join(lines)
+
+
+###############################################################################
+# Scenarios
+###############################################################################
+def _small_office() -> dict[str, Any]:
+    """Return the config of a 10-floor office with 2 elevators over a repeating day."""
+    import a1_algorithms
+    import a1_traffic
+    return {
+        'num_floors': 10,
+        'num_elevators': 2,
+        'elevator_capacity': 8,
+        'arrival_generator': a1_traffic.PoissonArrivals(
+            10, a1_traffic.office_day(10, 0.3, 1000), seed=1, cycle=1000),
+        'moving_algorithm': a1_algorithms.FurthestFloor(),
+        'visualize': False
+    }
+
+
+def _tower() -> dict[str, Any]:
+    """Return the config of a 100-floor tower with 24 elevators and steady traffic
+    between all floors.
+    """
+    import a1_algorithms
+    import a1_traffic
+    return {
+        'num_floors': 100,
+        'num_elevators': 24,
+        'elevator_capacity': 20,
+        'arrival_generator': a1_traffic.PoissonArrivals(
+            100, [(0, 2.0, a1_traffic.interfloor(100))], seed=2),
+        'moving_algorithm': a1_algorithms.FurthestFloor(),
+        'visualize': False
+    }
+
+
+def _up_peak_flood() -> dict[str, Any]:
+    """Return the config of a 30-floor building flooded with people leaving the lobby."""
+    import a1_algorithms
+    import a1_traffic
+    return {
+        'num_floors': 30,
+        'num_elevators': 8,
+        'elevator_capacity': 15,
+        'arrival_generator': a1_traffic.PoissonArrivals(
+            30, [(0, 5.0, a1_traffic.up_peak(30))], seed=3),
+        'moving_algorithm': a1_algorithms.EndToEndLoop(),
+        'visualize': False
+    }
+
+
+def _overnight() -> dict[str, Any]:
+    """Return the config of a 20-floor building at night, when hardly anybody comes,
+    with idle rounds skipped.
+    """
+    import a1_algorithms
+    import a1_traffic
+    return {
+        'num_floors': 20,
+        'num_elevators': 4,
+        'elevator_capacity': 10,
+        'arrival_generator': a1_traffic.PoissonArrivals(
+            20, [(0, 0.002, a1_traffic.interfloor(20))], seed=4),
+        'moving_algorithm': a1_algorithms.FurthestFloor(),
+        'visualize': False,
+        'skip_idle': True
+    }
+
+
+# The canonical scenarios: a function returning each one's config, and its number of rounds
+SCENARIOS: dict[str, tuple[Callable[[], dict[str, Any]], int]] = {
+    'small_office': (_small_office, 100000),
+    'tower': (_tower, 20000),
+    'up_peak_flood': (_up_peak_flood, 40000),
+    'overnight': (_overnight, 2000000),
+}
+
+# The metrics of a scenario result, and whether bigger is better for each of them
+SCENARIO_METRICS = {'rounds_per_sec': True, 'people_per_sec': True, 'peak_memory_mb': False}
+
+
+def run_scenario(name: str) -> dict[str, float]:
+    """Run the named scenario in this process, and return its metrics.
+
+    Peak memory is the peak resident set size of this process, or -1 where the
+    resource module is unavailable (on Windows).
+    """
+    from a1_simulation import Simulation
+
+    make_config, num_rounds = SCENARIOS[name]
+    config = make_config()
+    start = time.perf_counter()
+    stats = Simulation(config).run(num_rounds)
+    seconds = time.perf_counter() - start
+    return {
+        'seconds': seconds,
+        'rounds_per_sec': num_rounds / seconds,
+        'people_per_sec': stats['total_people'] / seconds,
+        'peak_memory_mb': _peak_memory_mb()
+    }
+
+
+def measure_scenarios(names: Optional[list[str]] = None,
+                      repeat: int = 1) -> dict[str, dict[str, float]]:
+    """Return the metrics of each of the named scenarios (all of them by default),
+    each run with contracts off in its own process.
+
+    Each scenario runs repeat times, and the fastest run is kept.
+
+    Preconditions:
+    - repeat >= 1
+    """
+    if names is None:
+        names = list(SCENARIOS)
+
+    results = {}
+    for name in names:
+        runs = []
+        for _ in range(repeat):
+            env = dict(os.environ, A1_CONTRACTS='off')
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '_scenario-worker', name],
+                env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True, check=True)
+            runs.append(json.loads(result.stdout.splitlines()[-1]))
+        results[name] = min(runs, key=lambda run: run['seconds'])
+    return results
+
+
+def find_regressions(results: dict[str, dict[str, float]],
+                     baseline: dict[str, dict[str, float]],
+                     tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """Return a description of every metric in results that is worse than in baseline
+    by more than the given fraction. Scenarios missing from baseline are ignored.
+
+    >>> find_regressions({'tower': {'rounds_per_sec': 80.0, 'people_per_sec': 160.0,
+    ...                             'peak_memory_mb': 30.0}},
+    ...                  {'tower': {'rounds_per_sec': 100.0, 'people_per_sec': 170.0,
+    ...                             'peak_memory_mb': 30.0}})
+    ['tower: rounds_per_sec 80.0 vs 100.0 (-20.0%)']
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, bigger_is_better in SCENARIO_METRICS.items():
+            old = baseline.get(name, {}).get(metric, -1)
+            new = metrics[metric]
+            if old <= 0 or new < 0:
+                continue
+            change = (new - old) / old
+            if (-change if bigger_is_better else change) > tolerance:
+                regressions.append(f'{name}: {metric} {new:.1f} vs {old:.1f} ({change:+.1%})')
+    return regressions
+
+
+def format_scenarios(results: dict[str, dict[str, float]]) -> str:
+    """Return a table of the given scenario results."""
+    lines = [f'{"scenario":>14}  {"rounds/s":>10}  {"people/s":>10}  {"peak MB":>8}']
+    for name, metrics in results.items():
+        lines.append(f'{name:>14}  {metrics["rounds_per_sec"]:10.1f}  '
+                     f'{metrics["people_per_sec"]:10.1f}  {metrics["peak_memory_mb"]:8.1f}')
+    return '\n'.join(lines)
+
+
+def _peak_memory_mb() -> float:
+    """Return the peak resident set size of this process in megabytes, or -1 if it
+    can't be measured.
+    """
+    try:
+        import resource
+    except ImportError:
+        return -1.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+###############################################################################
+# Command-line interface
+###############################################################################
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the benchmark named on the command line."""
+    parser = argparse.ArgumentParser(description='Elevator simulation benchmarks.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    contracts = commands.add_parser('contracts', help='measure contract checking overhead')
+    contracts.add_argument('--rounds', type=int, default=300)
+    contracts.add_argument('--modes', nargs='+', default=CONTRACT_MODES)
+
+    worker = commands.add_parser('_contracts-worker')
+    worker.add_argument('--rounds', type=int, required=True)
+
+    scenarios = commands.add_parser('scenarios', help='run the canonical scenarios')
+    scenarios.add_argument('--names', nargs='+', choices=list(SCENARIOS), default=None)
+    scenarios.add_argument('--repeat', type=int, default=3)
+    scenarios.add_argument('--baseline', help='JSON file of results to compare with')
+    scenarios.add_argument('--save-baseline', help='JSON file to store the results in')
+    scenarios.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+
+    scenario_worker = commands.add_parser('_scenario-worker')
+    scenario_worker.add_argument('name', choices=list(SCENARIOS))
+
+    args = parser.parse_args(argv)
+    if args.command == 'contracts':
+        print(format_contract_overhead(measure_contract_overhead(args.rounds, args.modes)))
+    elif args.command == '_contracts-worker':
+        print(time_contract_workload(args.rounds))
+    elif args.command == 'scenarios':
+        results = measure_scenarios(args.names, args.repeat)
+        print(format_scenarios(results))
+        if args.save_baseline:
+            with open(args.save_baseline, 'w') as file:
+                json.dump(results, file, indent=2)
+        if args.baseline:
+            with open(args.baseline) as file:
+                regressions = find_regressions(results, json.load(file), args.tolerance)
+            for regression in regressions:
+                print('REGRESSION', regression)
+            if regressions:
+                sys.exit(1)
+    elif args.command == '_scenario-worker':
+        print(json.dumps(run_scenario(args.name)))
+
+
+if __name__ == '__main__':
+    main()
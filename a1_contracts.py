@@ -0,0 +1,186 @@
+"""CSC148 Assignment 1 - Contract checking
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module decides how much python_ta contract checking the simulation does.
+Every class in a1_entities, a1_algorithms and a1_simulation is decorated with
+the check_contracts function below instead of python_ta's own decorator.
+
+The amount of checking is controlled by a "check period":
+- 1: check every call and attribute assignment (the default, for development)
+- N > 1: only check every Nth call to each method (a cheaper debug mode)
+- 0: no checking at all
+
+The period is read from the A1_CONTRACTS environment variable when the modules
+are imported. Its value is 'on', 'off', or a positive integer N. When it is
+'off', classes are not wrapped at all (and python_ta is never imported), so
+production runs pay nothing for contracts.
+
+When contracts are wrapped, the period can also be changed at run time with
+set_check_period, or for the duration of a with block with checking_period, which
+is what a simulation given the 'contract_checking' config key does while it runs.
+"""
+from __future__ import annotations
+import contextlib
+import functools
+import inspect
+import itertools
+import os
+import sys
+from typing import Any, Callable, Iterator, TypeVar
+
+CONTRACTS_ENV_VAR = 'A1_CONTRACTS'
+
+_Class = TypeVar('_Class', bound=type)
+
+
+def parse_check_period(value: str) -> int:
+    """Return the check period described by the given A1_CONTRACTS value.
+
+    >>> parse_check_period('on')
+    1
+    >>> parse_check_period('off')
+    0
+    >>> parse_check_period('10')
+    10
+    """
+    value = value.strip().lower()
+    if value in ('', 'on', 'true', 'yes'):
+        return 1
+    if value in ('off', 'false', 'no'):
+        return 0
+    if value.isdigit():
+        return int(value)
+    raise ValueError(f'invalid {CONTRACTS_ENV_VAR} value: {value!r} '
+                     f"(expected 'on', 'off' or a positive integer)")
+
+
+# The period chosen at import time. If this is 0, classes are never wrapped.
+IMPORT_CHECK_PERIOD = parse_check_period(os.environ.get(CONTRACTS_ENV_VAR, 'on'))
+
+# Extra __slots__ entries needed by checked classes. python_ta tags instances while
+# checking their representation invariants, which needs an instance dictionary.
+CONTRACT_SLOTS = ('__dict__',) if IMPORT_CHECK_PERIOD else ()
+
+_check_period = IMPORT_CHECK_PERIOD
+
+
+def contracts_enabled() -> bool:
+    """Return whether classes were wrapped for contract checking at import time."""
+    return IMPORT_CHECK_PERIOD > 0
+
+
+def get_check_period() -> int:
+    """Return the current check period."""
+    return _check_period
+
+
+def set_check_period(period: int) -> None:
+    """Change how often contracts are checked from now on.
+
+    This only has an effect if contracts were enabled at import time: a class that
+    was never wrapped can't start checking its contracts later.
+
+    Preconditions:
+    - period >= 0
+    """
+    global _check_period
+    _check_period = period
+
+
+@contextlib.contextmanager
+def checking_period(period: int) -> Iterator[None]:
+    """Check contracts with the given period inside a with block, and go back to
+    the previous period when it exits.
+
+    >>> with checking_period(5):
+    ...     get_check_period()
+    5
+    >>> get_check_period() == IMPORT_CHECK_PERIOD
+    True
+
+    Preconditions:
+    - period >= 0
+    """
+    previous = _check_period
+    set_check_period(period)
+    try:
+        yield
+    finally:
+        set_check_period(previous)
+
+
+def check_contracts(klass: _Class) -> _Class:
+    """Enable (possibly sampled) python_ta contract checking for the given class.
+
+    Return the class unchanged if contract checking was turned off at import time.
+    """
+    if not IMPORT_CHECK_PERIOD:
+        return klass
+
+    from python_ta.contracts import check_contracts as pyta_check_contracts
+
+    originals = {name: value for name, value in klass.__dict__.items()
+                 if inspect.isfunction(value)}
+    original_setattr = klass.__dict__.get('__setattr__')
+    pyta_check_contracts(klass)
+
+    for name, original in originals.items():
+        setattr(klass, name, _sampled_method(klass.__dict__[name], original))
+    klass.__setattr__ = _sampled_setattr(klass, klass.__dict__['__setattr__'], original_setattr)
+    return klass
+
+
+###############################################################################
+# Private helpers
+###############################################################################
+def _should_check(counter: itertools.count) -> bool:
+    """Return whether the next call counted by counter should be checked."""
+    if _check_period == 1:
+        return True
+    return _check_period > 1 and next(counter) % _check_period == 0
+
+
+def _sampled_method(checked: Callable, original: Callable) -> Callable:
+    """Return a method that calls checked once every check period, and original otherwise."""
+    counter = itertools.count()
+
+    @functools.wraps(original)
+    def method(self: Any, *args: Any, **kwargs: Any) -> Any:
+        if _should_check(counter):
+            # python_ta's wrapper has to be bound to find the instance it checks.
+            return checked.__get__(self, type(self))(*args, **kwargs)
+        return original(self, *args, **kwargs)
+
+    return method
+
+
+def _sampled_setattr(klass: type, checked: Callable, original: Callable | None) -> Callable:
+    """Return a __setattr__ for klass that calls checked once every check period."""
+    counter = itertools.count()
+    # A checked parent class's __setattr__ inspects our frame, just like python_ta does.
+    parent_is_checked = klass.__mro__[1].__setattr__ is not object.__setattr__
+
+    def __setattr__(obj: Any, name: str, value: Any) -> None:
+        # python_ta looks at its caller's 'self' to tell whether the assignment happens
+        # inside a method, so expose our own caller's 'self' where it will look for it.
+        if _should_check(counter):
+            self = sys._getframe(1).f_locals.get('self')  # pylint: disable=unused-variable
+            checked(obj, name, value)
+        elif original is not None:
+            original(obj, name, value)
+        elif parent_is_checked:
+            self = sys._getframe(1).f_locals.get('self')  # pylint: disable=unused-variable
+            super(klass, obj).__setattr__(name, value)
+        else:
+            object.__setattr__(obj, name, value)
+
+    return __setattr__
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,282 @@
+"""CSC148 Assignment 1 - Destination dispatch
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains DestinationDispatch, a moving algorithm that assigns each
+group of waiting people to one elevator, so that a large bank of elevators splits
+the groups between them instead of every free elevator chasing the same floor.
+
+Each round, the groups and the elevators are turned into NumPy arrays, and the
+estimated cost of every elevator serving every group is computed at once as a
+matrix. The assignment that minimizes the total cost is found with SciPy's
+linear_sum_assignment if SciPy is installed, and greedily (cheapest pair first)
+otherwise.
+"""
+from __future__ import annotations
+from itertools import islice
+from typing import Collection, Optional
+
+import numpy as np
+from a1_contracts import check_contracts
+
+import a1_algorithms
+from a1_entities import Person, Elevator
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# The cost of each round an elevator's trip is extended by picking up a group
+DETOUR_WEIGHT = 0.5
+# The cost of each person in a group who won't fit in the elevator
+OVERFLOW_WEIGHT = 2.0
+# The cost taken off for each round the first person in a group has waited, so
+# that groups that keep losing out to nearer ones are eventually served
+AGE_WEIGHT = 1.0
+
+
+@check_contracts
+class DestinationDispatch(a1_algorithms.MovingAlgorithm):
+    """A moving algorithm that assigns groups of waiting people to elevators by
+    estimated cost.
+
+    Algorithm description:
+
+    - A group is up to one elevator's capacity of people waiting on the same floor
+      to go the same way, in the order they arrived. Since everybody's target floor
+      is known when they arrive, each group has an extent: the furthest target floor
+      of its people. Its age is how long its first person has waited.
+    - An elevator with passengers finishes their trip first: it heads for the
+      furthest passenger target in the direction it is moving, or on the other
+      side if there are none (see _trip_end). Passengers are never taken out of
+      their way.
+    - The cost of an elevator serving a group is the sum of:
+        - the pickup ETA: the number of rounds until it gets to the group's floor.
+          An elevator with passengers can only serve a group that is on its way
+          (ahead of it, going the same way); any other group costs infinitely
+          much for it, since it won't go there until its trip is over.
+        - DETOUR_WEIGHT times the number of rounds the group's extent adds to the
+          elevator's trip.
+        - OVERFLOW_WEIGHT times the number of people in the group who won't fit.
+        - minus AGE_WEIGHT times the group's age.
+    - Each elevator serves at most one group, and each group is served by at most
+      one elevator: as many groups as can be are served, with the smallest total
+      cost.
+    - An elevator without passengers heads for the floor of its group, or stops
+      where it is if it has none. An elevator with passengers keeps heading for
+      the end of its trip.
+
+    Instance Attributes:
+    - solver: 'optimal' to use SciPy's linear_sum_assignment, or 'greedy' to
+      repeatedly assign the cheapest remaining pair of group and elevator
+
+    Representation Invariants:
+    - self.solver in ('optimal', 'greedy')
+    """
+    solver: str
+
+    def __init__(self, solver: str = 'auto') -> None:
+        """Initialize a new DestinationDispatch algorithm with the given solver, where
+        'auto' means 'optimal' if SciPy is installed and 'greedy' otherwise.
+
+        Raise ValueError if solver is 'optimal' and SciPy isn't installed.
+
+        Preconditions:
+        - solver in ('auto', 'optimal', 'greedy')
+        """
+        if solver == 'auto':
+            solver = 'greedy' if linear_sum_assignment is None else 'optimal'
+        if solver == 'optimal' and linear_sum_assignment is None:
+            raise ValueError('the optimal solver needs SciPy')
+        self.solver = solver
+
+    def update_target_floors(self,
+                             elevators: list[Elevator],
+                             waiting: dict[int, Collection[Person]],
+                             max_floor: int) -> None:
+        """Updates elevator target floors."""
+        capacity = max(ele.capacity for ele in elevators)
+        groups = _groups(waiting, capacity, len(elevators))
+
+        current = np.array([ele.current_floor for ele in elevators])
+        ends = np.array([_trip_end(ele) for ele in elevators])
+        loads = np.array([len(ele.passengers) for ele in elevators])
+        capacities = np.array([ele.capacity for ele in elevators])
+
+        assigned = [None] * len(elevators)
+        if len(groups[0]):
+            costs = group_costs(*groups, current, ends, loads, capacities)
+            for group, e in self.assign(costs):
+                assigned[e] = int(groups[0][group])
+
+        for e, ele in enumerate(elevators):
+            if loads[e]:
+                ele.target_floor = int(ends[e])
+            elif assigned[e] is not None:
+                ele.target_floor = assigned[e]
+            else:
+                ele.target_floor = ele.current_floor
+
+    def assign(self, costs: np.ndarray) -> list[tuple[int, int]]:
+        """Return the (group, elevator) pairs that serve the most groups they can, at
+        the smallest total cost, where costs[group, elevator] is the cost of the
+        elevator serving the group.
+
+        An infinite cost means the elevator can't serve the group.
+
+        >>> costs = np.array([[1.0, 2.0], [1.5, 9.0]])
+        >>> DestinationDispatch('greedy').assign(costs)
+        [(0, 0), (1, 1)]
+        >>> costs = np.array([[np.inf, 2.0], [np.inf, 1.0]])
+        >>> DestinationDispatch('greedy').assign(costs)
+        [(1, 1)]
+        """
+        finite = np.isfinite(costs)
+        if self.solver == 'optimal':
+            if not finite.any():
+                return []
+            # Pairs that can't be made cost more than any other pairs could add up
+            # to, so the fewest of them are made, and they are then left out
+            low, high = costs[finite].min(), costs[finite].max()
+            bounded = np.where(finite, costs, high + (high - low + 1) * min(costs.shape))
+            groups, elevators = linear_sum_assignment(bounded)
+            return [(group, e) for group, e in zip(groups.tolist(), elevators.tolist())
+                    if finite[group, e]]
+
+        remaining = np.where(finite, costs, np.inf)
+        pairs = []
+        for _ in range(min(remaining.shape)):
+            group, e = divmod(int(np.argmin(remaining)), remaining.shape[1])
+            if remaining[group, e] == np.inf:
+                break
+            pairs.append((group, e))
+            remaining[group, :] = np.inf
+            remaining[:, e] = np.inf
+        return pairs
+
+    def idle_rounds(self, elevators: list[Elevator], max_floor: int) -> Optional[int]:
+        """Return how many rounds in a row update_target_floors would leave every
+        elevator's target floor unchanged, if nobody were waiting for or riding an
+        elevator, and each elevator moved one floor towards its target each round.
+        Return None if the target floors would never change.
+
+        With nobody waiting, every elevator stops where it is, so the target floors never
+        change once every elevator has stopped.
+
+        Preconditions:
+        - elevators and max_floor are from the same simulation run
+        - no elevator has any passengers
+        """
+        if all(ele.target_floor == ele.current_floor for ele in elevators):
+            return None
+        return 0
+
+
+###############################################################################
+# Costs
+###############################################################################
+def group_costs(group_floors: np.ndarray, group_directions: np.ndarray,
+                group_sizes: np.ndarray, group_extents: np.ndarray,
+                group_ages: np.ndarray, current: np.ndarray, ends: np.ndarray,
+                loads: np.ndarray, capacities: np.ndarray) -> np.ndarray:
+    """Return the matrix of the cost of each elevator serving each group, as
+    described in DestinationDispatch, with one row per group and one column per
+    elevator.
+
+    Groups are given by their floor, direction (1 or -1), number of people, extent
+    and age, and elevators by their current floor, the end of their trip, their
+    number of passengers and their capacity.
+
+    >>> group_costs(np.array([4]), np.array([1]), np.array([3]), np.array([9]),
+    ...             np.array([2]), np.array([1, 6]), np.array([5, 6]),
+    ...             np.array([2, 0]), np.array([4, 4]))
+    array([[5. , 2.5]])
+    >>> group_costs(np.array([4]), np.array([-1]), np.array([3]), np.array([1]),
+    ...             np.array([2]), np.array([1, 6]), np.array([5, 6]),
+    ...             np.array([2, 0]), np.array([4, 4]))
+    array([[inf, 1.5]])
+    """
+    floors = group_floors[:, None]
+    directions = group_directions[:, None]
+    extents = group_extents[:, None]
+    moving = np.sign(ends - current)
+
+    # A group is on the way if it is ahead of a moving elevator and going its way
+    on_the_way = (directions == moving) & ((floors - current) * moving >= 0)
+    eta = np.where(on_the_way, np.abs(floors - current),
+                   np.abs(ends - current) + np.abs(floors - ends))
+    trip_end = np.where(on_the_way, ends, floors)
+    detour = np.maximum((extents - trip_end) * directions, 0)
+    free = np.where(on_the_way, capacities - loads, capacities)
+    overflow = np.maximum(group_sizes[:, None] - free, 0)
+    costs = (eta + DETOUR_WEIGHT * detour + OVERFLOW_WEIGHT * overflow
+             - AGE_WEIGHT * group_ages[:, None])
+    return np.where(on_the_way | (loads == 0), costs, np.inf)
+
+
+def _groups(waiting: dict[int, Collection[Person]], capacity: int,
+            max_groups: int) -> tuple[np.ndarray, ...]:
+    """Return the floors, directions, sizes, extents and ages of the groups in
+    waiting, with at most max_groups groups for each floor and direction.
+
+    If waiting is a WaitingFloors, only its occupied floors are looked at.
+    """
+    floors = []
+    directions = []
+    sizes = []
+    extents = []
+    ages = []
+    occupied = getattr(waiting, 'occupied', None)
+    for floor in (waiting if occupied is None else occupied):
+        people = waiting[floor]
+        up = getattr(people, 'up', None)
+        if up is None:
+            up = [person for person in people if person.target > floor]
+            down = [person for person in people if person.target < floor]
+        else:
+            down = people.down
+        for direction, queue, furthest in [(1, up, max), (-1, down, min)]:
+            queue = iter(queue)
+            for _ in range(max_groups):
+                group = list(islice(queue, capacity))
+                if not group:
+                    break
+                floors.append(floor)
+                directions.append(direction)
+                sizes.append(len(group))
+                extents.append(furthest(person.target for person in group))
+                ages.append(group[0].wait_time)
+    return (np.array(floors), np.array(directions), np.array(sizes), np.array(extents),
+            np.array(ages))
+
+
+def _trip_end(elevator: Elevator) -> int:
+    """Return the floor the given elevator's passengers take it to, or its current
+    floor if it has no passengers.
+
+    That is the furthest passenger target in the direction the elevator is moving.
+    If there are none (or the elevator is stopped), it is the furthest passenger
+    target on the other side, or if there are targets on both sides, on the side of
+    whichever of the lowest and highest targets is nearer (the lowest if tied).
+    """
+    current = elevator.current_floor
+    if len(elevator.passengers) == 0:
+        return current
+    lowest = elevator.passengers.min_target()
+    highest = elevator.passengers.max_target()
+    if elevator.target_floor > current and highest > current:
+        return highest
+    if elevator.target_floor < current and lowest < current:
+        return lowest
+    if lowest < current and (highest < current or current - lowest <= highest - current):
+        return lowest
+    return highest
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
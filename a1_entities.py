@@ -15,19 +15,47 @@ methods we have provided. However, you can add new PRIVATE attributes,
 and of course you'll have to implement the methods we've provided, as well
 as add your own methods to complete this assignment.
 
-Person and Elevator each inherit from a "sprite" class found in visualizer.py.
-This is to enable their instances to be visualized properly.
-You may not change visualizer.py, but are responsible for reading the documentation
-to understand these classes, as well as the abstract methods your classes must
-implement.
+Person and Elevator are plain data classes with no dependency on Pygame, so a
+headless simulation never loads an image or allocates a surface. When a simulation
+is visualized, the Visualizer wraps each entity in a sprite (see a1_visualizer.py)
+the first time it needs to draw it.
+
+Both classes use __slots__ to keep per-instance memory small. While contracts are
+checked (see a1_contracts.py) they also get a '__dict__' slot, because python_ta tags
+instances while checking their representation invariants.
 """
 from __future__ import annotations
-from python_ta.contracts import check_contracts
-from a1_visualizer import PersonSprite, ElevatorSprite
+import bisect
+import itertools
+from collections import deque
+from typing import Iterable, Iterator, Optional
+from a1_contracts import check_contracts, CONTRACT_SLOTS
 
 
 @check_contracts
-class Person(PersonSprite):
+class RoundClock:
+    """A count of the rounds of waiting that have passed in a simulation.
+
+    People waiting in a simulation compute their waiting time from this clock,
+    so the simulation only has to advance the clock once per round instead of
+    updating every person.
+
+    Instance Attributes:
+    - now: the number of rounds of waiting counted so far
+
+    Representation Invariants:
+    - self.now >= 0
+    """
+    __slots__ = ('now',) + CONTRACT_SLOTS
+    now: int
+
+    def __init__(self) -> None:
+        """Initialize a new clock at 0."""
+        self.now = 0
+
+
+@check_contracts
+class Person:
     """A person in the elevator simulation.
 
     Instance Attributes:
@@ -35,15 +63,26 @@ class Person(PersonSprite):
     - target: the floor this person wants to go to
     - wait_time: the number of rounds this person has been waiting
 
+    While a person is in a simulation, wait_time isn't stored: it is computed from
+    the simulation's RoundClock and the clock reading when the person arrived.
+
     Representation Invariants:
     - self.start >= 1
     - self.target >= 1
     - self.start != self.target
     - self.wait_time >= 0
     """
+    __slots__ = ('start', 'target', '_stamp', '_clock') + CONTRACT_SLOTS
     start: int
     target: int
     wait_time: int
+    # Private Instance Attributes:
+    # - _clock: the clock this person's waiting time is counted on,
+    #     or None if their waiting time isn't currently being counted
+    # - _stamp: the clock reading when this person started waiting,
+    #     or their waiting time itself if _clock is None
+    _stamp: int
+    _clock: Optional[RoundClock]
 
     def __init__(self, start: int, target: int) -> None:
         """Initialize a person with the given start and target floor.
@@ -53,15 +92,54 @@ class Person(PersonSprite):
         Preconditions:
         - start >= 0
         - target >= 0
-
-        NOTE: Initialize all Person instance attributes BEFORE calling PersonSprite.__init__.
-        This is because the PersonSprite initializer will call get_anger_level, which
-        should depend on self.wait_time.
         """
         self.start = start
         self.target = target
-        self.wait_time = 0
-        PersonSprite.__init__(self)
+        self._stamp = 0
+        self._clock = None
+
+    @property
+    def wait_time(self) -> int:
+        """The number of rounds this person has been waiting."""
+        if self._clock is None:
+            return self._stamp
+        return self._clock.now - self._stamp
+
+    @wait_time.setter
+    def wait_time(self, value: int) -> None:
+        """Set the number of rounds this person has been waiting."""
+        if self._clock is None:
+            self._stamp = value
+        else:
+            self._stamp = self._clock.now - value
+
+    def start_waiting(self, clock: RoundClock) -> None:
+        """Start counting this person's waiting time on the given clock, from 0.
+
+        >>> clock = RoundClock()
+        >>> my_person = Person(1, 5)
+        >>> my_person.start_waiting(clock)
+        >>> clock.now += 3
+        >>> my_person.wait_time
+        3
+        """
+        self._clock = clock
+        self._stamp = clock.now
+
+    def stop_waiting(self) -> None:
+        """Stop counting this person's waiting time, keeping its current value.
+
+        >>> clock = RoundClock()
+        >>> my_person = Person(1, 5)
+        >>> my_person.start_waiting(clock)
+        >>> clock.now += 3
+        >>> my_person.stop_waiting()
+        >>> clock.now += 1
+        >>> my_person.wait_time
+        3
+        """
+        self._stamp = self.wait_time
+        self._clock = None
 
     def get_anger_level(self) -> int:
         """Return this person's anger level.
@@ -74,8 +152,7 @@ class Person(PersonSprite):
         - Level 3: waiting 7-8 rounds
         - Level 4: waiting >= 9 rounds
 
-        Note: this method overrides PersonSprite.get_anger_level, used when
-        visualizing a person (how?).
+        Note: PersonSprite uses this method to pick the image drawn for this person.
 
         >>> my_person = Person(1, 5)
         >>> my_person.wait_time = 5
@@ -115,7 +192,55 @@ class Person(PersonSprite):
 
 
 @check_contracts
-class Elevator(ElevatorSprite):
+class PersonPool:
+    """A free list of people who have left a simulation, so that new people can
+    reuse them instead of being allocated.
+
+    A released person must not be used by anything else afterwards, since acquire
+    hands them out again as somebody new.
+
+    >>> pool = PersonPool()
+    >>> old = Person(1, 5)
+    >>> old.wait_time = 4
+    >>> pool.release(old)
+    >>> new = pool.acquire(3, 2)
+    >>> new is old, new
+    (True, Person(start=3, target=2, wait_time=0))
+    """
+    __slots__ = ('_free',) + CONTRACT_SLOTS
+    # Private Instance Attributes:
+    # - _free: the people who can be reused
+    _free: list[Person]
+
+    def __init__(self) -> None:
+        """Initialize an empty pool."""
+        self._free = []
+
+    def __len__(self) -> int:
+        """Return the number of people who can be reused."""
+        return len(self._free)
+
+    def acquire(self, start: int, target: int) -> Person:
+        """Return a person with the given start and target floor, who hasn't waited
+        yet, reusing a released person if there is one.
+        """
+        if not self._free:
+            return Person(start, target)
+        person = self._free.pop()
+        person.__init__(start, target)
+        return person
+
+    def release(self, person: Person) -> None:
+        """Add the given person, who has left their simulation, to the pool."""
+        self._free.append(person)
+
+    def release_all(self, people: Iterable[Person]) -> None:
+        """Add each of the given people, who have left their simulation, to the pool."""
+        self._free.extend(people)
+
+
+@check_contracts
+class Elevator:
     """An elevator in the elevator simulation.
 
     Remember to add additional documentation to this class docstring
@@ -124,9 +249,7 @@ class Elevator(ElevatorSprite):
     Instance Attributes:
     - capacity: The maximum number of people on this elevator
     - current_floor: The floor this elevator is on
-    - passengers:
-        The passengers of this elevator (this attribute also appears in
-        the ElevatorSprite class)
+    - passengers: The passengers of this elevator, grouped by their target floor
     - target_floor: the floor this elevator is headed towards
 
     Representation Invariants:
@@ -135,9 +258,10 @@ class Elevator(ElevatorSprite):
     - len(self.passengers) <= self.capacity
     - self.target_floor >= 1
     """
+    __slots__ = ('capacity', 'current_floor', 'passengers', 'target_floor') + CONTRACT_SLOTS
     capacity: int
     current_floor: int
-    passengers: list[Person]
+    passengers: PassengerIndex
     target_floor: int
 
     def __init__(self, capacity: int) -> None:
@@ -151,16 +275,14 @@ class Elevator(ElevatorSprite):
         self.capacity = capacity
         self.current_floor = 1
         self.target_floor = 1
-        self.passengers = []
-        ElevatorSprite.__init__(self)
+        self.passengers = PassengerIndex()
 
     def fullness(self) -> float:
         """Return the fraction that this elevator is filled.
 
         The value returned should be a float between 0.0 (empty) and 1.0 (full).
 
-        Note: this method overrides ElevatorSprite.fullness, used when
-        visualizing an elevator (how?).
+        Note: ElevatorSprite uses this method to draw how full this elevator is.
 
         >>> my_elevator = Elevator(10)
         >>> my_elevator.fullness()
@@ -169,6 +291,479 @@ class Elevator(ElevatorSprite):
         return float(len(self.passengers) / self.capacity)
 
 
+@check_contracts
+class PassengerIndex:
+    """The passengers of an elevator, grouped by the floor they want to go to.
+
+    People getting off at a floor can be removed all at once, without looking at
+    any other passenger, and the lowest and highest passenger target floors are
+    always at hand.
+
+    Iterating over a PassengerIndex gives the passengers in order of their target
+    floor, and in the order they boarded for each target floor.
+
+    Representation Invariants:
+    - self._targets == sorted(self._by_target)
+    - self._target_bits == sum(1 << target for target in self._targets)
+    """
+    __slots__ = ('_by_target', '_targets', '_target_bits', '_size') + CONTRACT_SLOTS
+    # Private Instance Attributes:
+    # - _by_target: maps each target floor of at least one passenger to the
+    #     passengers going there, in the order they boarded
+    # - _targets: the keys of _by_target, in increasing order
+    # - _target_bits: the keys of _by_target as a bitset, with bit f set for floor f
+    # - _size: the total number of passengers
+    _by_target: dict[int, list[Person]]
+    _targets: list[int]
+    _target_bits: int
+    _size: int
+
+    def __init__(self) -> None:
+        """Initialize an index with no passengers."""
+        self._by_target = {}
+        self._targets = []
+        self._target_bits = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Return the number of passengers."""
+        return self._size
+
+    def __iter__(self) -> Iterator[Person]:
+        """Return an iterator over the passengers."""
+        return itertools.chain.from_iterable(self._by_target[target]
+                                             for target in self._targets)
+
+    def __contains__(self, person: object) -> bool:
+        """Return whether the given person is a passenger."""
+        return isinstance(person, Person) and person in self._by_target.get(person.target, ())
+
+    def __repr__(self) -> str:
+        """Return a string representation of these passengers."""
+        return f'PassengerIndex({list(self)})'
+
+    @property
+    def targets(self) -> list[int]:
+        """The floors that at least one passenger wants to go to, in increasing order.
+
+        This list must not be mutated.
+        """
+        return self._targets
+
+    @property
+    def target_bits(self) -> int:
+        """The floors that at least one passenger wants to go to, as a bitset:
+        bit f is set if somebody wants to go to floor f.
+
+        >>> passengers = PassengerIndex()
+        >>> passengers.append(Person(1, 4))
+        >>> passengers.append(Person(1, 2))
+        >>> bin(passengers.target_bits)
+        '0b10100'
+        """
+        return self._target_bits
+
+    def append(self, person: Person) -> None:
+        """Add the given person as a passenger."""
+        bucket = self._by_target.get(person.target)
+        if bucket is None:
+            self._by_target[person.target] = [person]
+            bisect.insort(self._targets, person.target)
+            self._target_bits |= 1 << person.target
+        else:
+            bucket.append(person)
+        self._size += 1
+
+    def clear(self) -> list[Person]:
+        """Remove and return every passenger."""
+        passengers = list(self)
+        self._by_target.clear()
+        self._targets.clear()
+        self._target_bits = 0
+        self._size = 0
+        return passengers
+
+    def pop_target(self, floor: int) -> list[Person]:
+        """Remove and return the passengers going to the given floor, in the order
+        they boarded.
+
+        >>> passengers = PassengerIndex()
+        >>> passengers.append(Person(1, 4))
+        >>> passengers.append(Person(1, 2))
+        >>> passengers.pop_target(4)
+        [Person(start=1, target=4, wait_time=0)]
+        >>> len(passengers)
+        1
+        """
+        bucket = self._by_target.pop(floor, None)
+        if bucket is None:
+            return []
+        del self._targets[bisect.bisect_left(self._targets, floor)]
+        self._target_bits &= ~(1 << floor)
+        self._size -= len(bucket)
+        return bucket
+
+    def min_target(self) -> int:
+        """Return the lowest floor any passenger wants to go to.
+
+        Preconditions:
+        - len(self) > 0
+        """
+        return self._targets[0]
+
+    def max_target(self) -> int:
+        """Return the highest floor any passenger wants to go to.
+
+        Preconditions:
+        - len(self) > 0
+        """
+        return self._targets[-1]
+
+
+@check_contracts
+class FloorQueue:
+    """The people waiting for an elevator on one floor, split by direction.
+
+    People going up and people going down are kept in separate first-come,
+    first-served queues, so an elevator can board exactly the people going its
+    way without looking at anyone else.
+
+    Iterating over a FloorQueue gives the people going up, then the people going
+    down, each in arrival order.
+
+    Instance Attributes:
+    - floor: the floor these people are waiting on
+    - up: the people going up, in arrival order
+    - down: the people going down, in arrival order
+
+    Representation Invariants:
+    - self.floor >= 1
+    - len(self._up_tickets) == len(self.up)
+    - len(self._down_tickets) == len(self.down)
+    - self._occupied is None or (self.floor in self._occupied) == (len(self) > 0)
+    """
+    __slots__ = ('floor', 'up', 'down', '_up_tickets', '_down_tickets',
+                 '_num_arrived', '_occupied') + CONTRACT_SLOTS
+    floor: int
+    up: deque[Person]
+    down: deque[Person]
+    # Private Instance Attributes:
+    # - _up_tickets, _down_tickets: the arrival number of each person in up and down,
+    #     used to board people from both queues in arrival order
+    # - _num_arrived: the number of people who have ever arrived at this floor
+    # - _occupied: the floors with people waiting, which this floor belongs to
+    #     exactly while it isn't empty and whose calls it keeps up to date, or None
+    _up_tickets: deque[int]
+    _down_tickets: deque[int]
+    _num_arrived: int
+    _occupied: Optional[OccupiedFloors]
+
+    def __init__(self, floor: int, occupied: Optional[OccupiedFloors] = None) -> None:
+        """Initialize an empty queue for the given floor.
+
+        If occupied is given, this queue adds its floor and its calls to it and
+        removes them again as people arrive and leave.
+
+        Preconditions:
+        - floor >= 1
+        - occupied is None or floor not in occupied
+        """
+        self.floor = floor
+        self.up = deque()
+        self.down = deque()
+        self._up_tickets = deque()
+        self._down_tickets = deque()
+        self._num_arrived = 0
+        self._occupied = occupied
+
+    def __len__(self) -> int:
+        """Return the number of people waiting on this floor."""
+        return len(self.up) + len(self.down)
+
+    def __iter__(self) -> Iterator[Person]:
+        """Return an iterator over the people waiting on this floor."""
+        return itertools.chain(self.up, self.down)
+
+    def __contains__(self, person: object) -> bool:
+        """Return whether the given person is waiting on this floor."""
+        return person in self.up or person in self.down
+
+    @property
+    def num_up(self) -> int:
+        """The number of people on this floor waiting to go up."""
+        return len(self.up)
+
+    @property
+    def num_down(self) -> int:
+        """The number of people on this floor waiting to go down."""
+        return len(self.down)
+
+    def append(self, person: Person) -> None:
+        """Add a newly arrived person to the end of the queue for their direction.
+
+        Preconditions:
+        - person.start == self.floor
+        """
+        if person.target > self.floor:
+            if self._occupied is not None and not self.up:
+                self._occupied.add_call(self.floor, 1)
+            self.up.append(person)
+            self._up_tickets.append(self._num_arrived)
+        else:
+            if self._occupied is not None and not self.down:
+                self._occupied.add_call(self.floor, -1)
+            self.down.append(person)
+            self._down_tickets.append(self._num_arrived)
+        self._num_arrived += 1
+
+    def extend(self, people: Iterable[Person]) -> None:
+        """Add the given newly arrived people, in order.
+
+        Preconditions:
+        - all(person.start == self.floor for person in people)
+        """
+        for person in people:
+            self.append(person)
+
+    def clear(self) -> list[Person]:
+        """Remove and return everybody waiting on this floor, in no particular order,
+        and start counting arrivals from 0 again.
+        """
+        people = list(self)
+        self.up.clear()
+        self.down.clear()
+        self._up_tickets.clear()
+        self._down_tickets.clear()
+        self._num_arrived = 0
+        if self._occupied is not None:
+            self._occupied.discard(self.floor)
+        return people
+
+    def in_arrival_order(self) -> list[Person]:
+        """Return the people waiting on this floor, in the order they arrived.
+
+        >>> queue = FloorQueue(3)
+        >>> queue.extend([Person(3, 5), Person(3, 1), Person(3, 4)])
+        >>> [person.target for person in queue.in_arrival_order()]
+        [5, 1, 4]
+        """
+        ticketed = list(zip(self._up_tickets, self.up)) + list(zip(self._down_tickets, self.down))
+        ticketed.sort(key=lambda pair: pair[0])
+        return [person for _, person in ticketed]
+
+    def pop_going(self, direction: int, limit: int) -> list[Person]:
+        """Remove and return up to limit people going in the given direction,
+        in the order they arrived.
+
+        People going up are taken if direction > 0, people going down if
+        direction < 0, and people going either way if direction == 0.
+
+        Preconditions:
+        - limit >= 0
+
+        >>> queue = FloorQueue(3)
+        >>> queue.extend([Person(3, 5), Person(3, 1), Person(3, 4)])
+        >>> queue.pop_going(1, 5)
+        [Person(start=3, target=5, wait_time=0), Person(start=3, target=4, wait_time=0)]
+        >>> queue.num_up, queue.num_down
+        (0, 1)
+        """
+        if direction > 0:
+            popped = _pop_left(self.up, self._up_tickets, limit)
+        elif direction < 0:
+            popped = _pop_left(self.down, self._down_tickets, limit)
+        else:
+            popped = []
+            up_tickets, down_tickets = self._up_tickets, self._down_tickets
+            while len(popped) < limit and (up_tickets or down_tickets):
+                if not down_tickets or (up_tickets and up_tickets[0] < down_tickets[0]):
+                    up_tickets.popleft()
+                    popped.append(self.up.popleft())
+                else:
+                    down_tickets.popleft()
+                    popped.append(self.down.popleft())
+
+        if popped and self._occupied is not None:
+            if not self.up:
+                self._occupied.discard_call(self.floor, 1)
+            if not self.down:
+                self._occupied.discard_call(self.floor, -1)
+        return popped
+
+
+@check_contracts
+class OccupiedFloors:
+    """The floors where at least one person is waiting, in increasing order.
+
+    >>> occupied = OccupiedFloors()
+    >>> for floor in [5, 2, 7]:
+    ...     occupied.add(floor)
+    >>> occupied.discard(7)
+    >>> list(occupied), occupied.lowest(), occupied.highest()
+    ([2, 5], 2, 5)
+    >>> bin(occupied.bits)
+    '0b100100'
+
+    A floor can also have calls: somebody on it waiting to go up, or down.
+
+    >>> occupied.add_call(3, -1)
+    >>> occupied.add_call(5, 1)
+    >>> list(occupied), bin(occupied.up_calls), bin(occupied.down_calls)
+    ([2, 3, 5], '0b100000', '0b1000')
+
+    Representation Invariants:
+    - self._bits == sum(1 << floor for floor in self._floors)
+    - (self._up_calls | self._down_calls) & ~self._bits == 0
+    """
+    __slots__ = ('_floors', '_bits', '_up_calls', '_down_calls') + CONTRACT_SLOTS
+    # Private Instance Attributes:
+    # - _floors: the floors, in increasing order
+    # - _bits: the floors as a bitset, with bit f set for floor f
+    # - _up_calls, _down_calls: the floors with an up call and with a down call,
+    #     as bitsets
+    _floors: list[int]
+    _bits: int
+    _up_calls: int
+    _down_calls: int
+
+    def __init__(self) -> None:
+        """Initialize a collection without any floors."""
+        self._floors = []
+        self._bits = 0
+        self._up_calls = 0
+        self._down_calls = 0
+
+    def __len__(self) -> int:
+        """Return the number of floors."""
+        return len(self._floors)
+
+    def __iter__(self) -> Iterator[int]:
+        """Return an iterator over the floors, in increasing order."""
+        return iter(self._floors)
+
+    def __contains__(self, floor: object) -> bool:
+        """Return whether the given floor is one of these floors."""
+        i = bisect.bisect_left(self._floors, floor)
+        return i < len(self._floors) and self._floors[i] == floor
+
+    def add(self, floor: int) -> None:
+        """Add the given floor, if it isn't already here."""
+        i = bisect.bisect_left(self._floors, floor)
+        if i == len(self._floors) or self._floors[i] != floor:
+            self._floors.insert(i, floor)
+            self._bits |= 1 << floor
+
+    def discard(self, floor: int) -> None:
+        """Remove the given floor and its calls, if it is here."""
+        i = bisect.bisect_left(self._floors, floor)
+        if i < len(self._floors) and self._floors[i] == floor:
+            self._floors.pop(i)
+            self._bits &= ~(1 << floor)
+            self._up_calls &= ~(1 << floor)
+            self._down_calls &= ~(1 << floor)
+
+    def add_call(self, floor: int, direction: int) -> None:
+        """Add a call on the given floor, going up if direction > 0 and down
+        otherwise, adding the floor too if it isn't already here.
+        """
+        if direction > 0:
+            self._up_calls |= 1 << floor
+        else:
+            self._down_calls |= 1 << floor
+        self.add(floor)
+
+    def discard_call(self, floor: int, direction: int) -> None:
+        """Remove the call on the given floor going up if direction > 0 and down
+        otherwise, removing the floor too if it has no calls left.
+        """
+        if direction > 0:
+            self._up_calls &= ~(1 << floor)
+        else:
+            self._down_calls &= ~(1 << floor)
+        if not (self._up_calls | self._down_calls) >> floor & 1:
+            self.discard(floor)
+
+    def lowest(self) -> int:
+        """Return the lowest floor.
+
+        Preconditions:
+        - len(self) > 0
+        """
+        return self._floors[0]
+
+    def highest(self) -> int:
+        """Return the highest floor.
+
+        Preconditions:
+        - len(self) > 0
+        """
+        return self._floors[-1]
+
+    @property
+    def bits(self) -> int:
+        """The floors as a bitset: bit f is set if floor f is one of these floors."""
+        return self._bits
+
+    @property
+    def up_calls(self) -> int:
+        """The floors with an up call, as a bitset."""
+        return self._up_calls
+
+    @property
+    def down_calls(self) -> int:
+        """The floors with a down call, as a bitset."""
+        return self._down_calls
+
+
+@check_contracts
+class WaitingFloors(dict):
+    """A dictionary mapping each floor number from 1 to num_floors to the FloorQueue
+    of people waiting on that floor, which also keeps track of which floors have
+    anybody waiting.
+
+    Instance Attributes:
+    - occupied: the floors whose queue isn't empty
+
+    Representation Invariants:
+    - list(self.occupied) == [floor for floor in self if self[floor]]
+    - self.occupied.up_calls == sum(1 << floor for floor in self if self[floor].up)
+    - self.occupied.down_calls == sum(1 << floor for floor in self if self[floor].down)
+    """
+    __slots__ = ('occupied',) + CONTRACT_SLOTS
+    occupied: OccupiedFloors
+
+    def __init__(self, num_floors: int) -> None:
+        """Initialize an empty FloorQueue for every floor from 1 to num_floors.
+
+        Preconditions:
+        - num_floors >= 1
+        """
+        super().__init__()
+        self.occupied = OccupiedFloors()
+        for floor in range(1, num_floors + 1):
+            self[floor] = FloorQueue(floor, self.occupied)
+
+    def clear_queues(self) -> list[Person]:
+        """Remove and return everybody waiting on any floor, keeping every floor's
+        FloorQueue.
+        """
+        people = []
+        for floor in list(self.occupied):
+            people.extend(self[floor].clear())
+        return people
+
+
+def _pop_left(people: deque[Person], tickets: deque[int], limit: int) -> list[Person]:
+    """Remove and return up to limit people from the front of people, along with
+    their tickets.
+    """
+    popped = []
+    for _ in range(min(limit, len(people))):
+        tickets.popleft()
+        popped.append(people.popleft())
+    return popped
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
@@ -184,6 +779,6 @@ if __name__ == '__main__':
     # "Ctrl + /" or "⌘ + /".
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['a1_visualizer'],
+        'extra-imports': ['a1_contracts', 'bisect', 'collections', 'itertools'],
         'max-line-length': 100
     })
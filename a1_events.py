@@ -0,0 +1,510 @@
+"""CSC148 Assignment 1 - Event log and replay
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains EventLog, which compactly records what happens in every round
+of a simulation, and Replay, which plays a recorded simulation back through the
+Visualizer. This way a simulation can run headless at full speed, and only the
+rounds someone wants to watch are rendered. Pass an event log to a simulation with
+the 'event_log' config key:
+
+    log = EventLog(keyframe_every=100)
+    config['event_log'] = log
+    Simulation(config).run(num_rounds)
+    log.save('run.events')
+
+and watch any part of the run later from the command line, for example:
+
+    python a1_events.py run.events --start 500 --stop 600 --speed 4
+
+While watching, the left and right arrow keys jump 10 rounds back and forward, the
+space bar pauses, and closing the window stops the replay. With --record, the
+replay is recorded offscreen instead (see a1_frames.py).
+
+Each round is recorded as a run of integers in one flat array:
+- the number of people who got off an elevator, then each one's person number and
+  elevator number (elevators are numbered from 0)
+- the number of people who arrived (people are numbered in the order they arrive,
+  and their start floor, target floor and arrival round are recorded once, in a
+  separate array)
+- the number of people who boarded an elevator, then each one's person number and
+  elevator number
+- the direction each elevator moved in: 1 (up), 0 (stayed) or -1 (down)
+
+Rounds are numbered in the log from 0, its first round, which is the round of the
+simulation given by first_round (the simulation may have been restored from a
+snapshot, or reset, before it was recorded). Every keyframe_every rounds, a
+keyframe records the state at the start of the round:
+where each elevator is, who is riding it, and who is waiting on each floor. A replay
+jumps to any round, forwards or backwards, by starting from the keyframe before it
+and applying fewer than keyframe_every rounds of events.
+"""
+from __future__ import annotations
+import argparse
+import array
+import pickle
+import zlib
+from typing import Optional
+
+import pygame
+from a1_contracts import check_contracts
+
+from a1_entities import Person, Elevator, FloorQueue, PassengerIndex, RoundClock
+from a1_frames import FrameWriter
+from a1_visualizer import Direction, Visualizer
+
+# The format version of saved event logs
+EVENT_LOG_VERSION = 2
+# The number of rounds between keyframes by default
+DEFAULT_KEYFRAME_EVERY = 100
+# The number of rounds the arrow keys jump during a replay
+SEEK_STEP = 10
+
+
+###############################################################################
+# Recording
+###############################################################################
+@check_contracts
+class EventLog:
+    """A compact log of the events of every round of a simulation, with keyframes.
+
+    Instance Attributes:
+    - keyframe_every: a keyframe is recorded every this many rounds
+    - first_round: the simulation round that the first round of the log is
+    - num_floors: the number of floors in the recorded simulation (0 until its
+      first round is recorded)
+    - elevator_capacities: the capacity of each elevator in the recorded simulation
+    - num_rounds: the number of rounds recorded
+
+    Representation Invariants:
+    - self.keyframe_every >= 1
+    - self.num_rounds >= 0
+    - len(self._offsets) == self.num_rounds + 1
+    - len(self._people) % 3 == 0
+    """
+    keyframe_every: int
+    first_round: int
+    num_floors: int
+    elevator_capacities: list[int]
+    num_rounds: int
+    # Private Instance Attributes:
+    # - _events: the events of every recorded round, one round after another
+    # - _offsets: where the events of each round start in _events, followed by the
+    #     length of _events
+    # - _people: the start floor, target floor and arrival round of each person, in
+    #     the order they arrived (people who were already in the simulation when
+    #     the log started are numbered first, and arrived before round 0)
+    # - _keyframes: the state at the start of every keyframe round, by round
+    #     (see _keyframe)
+    # - _ids: the number of each person in the recorded simulation
+    # - _elevators: the number of each elevator in the recorded simulation
+    _events: array.array
+    _offsets: array.array
+    _people: array.array
+    _keyframes: dict[int, tuple]
+    _ids: dict[Person, int]
+    _elevators: dict[Elevator, int]
+
+    def __init__(self, keyframe_every: int = DEFAULT_KEYFRAME_EVERY) -> None:
+        """Initialize a new, empty event log.
+
+        Preconditions:
+        - keyframe_every >= 1
+        """
+        self.keyframe_every = keyframe_every
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded, so that the log starts over with the next
+        round recorded.
+        """
+        self.first_round = 0
+        self.num_floors = 0
+        self.elevator_capacities = []
+        self.num_rounds = 0
+        self._events = array.array('i')
+        self._offsets = array.array('q', [0])
+        self._people = array.array('i')
+        self._keyframes = {}
+        self._ids = {}
+        self._elevators = {}
+
+    def start_round(self, round_num: int, elevators: list[Elevator],
+                    waiting: dict[int, FloorQueue]) -> None:
+        """Start recording the given simulation round, recording a keyframe first if
+        one is due.
+
+        Preconditions:
+        - self.num_rounds == 0 or round_num == self.first_round + self.num_rounds
+        - elevators and waiting are from the recorded simulation
+        """
+        if self.num_rounds == 0:
+            self.first_round = round_num
+            self.num_floors = len(waiting)
+            self.elevator_capacities = [ele.capacity for ele in elevators]
+            self._elevators = {ele: e for e, ele in enumerate(elevators)}
+        if self.num_rounds % self.keyframe_every == 0:
+            self._keyframes[self.num_rounds] = self._keyframe(elevators, waiting)
+
+    def record_disembarkings(self, disembarkings: list[tuple[Person, Elevator]]) -> None:
+        """Record that each given person got off the given elevator."""
+        events = self._events
+        events.append(len(disembarkings))
+        for person, ele in disembarkings:
+            events.append(self._ids.pop(person))
+            events.append(self._elevators[ele])
+
+    def record_arrivals(self, arrivals: list[Person]) -> None:
+        """Record that the given people arrived, in order."""
+        self._events.append(len(arrivals))
+        for person in arrivals:
+            self._number(person, self.num_rounds)
+
+    def record_boardings(self, boardings: list[tuple[Person, Elevator]]) -> None:
+        """Record that each given person boarded the given elevator."""
+        events = self._events
+        events.append(len(boardings))
+        for person, ele in boardings:
+            events.append(self._ids[person])
+            events.append(self._elevators[ele])
+
+    def record_moves(self, directions: list[Direction]) -> None:
+        """Record the direction each elevator moved in, in order."""
+        self._events.extend(direction.value for direction in directions)
+
+    def end_round(self) -> None:
+        """Finish recording the current round."""
+        self._offsets.append(len(self._events))
+        self.num_rounds += 1
+
+    def _keyframe(self, elevators: list[Elevator],
+                  waiting: dict[int, FloorQueue]) -> tuple:
+        """Return the keyframe of the given state: the number of people who have
+        arrived so far, each elevator's floor, the person numbers of each elevator's
+        passengers, and the person numbers of the people waiting on each floor where
+        anyone is waiting, in the order they arrived.
+        """
+        passengers = [[self._number(person, self.num_rounds - person.wait_time)
+                       for person in ele.passengers] for ele in elevators]
+        queues = {floor: [self._number(person, self.num_rounds - person.wait_time)
+                          for person in queue.in_arrival_order()]
+                  for floor, queue in waiting.items() if len(queue) > 0}
+        return (len(self._people) // 3, [ele.current_floor for ele in elevators],
+                passengers, queues)
+
+    def _number(self, person: Person, arrival_round: int) -> int:
+        """Return the given person's number, numbering them next (as having arrived
+        in the given round) if they don't have one yet.
+        """
+        number = self._ids.get(person)
+        if number is None:
+            number = self._ids[person] = len(self._people) // 3
+            self._people.extend((person.start, person.target, arrival_round))
+        return number
+
+    ############################################################################
+    # Reading
+    ############################################################################
+    def events(self, round_num: int) -> array.array:
+        """Return the events of the given round, as described in the module.
+
+        Preconditions:
+        - 0 <= round_num < self.num_rounds
+        """
+        return self._events[self._offsets[round_num]:self._offsets[round_num + 1]]
+
+    def person(self, number: int) -> tuple[int, int, int]:
+        """Return the start floor, target floor and arrival round of the person with
+        the given number.
+
+        Preconditions:
+        - 0 <= number < the number of people who have arrived
+        """
+        return (self._people[3 * number], self._people[3 * number + 1],
+                self._people[3 * number + 2])
+
+    def keyframe_before(self, round_num: int) -> tuple[int, tuple]:
+        """Return the latest keyframe round that is at most round_num, and its
+        keyframe (see _keyframe).
+
+        Preconditions:
+        - 0 <= round_num <= self.num_rounds
+        - self.num_rounds > 0
+        """
+        keyframe_round = min(round_num - round_num % self.keyframe_every,
+                             max(self._keyframes))
+        return keyframe_round, self._keyframes[keyframe_round]
+
+    ############################################################################
+    # Saving
+    ############################################################################
+    def save(self, filename: str) -> None:
+        """Save this log to the given file, compressed.
+
+        Preconditions:
+        - no round is being recorded
+        """
+        state = {
+            'version': EVENT_LOG_VERSION,
+            'keyframe_every': self.keyframe_every,
+            'first_round': self.first_round,
+            'num_floors': self.num_floors,
+            'elevator_capacities': self.elevator_capacities,
+            'num_rounds': self.num_rounds,
+            'events': self._events.tobytes(),
+            'offsets': self._offsets.tobytes(),
+            'people': self._people.tobytes(),
+            'keyframes': self._keyframes
+        }
+        with open(filename, 'wb') as file:
+            file.write(zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL)))
+
+    def _restore(self, state: dict) -> None:
+        """Replace the contents of this log with the given saved state (see save)."""
+        self.keyframe_every = state['keyframe_every']
+        self.first_round = state['first_round']
+        self.num_floors = state['num_floors']
+        self.elevator_capacities = state['elevator_capacities']
+        self.num_rounds = state['num_rounds']
+        self._events = array.array('i', state['events'])
+        self._offsets = array.array('q', state['offsets'])
+        self._people = array.array('i', state['people'])
+        self._keyframes = state['keyframes']
+
+
+def load_event_log(filename: str) -> EventLog:
+    """Return the event log saved in the given file.
+
+    The log can be replayed, but not recorded into any further.
+
+    Raise ValueError if the log was saved in a different format version.
+    """
+    with open(filename, 'rb') as file:
+        state = pickle.loads(zlib.decompress(file.read()))
+    if state['version'] != EVENT_LOG_VERSION:
+        raise ValueError(f'event log version {state["version"]} is not supported')
+
+    log = EventLog()
+    log._restore(state)
+    return log
+
+
+###############################################################################
+# Replaying
+###############################################################################
+@check_contracts
+class Replay:
+    """A replay of a recorded simulation through a Visualizer.
+
+    Instance Attributes:
+    - log: the event log being replayed
+    - round_num: the round of the log that is played next; the elevators and the
+      waiting people are as they were at the start of it
+    - elevators: the replayed elevators
+    - waiting: the replayed people waiting on each floor, in the order they arrived
+    - visualizer: the visualizer the replay is shown on
+
+    Representation Invariants:
+    - 0 <= self.round_num <= self.log.num_rounds
+    - len(self.elevators) == len(self.log.elevator_capacities)
+    """
+    log: EventLog
+    round_num: int
+    elevators: list[Elevator]
+    waiting: dict[int, list[Person]]
+    visualizer: Visualizer
+    # Private Instance Attributes:
+    # - _clock: the replayed clock, which reads the current round number
+    # - _people: the replayed people who are waiting or riding, by person number
+    # - _next_person: the number of the next person to arrive
+    _clock: RoundClock
+    _people: dict[int, Person]
+    _next_person: int
+
+    def __init__(self, log: EventLog, visualize: bool = True,
+                 frames: Optional[FrameWriter] = None) -> None:
+        """Initialize a new replay of the given log, at its first round, shown on a
+        new visualizer (see Visualizer).
+
+        Preconditions:
+        - log.num_rounds > 0
+        """
+        self.log = log
+        self.elevators = [Elevator(capacity) for capacity in log.elevator_capacities]
+        self.visualizer = Visualizer(self.elevators, log.num_floors, visualize, frames)
+        self._clock = RoundClock()
+        self.round_num = 0
+        self.waiting = {}
+        self._people = {}
+        self._next_person = 0
+        self.seek(0)
+
+    def seek(self, round_num: int) -> None:
+        """Jump to the start of the given round, and show it.
+
+        Preconditions:
+        - 0 <= round_num <= self.log.num_rounds
+        """
+        keyframe_round, keyframe = self.log.keyframe_before(round_num)
+        self._next_person, floors, passengers, waiting = keyframe
+        self._clock.now = keyframe_round
+        self._people = {}
+        for ele, floor, numbers in zip(self.elevators, floors, passengers):
+            ele.current_floor = floor
+            ele.target_floor = floor
+            ele.passengers = PassengerIndex()
+            for number in numbers:
+                ele.passengers.append(self._person(number))
+        self.waiting = {floor: [] for floor in range(1, self.log.num_floors + 1)}
+        for floor, numbers in waiting.items():
+            self.waiting[floor] = [self._person(number) for number in numbers]
+
+        self.round_num = keyframe_round
+        while self.round_num < round_num:
+            self._apply(False)
+        self.visualizer.render_header(self.log.first_round + self.round_num)
+        self.visualizer.show_state(self.elevators, self.waiting)
+
+    def play_round(self) -> None:
+        """Play the current round, and move on to the next one.
+
+        Preconditions:
+        - self.round_num < self.log.num_rounds
+        """
+        self.visualizer.render_header(self.log.first_round + self.round_num)
+        self._apply(True)
+
+    def play(self, stop: int, speed: float = 1.0) -> None:
+        """Play rounds until the start of round stop, speed times as fast as a
+        simulation is visualized.
+
+        Preconditions:
+        - self.round_num <= stop <= self.log.num_rounds
+        - speed > 0
+        """
+        self.visualizer.set_speed(speed)
+        while self.round_num < stop:
+            self.play_round()
+            self.visualizer.wait(1 / speed)
+
+    def _apply(self, show: bool) -> None:
+        """Apply the events of the current round, showing them on the visualizer if
+        show is True, and move on to the next round.
+        """
+        events = self.log.events(self.round_num)
+        i = 1
+        disembarkings = []
+        for _ in range(events[0]):
+            disembarkings.append((self._people.pop(events[i]),
+                                  self.elevators[events[i + 1]]))
+            i += 2
+        for ele in {ele for _, ele in disembarkings}:
+            ele.passengers.pop_target(ele.current_floor)
+        for person, _ in disembarkings:
+            person.stop_waiting()
+        if show:
+            self.visualizer.show_disembarkings(disembarkings)
+
+        num_arrived = events[i]
+        i += 1
+        for number in range(self._next_person, self._next_person + num_arrived):
+            person = self._person(number)
+            self.waiting[person.start].append(person)
+        self._next_person += num_arrived
+        if show and num_arrived:
+            self.visualizer.show_arrivals(self.waiting)
+
+        boardings = []
+        for _ in range(events[i]):
+            person, ele = self._people[events[i + 1]], self.elevators[events[i + 2]]
+            self.waiting[person.start].remove(person)
+            ele.passengers.append(person)
+            boardings.append((person, ele))
+            i += 2
+        i += 1
+        if show:
+            self.visualizer.show_boardings(boardings)
+
+        directions = [Direction(value) for value in events[i:]]
+        for ele, direction in zip(self.elevators, directions):
+            ele.current_floor += direction.value
+            ele.target_floor = ele.current_floor
+        if show:
+            self.visualizer.show_elevator_moves(self.elevators, directions)
+
+        self._clock.now += 1
+        self.round_num += 1
+
+    def _person(self, number: int) -> Person:
+        """Return a new replayed person for the person with the given number, who
+        has been waiting since they arrived.
+        """
+        start, target, arrival_round = self.log.person(number)
+        person = Person(start, target)
+        person.start_waiting(self._clock)
+        person.wait_time = self._clock.now - arrival_round
+        self._people[number] = person
+        return person
+
+
+###############################################################################
+# Command-line interface
+###############################################################################
+def main(argv: Optional[list[str]] = None) -> None:
+    """Replay the event log given on the command line."""
+    parser = argparse.ArgumentParser(description='Replay a recorded elevator simulation.')
+    parser.add_argument('log')
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--stop', type=int, default=None)
+    parser.add_argument('--speed', type=float, default=1.0)
+    parser.add_argument('--record', metavar='PATH', default=None,
+                        help='record the frames offscreen instead (see a1_frames.py)')
+    parser.add_argument('--every', type=int, default=1,
+                        help='only record every this many frames')
+    args = parser.parse_args(argv)
+
+    log = load_event_log(args.log)
+    stop = log.num_rounds if args.stop is None else min(args.stop, log.num_rounds)
+    frames = None if args.record is None else FrameWriter(args.record, args.every)
+    replay = Replay(log, True, frames)
+    replay.visualizer.set_speed(args.speed)
+    replay.seek(min(args.start, stop))
+
+    paused = False
+    while replay.round_num < stop or paused:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.display.quit()
+                return
+            paused = _handle_key(replay, event, paused)
+        if not paused and replay.round_num < stop:
+            replay.play_round()
+            replay.visualizer.wait(1 / args.speed)
+        elif paused:
+            replay.visualizer.wait(0.05)
+
+    if frames is not None:
+        frames.close()
+    replay.visualizer.wait_for_exit()
+
+
+def _handle_key(replay: Replay, event: pygame.event.Event, paused: bool) -> bool:
+    """Jump or pause the given replay if the given event is a key press, and return
+    whether the replay is paused afterwards.
+    """
+    if event.type != pygame.KEYDOWN:
+        return paused
+    if event.key == pygame.K_LEFT:
+        replay.seek(max(replay.round_num - SEEK_STEP, 0))
+    elif event.key == pygame.K_RIGHT:
+        replay.seek(min(replay.round_num + SEEK_STEP, replay.log.num_rounds))
+    elif event.key == pygame.K_SPACE:
+        return not paused
+    return paused
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""CSC148 Assignment 1 - Frame writer
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains FrameWriter, which saves the frames a visualized simulation
+renders, so that visual reports can be made on machines without a display. Pass
+one to a visualized simulation with the 'frame_writer' config key:
+
+    frames = FrameWriter('frames', every=5)
+    config['visualize'] = True
+    config['frame_writer'] = frames
+    Simulation(config).run(num_rounds)
+    frames.close()
+
+While a simulation has a frame writer, its visualizer renders as fast as it can:
+frames aren't throttled to FPS, the pause after each round is skipped, and the run
+returns without waiting for the window to be closed. It renders offscreen with
+SDL's dummy video driver, unless Pygame's display is already initialized (see
+Visualizer).
+
+Frames are written either as numbered PNG images in a directory, or (if the path
+ends with .raw) appended to a single stream of raw RGB24 frames, which can be
+turned into a video with, for example:
+
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 900x700 -r 60 -i frames.raw report.mp4
+"""
+from __future__ import annotations
+import os
+from typing import BinaryIO, Optional
+
+import pygame
+from a1_contracts import check_contracts
+
+
+@check_contracts
+class FrameWriter:
+    """A writer of every few rendered frames of a visualized simulation.
+
+    Instance Attributes:
+    - path: the directory the PNG images are written to, or the raw stream file
+    - every: only every this many rendered frames are written, starting with the first
+    - frames_rendered: the number of frames rendered so far
+    - frames_written: the number of frames written so far
+
+    Representation Invariants:
+    - self.every >= 1
+    - 0 <= self.frames_written <= self.frames_rendered
+    """
+    path: str
+    every: int
+    frames_rendered: int
+    frames_written: int
+    # Private Instance Attributes:
+    # - _stream: the open raw stream file, or None if writing PNG images (or closed)
+    _stream: Optional[BinaryIO]
+
+    def __init__(self, path: str, every: int = 1) -> None:
+        """Initialize a new frame writer to the given path, creating the directory
+        or the (empty) raw stream file.
+
+        Preconditions:
+        - every >= 1
+        """
+        self.path = path
+        self.every = every
+        self.frames_rendered = 0
+        self.frames_written = 0
+        self._stream = None
+        if self.is_raw():
+            self._stream = open(path, 'wb')
+        else:
+            os.makedirs(path, exist_ok=True)
+
+    def is_raw(self) -> bool:
+        """Return whether this writer writes a raw RGB24 stream rather than PNG images."""
+        return self.path.endswith('.raw')
+
+    def write(self, surface: pygame.Surface) -> None:
+        """Count the given rendered frame, and write it if it is one of every
+        self.every frames.
+
+        Preconditions:
+        - this writer hasn't been closed
+        """
+        if self.frames_rendered % self.every == 0:
+            if self._stream is not None:
+                self._stream.write(pygame.image.tobytes(surface, 'RGB'))
+            else:
+                pygame.image.save(surface, os.path.join(
+                    self.path, f'frame{self.frames_written:06d}.png'))
+            self.frames_written += 1
+        self.frames_rendered += 1
+
+    def close(self) -> None:
+        """Close the raw stream file, if there is one."""
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,151 @@
+"""CSC148 Assignment 1 - Stage profiler
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains StageProfiler, which times the five stages of every round of
+a simulation. Pass one to a simulation with the 'profiler' config key:
+
+    profiler = StageProfiler(memory_every=100)
+    config['profiler'] = profiler
+    stats = Simulation(config).run(num_rounds)
+    print(profiler.format_report())
+
+Stage times are measured with time.perf_counter_ns. If memory_every is positive,
+the profiler also traces memory allocations with tracemalloc, and records the
+traced memory every memory_every rounds, along with the biggest allocation sites
+at the last of those rounds. Tracing memory slows the simulation down a lot, so
+compare stage times from runs without it.
+"""
+from __future__ import annotations
+import array
+import tracemalloc
+from typing import Any
+from a1_contracts import check_contracts
+
+# The stages of a round, in order
+STAGES = ['disembarking', 'arrivals', 'boarding', 'moving', 'wait_times']
+
+# The number of allocation sites reported from the last memory snapshot
+TOP_ALLOCATIONS = 10
+
+
+@check_contracts
+class StageProfiler:
+    """A profiler of the stages of the rounds of a simulation.
+
+    Instance Attributes:
+    - memory_every: record traced memory every this many rounds, or 0 to not trace memory
+    - stage_ns: the total nanoseconds spent in each stage, in the order of STAGES
+    - memory: (round, current bytes, peak bytes) for each memory recording
+    - top_allocations: the biggest allocation sites at the last memory recording
+
+    Representation Invariants:
+    - self.memory_every >= 0
+    - len(self.stage_ns) == len(STAGES)
+    """
+    memory_every: int
+    stage_ns: list[int]
+    memory: list[tuple[int, int, int]]
+    top_allocations: list[str]
+    # Private Instance Attributes:
+    # - _round_ns: the nanoseconds taken by each profiled round, in order
+    # - _started_tracing: whether this profiler started tracemalloc
+    _round_ns: array.array
+    _started_tracing: bool
+
+    def __init__(self, memory_every: int = 0) -> None:
+        """Initialize a new profiler that hasn't profiled any rounds.
+
+        Preconditions:
+        - memory_every >= 0
+        """
+        self.memory_every = memory_every
+        self.stage_ns = [0] * len(STAGES)
+        self.memory = []
+        self.top_allocations = []
+        self._round_ns = array.array('q')
+        self._started_tracing = False
+
+    def start_round(self) -> None:
+        """Prepare to profile the next round."""
+        if self.memory_every and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def end_round(self, round_num: int, times: list[int]) -> None:
+        """Record the given round, where times are perf_counter_ns timestamps taken
+        before the first stage and after each stage.
+
+        Preconditions:
+        - len(times) == len(STAGES) + 1
+        """
+        for stage in range(len(STAGES)):
+            self.stage_ns[stage] += times[stage + 1] - times[stage]
+        self._round_ns.append(times[-1] - times[0])
+
+        if self.memory_every and round_num % self.memory_every == 0 \
+                and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            self.memory.append((round_num, current, peak))
+            statistics = tracemalloc.take_snapshot().statistics('lineno')
+            self.top_allocations = [str(stat) for stat in statistics[:TOP_ALLOCATIONS]]
+
+    def stop(self) -> None:
+        """Stop tracing memory, if this profiler started tracing it."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def round_percentile(self, percent: int) -> int:
+        """Return the given percentile of the nanoseconds taken by the profiled rounds,
+        or -1 if no rounds were profiled.
+
+        Preconditions:
+        - 0 < percent <= 100
+        """
+        if not self._round_ns:
+            return -1
+        ordered = sorted(self._round_ns)
+        return ordered[max(-(-percent * len(ordered) // 100) - 1, 0)]
+
+    def report(self) -> dict[str, Any]:
+        """Return a summary of the profiled rounds.
+
+        The summary has the number of profiled rounds, the total milliseconds and
+        share of the time spent in each stage, percentiles of the microseconds taken
+        per round, and the memory recordings.
+        """
+        total = sum(self.stage_ns)
+        return {
+            'rounds': len(self._round_ns),
+            'stages': {name: {'total_ms': ns / 1e6, 'share': ns / total if total else 0.0}
+                       for name, ns in zip(STAGES, self.stage_ns)},
+            'round_us': {name: self.round_percentile(percent) / 1e3
+                         for name, percent in [('p50', 50), ('p95', 95), ('p99', 99),
+                                               ('max', 100)]},
+            'memory': list(self.memory),
+            'top_allocations': list(self.top_allocations)
+        }
+
+    def format_report(self) -> str:
+        """Return the summary of the profiled rounds as a table."""
+        report = self.report()
+        lines = [f'{report["rounds"]} rounds',
+                 f'{"stage":>14}  {"total ms":>10}  {"share":>6}']
+        for name, stage in report['stages'].items():
+            lines.append(f'{name:>14}  {stage["total_ms"]:10.2f}  {stage["share"]:6.1%}')
+        lines.append('round us: ' + '  '.join(f'{name} {value:.1f}'
+                                              for name, value in report['round_us'].items()))
+        for round_num, current, peak in report['memory']:
+            lines.append(f'round {round_num}: {current / 1e6:.2f} MB traced, '
+                         f'{peak / 1e6:.2f} MB peak')
+        lines.extend(report['top_allocations'])
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
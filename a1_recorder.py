@@ -0,0 +1,197 @@
+"""CSC148 Assignment 1 - Round recorder
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains RoundRecorder, which records a row of metrics at the end of
+every round of a simulation. Pass one to a simulation with the 'recorder' config key:
+
+    recorder = RoundRecorder(num_floors, num_elevators, 'rounds.csv')
+    config['recorder'] = recorder
+    Simulation(config).run(num_rounds)
+    recorder.close()
+
+Each row has these columns (see RoundRecorder.header):
+- round: the round number
+- queue_<f>: the number of people waiting on floor f
+- load_<e>: the number of passengers on elevator e (numbered from 0)
+- boardings, disembarkings: how many people got on and off elevators this round
+- direction_changes: how many elevators started moving in the opposite direction
+  to the one they last moved in
+- people_in_system: the number of people waiting or riding
+
+Rows are written into a preallocated buffer of integers. When the buffer is full,
+it is appended to the CSV file, if there is one; otherwise the buffer wraps around,
+keeping only the latest rows.
+"""
+from __future__ import annotations
+import array
+import csv
+from typing import Optional
+from a1_contracts import check_contracts
+
+from a1_entities import Elevator, FloorQueue
+
+# The number of rounds buffered by default
+DEFAULT_CHUNK_ROUNDS = 1024
+
+
+@check_contracts
+class RoundRecorder:
+    """A recorder of per-round simulation metrics.
+
+    Instance Attributes:
+    - num_floors: the number of floors in the recorded simulation
+    - num_elevators: the number of elevators in the recorded simulation
+    - filename: the CSV file the rows are written to, or None to keep them in memory
+    - chunk_rounds: the number of rows the buffer holds
+
+    Representation Invariants:
+    - self.num_floors >= 2
+    - self.num_elevators >= 1
+    - self.chunk_rounds >= 1
+    """
+    num_floors: int
+    num_elevators: int
+    filename: Optional[str]
+    chunk_rounds: int
+    # Private Instance Attributes:
+    # - _width: the number of columns in a row
+    # - _buffer: chunk_rounds rows of _width integers each
+    # - _next_row: the row of _buffer that the next round is recorded in
+    # - _num_rows: the number of rows recorded since the buffer was last flushed
+    # - _last_floors: each elevator's floor when the last round was recorded
+    # - _last_directions: the direction (1 or -1) each elevator last moved in, or 0
+    _width: int
+    _buffer: array.array
+    _next_row: int
+    _num_rows: int
+    _last_floors: list[int]
+    _last_directions: list[int]
+
+    def __init__(self, num_floors: int, num_elevators: int,
+                 filename: Optional[str] = None,
+                 chunk_rounds: int = DEFAULT_CHUNK_ROUNDS) -> None:
+        """Initialize a new recorder for a simulation with the given number of floors
+        and elevators. If filename is given, the file is created and the header is
+        written to it.
+
+        Preconditions:
+        - num_floors >= 2
+        - num_elevators >= 1
+        - chunk_rounds >= 1
+        """
+        self.num_floors = num_floors
+        self.num_elevators = num_elevators
+        self.filename = filename
+        self.chunk_rounds = chunk_rounds
+        self._width = len(self.header())
+        self._buffer = array.array('q', bytes(8 * chunk_rounds * self._width))
+        self._next_row = 0
+        self._num_rows = 0
+        self._last_floors = [1] * num_elevators
+        self._last_directions = [0] * num_elevators
+
+        if filename is not None:
+            self._write_header()
+
+    def header(self) -> list[str]:
+        """Return the names of the columns of each row.
+
+        >>> RoundRecorder(2, 1).header()
+        ['round', 'queue_1', 'queue_2', 'load_0', 'boardings', 'disembarkings', \
+'direction_changes', 'people_in_system']
+        """
+        return (['round'] + [f'queue_{floor}' for floor in range(1, self.num_floors + 1)]
+                + [f'load_{i}' for i in range(self.num_elevators)]
+                + ['boardings', 'disembarkings', 'direction_changes', 'people_in_system'])
+
+    def record(self, round_num: int, waiting: dict[int, FloorQueue],
+               elevators: list[Elevator], boardings: int, disembarkings: int,
+               people_in_system: int) -> None:
+        """Record the row for the given round, which has just finished.
+
+        Preconditions:
+        - waiting and elevators are from the simulation this recorder was made for
+        """
+        buffer = self._buffer
+        i = self._next_row * self._width
+        buffer[i] = round_num
+        i += 1
+        for floor in range(1, self.num_floors + 1):
+            buffer[i] = len(waiting[floor])
+            i += 1
+
+        direction_changes = 0
+        for e, elevator in enumerate(elevators):
+            buffer[i] = len(elevator.passengers)
+            i += 1
+            direction = elevator.current_floor - self._last_floors[e]
+            if direction:
+                if direction == -self._last_directions[e]:
+                    direction_changes += 1
+                self._last_directions[e] = direction
+                self._last_floors[e] = elevator.current_floor
+
+        buffer[i:i + 4] = array.array('q', [boardings, disembarkings, direction_changes,
+                                            people_in_system])
+        self._num_rows = min(self._num_rows + 1, self.chunk_rounds)
+        self._next_row += 1
+        if self._next_row == self.chunk_rounds:
+            if self.filename is not None:
+                self.flush()
+            else:
+                self._next_row = 0
+
+    def rows(self) -> list[list[int]]:
+        """Return the rows recorded since the buffer was last flushed, oldest first."""
+        first = (self._next_row - self._num_rows) % self.chunk_rounds
+        rows = []
+        for row in range(first, first + self._num_rows):
+            start = row % self.chunk_rounds * self._width
+            rows.append(self._buffer[start:start + self._width].tolist())
+        return rows
+
+    def flush(self) -> None:
+        """Append the buffered rows to the CSV file, and empty the buffer.
+
+        Preconditions:
+        - self.filename is not None
+        """
+        with open(self.filename, 'a', newline='') as file:
+            csv.writer(file).writerows(self.rows())
+        self._next_row = 0
+        self._num_rows = 0
+
+    def reset(self) -> None:
+        """Start recording over, for a simulation that has been reset: forget the
+        buffered rows and where the elevators last moved, and if there is a CSV
+        file, empty it down to the header.
+        """
+        self._next_row = 0
+        self._num_rows = 0
+        self._last_floors = [1] * self.num_elevators
+        self._last_directions = [0] * self.num_elevators
+        if self.filename is not None:
+            self._write_header()
+
+    def _write_header(self) -> None:
+        """Create the CSV file, with just the header in it.
+
+        Preconditions:
+        - self.filename is not None
+        """
+        with open(self.filename, 'w', newline='') as file:
+            csv.writer(file).writerow(self.header())
+
+    def close(self) -> None:
+        """Write any buffered rows to the CSV file, if there is one."""
+        if self.filename is not None and self._num_rows:
+            self.flush()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,207 @@
+"""CSC148 Assignment 1 - Monte Carlo replications
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module runs independent replicas of one stochastic simulation task (as
+described in a1_sweep.py) in parallel, each with its own seed, and reports the mean
+and a confidence interval of each statistic over the replicas. Rather than running
+a fixed number of replicas, it stops as soon as the confidence interval of every
+requested statistic is narrower than a target width. Run it from the command line,
+for example:
+
+    python a1_replicate.py --floors 20 --elevators 4 --capacity 8 \\
+        --arrivals OfficeDay:2 --algorithm CollectiveControl --rounds 1000 \\
+        --target avg_time=2 --target p95_time=10
+
+Replica i gets seed task_seed(seed, i), and the stopping rule only looks at the
+first replicas in order of i, so the replicas used (and so the results) are the
+same no matter how the replicas are scheduled.
+"""
+from __future__ import annotations
+import argparse
+import concurrent.futures
+import math
+import os
+from statistics import NormalDist, fmean, stdev
+from typing import Any, Optional
+
+from a1_sweep import MOVING_ALGORITHMS, run_task, task_seed
+
+# The default confidence level of the intervals
+DEFAULT_CONFIDENCE = 0.95
+# The default smallest and largest numbers of replicas to run
+DEFAULT_MIN_REPLICAS = 5
+DEFAULT_MAX_REPLICAS = 200
+
+
+###############################################################################
+# Confidence intervals
+###############################################################################
+def t_quantile(p: float, df: int) -> float:
+    """Return the p quantile of Student's t distribution with df degrees of freedom.
+
+    This uses the Cornish-Fisher expansion around the normal distribution, which is
+    accurate to about 1% for df >= 2.
+
+    Preconditions:
+    - 0 < p < 1
+    - df >= 1
+
+    >>> round(t_quantile(0.975, 4), 3)
+    2.776
+    >>> round(t_quantile(0.975, 1000), 2)
+    1.96
+    """
+    z = NormalDist().inv_cdf(p)
+    terms = [z,
+             (z ** 3 + z) / 4,
+             (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96,
+             (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384,
+             (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160]
+    return sum(term / df ** power for power, term in enumerate(terms))
+
+
+def confidence_interval(values: list[float],
+                        confidence: float = DEFAULT_CONFIDENCE) -> dict[str, float]:
+    """Return the mean of values, and the half width and bounds of its confidence
+    interval at the given confidence level.
+
+    Preconditions:
+    - len(values) >= 2
+    - 0 < confidence < 1
+
+    >>> interval = confidence_interval([10.0, 12.0, 11.0, 13.0, 9.0])
+    >>> interval['mean'], round(interval['half_width'], 3)
+    (11.0, 1.963)
+    """
+    mean = fmean(values)
+    half_width = (t_quantile((1 + confidence) / 2, len(values) - 1)
+                  * stdev(values) / math.sqrt(len(values)))
+    return {'mean': mean, 'half_width': half_width,
+            'low': mean - half_width, 'high': mean + half_width}
+
+
+###############################################################################
+# Running replicas
+###############################################################################
+def replicate(task: dict[str, Any], targets: dict[str, float],
+              confidence: float = DEFAULT_CONFIDENCE, seed: int = 0,
+              min_replicas: int = DEFAULT_MIN_REPLICAS,
+              max_replicas: int = DEFAULT_MAX_REPLICAS,
+              max_workers: Optional[int] = None) -> dict[str, Any]:
+    """Run replicas of the given task across a pool of worker processes until the
+    confidence interval of each statistic in targets is at most as wide as its
+    target (or max_replicas replicas have run), and return a summary of them.
+
+    The summary has:
+    - 'replicas': the number of replicas the summary is over
+    - 'converged': whether every interval met its target
+    - 'statistics': for each statistic in targets, its confidence interval
+      (see confidence_interval)
+    - 'results': the results of the replicas (see a1_sweep.run_task), in order
+
+    max_workers defaults to the number of CPUs.
+
+    Preconditions:
+    - task has a value for every key in a1_sweep.SWEEP_KEYS, and 'num_rounds'
+    - targets is not empty, and every target is > 0
+    - 0 < confidence < 1
+    - 3 <= min_replicas <= max_replicas
+    """
+    num_workers = max_workers or os.cpu_count() or 1
+    results = {}
+    summary = None
+    next_replica = 0
+    with concurrent.futures.ProcessPoolExecutor(num_workers) as executor:
+        # Keep every worker busy, but don't queue up replicas that may not be needed
+        pending = set()
+        while summary is None:
+            while next_replica < max_replicas and len(pending) < num_workers:
+                replica = dict(task, task_id=next_replica,
+                               seed=task_seed(seed, next_replica))
+                pending.add(executor.submit(run_task, replica))
+                next_replica += 1
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[result['task_id']] = result
+
+            ordered = []
+            while len(ordered) in results:
+                ordered.append(results[len(ordered)])
+            if len(ordered) >= min_replicas:
+                summary = _summarize(ordered, targets, confidence)
+                if not summary['converged'] and len(ordered) < max_replicas:
+                    summary = None
+        for future in pending:
+            future.cancel()
+    return summary
+
+
+def _summarize(results: list[dict[str, Any]], targets: dict[str, float],
+               confidence: float) -> dict[str, Any]:
+    """Return the summary of the given replica results, as returned by replicate."""
+    statistics = {name: confidence_interval([float(result[name]) for result in results],
+                                            confidence)
+                  for name in targets}
+    return {
+        'replicas': len(results),
+        'converged': all(2 * statistics[name]['half_width'] <= target
+                         for name, target in targets.items()),
+        'statistics': statistics,
+        'results': results
+    }
+
+
+###############################################################################
+# Command-line interface
+###############################################################################
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the replicas described on the command line, and print the intervals."""
+    parser = argparse.ArgumentParser(
+        description='Replicate an elevator simulation until its statistics converge.')
+    parser.add_argument('--floors', type=int, required=True)
+    parser.add_argument('--elevators', type=int, required=True)
+    parser.add_argument('--capacity', type=int, required=True)
+    parser.add_argument('--arrivals', default='SingleArrivals')
+    parser.add_argument('--algorithm', choices=list(MOVING_ALGORITHMS),
+                        default='FurthestFloor')
+    parser.add_argument('--rounds', type=int, default=500)
+    parser.add_argument('--target', action='append', required=True,
+                        metavar='STATISTIC=WIDTH',
+                        help='the widest acceptable interval of a statistic')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-replicas', type=int, default=DEFAULT_MIN_REPLICAS)
+    parser.add_argument('--max-replicas', type=int, default=DEFAULT_MAX_REPLICAS)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    targets = {}
+    for target in args.target:
+        name, _, width = target.partition('=')
+        targets[name] = float(width)
+    task = {
+        'num_floors': args.floors,
+        'num_elevators': args.elevators,
+        'elevator_capacity': args.capacity,
+        'arrival_generator': args.arrivals,
+        'moving_algorithm': args.algorithm,
+        'num_rounds': args.rounds
+    }
+    summary = replicate(task, targets, args.confidence, args.seed, args.min_replicas,
+                        args.max_replicas, args.workers)
+
+    status = 'converged' if summary['converged'] else 'did not converge'
+    print(f'{summary["replicas"]} replicas, {status}')
+    for name, interval in summary['statistics'].items():
+        print(f'{name:>18}  {interval["mean"]:10.2f} +/- {interval["half_width"]:.2f}  '
+              f'(target width {targets[name]:g})')
+
+
+if __name__ == '__main__':
+    main()
@@ -12,9 +12,18 @@ Add your own to practice writing tests and to be confident your code is correct.
 
 Note: this file is for support purposes only, and is not part of your submission.
 """
-from a1_entities import Person, Elevator
-from a1_algorithms import SingleArrivals, FileArrivals, EndToEndLoop, FurthestFloor
+import os
+
+import pygame
+import pytest
+
+import a1_contracts
+import a1_visualizer
+from a1_entities import Person, Elevator, FloorQueue
+from a1_algorithms import SingleArrivals, FileArrivals, StreamingFileArrivals, EndToEndLoop, \
+    FurthestFloor
 from a1_simulation import Simulation
+from a1_visualizer import PersonSprite
 
 
 ###############################################################################
@@ -28,6 +37,52 @@ def test_person_initializer() -> None:
     assert person.wait_time == 0
 
 
+def test_person_is_headless() -> None:
+    """Test that a person created outside of a visualizer carries no sprite state."""
+    person = Person(1, 5)
+    assert not hasattr(person, 'image')
+    assert not hasattr(person, 'rect')
+
+
+def test_floor_queue_pop_going_either_way_keeps_arrival_order() -> None:
+    """Test that FloorQueue.pop_going takes people from both directions in the order
+    they arrived when direction is 0, and respects the limit.
+    """
+    queue = FloorQueue(3)
+    down1, up1, down2 = Person(3, 1), Person(3, 6), Person(3, 2)
+    queue.extend([down1, up1, down2])
+
+    assert queue.pop_going(0, 2) == [down1, up1]
+    assert (queue.num_up, queue.num_down) == (0, 1)
+    assert list(queue) == [down2]
+
+
+def test_passenger_index_groups_by_target() -> None:
+    """Test that an elevator's passengers can be removed by target floor, and that the
+    lowest and highest targets are kept up to date.
+    """
+    elevator = Elevator(5)
+    to_four, to_two, also_to_four = Person(1, 4), Person(1, 2), Person(1, 4)
+    for person in [to_four, to_two, also_to_four]:
+        elevator.passengers.append(person)
+    assert (elevator.passengers.min_target(), elevator.passengers.max_target()) == (2, 4)
+
+    assert elevator.passengers.pop_target(4) == [to_four, also_to_four]
+    assert list(elevator.passengers) == [to_two]
+    assert elevator.passengers.max_target() == 2
+    assert elevator.fullness() == 0.2
+
+
+def test_headless_simulation_never_initializes_pygame(monkeypatch) -> None:
+    """Test that running a simulation with visualize=False never initializes Pygame
+    or opens a window.
+    """
+    for name in ['init', 'display.init', 'display.set_mode', 'font.init']:
+        monkeypatch.setattr(f'pygame.{name}', lambda *args, **kwargs: pytest.fail())
+    simulation = Simulation(get_example_config())
+    simulation.run(5)
+
+
 def test_simulation_initializer_num_floors() -> None:
     """Test the simulation initializer for the num_floors attribute."""
     config = get_example_config()  # See "Helpers" at the bottom of this file
@@ -93,7 +148,8 @@ def test_simple_stats_correct_keys() -> None:
     stats = simulation.run(5)
 
     actual = sorted(stats.keys())
-    expected = ['avg_time', 'max_time', 'num_rounds', 'people_completed', 'total_people']
+    expected = ['avg_time', 'max_time', 'num_rounds', 'p50_time', 'p95_time', 'p99_time',
+                'people_completed', 'people_in_system', 'total_people']
 
     assert actual == expected
 
@@ -108,6 +164,29 @@ def test_simple_stats_num_rounds() -> None:
     assert stats['num_rounds'] == num_rounds
 
 
+def test_update_wait_times_counts_new_arrivals() -> None:
+    """Test that update_wait_times increases the waiting time of people who have arrived."""
+    simulation = Simulation(get_example_config())
+    first = simulation.generate_arrivals(0)[0]
+    simulation.update_wait_times()
+    second = simulation.generate_arrivals(1)[0]
+    simulation.update_wait_times()
+
+    assert first.wait_time == 2
+    assert second.wait_time == 1
+
+
+def test_wait_stats_percentiles() -> None:
+    """Test that WaitStats reports the same statistics as the wait times it was given."""
+    from a1_stats import WaitStats
+
+    stats = WaitStats()
+    stats.extend(range(100, 0, -1))
+
+    assert stats.report() == {'people_completed': 100, 'max_time': 100, 'avg_time': 50,
+                              'p50_time': 50, 'p95_time': 95, 'p99_time': 99}
+
+
 ###############################################################################
 # Sample tests for Part 5
 ###############################################################################
@@ -149,6 +228,759 @@ def test_furthest_floor_simple() -> None:
     assert elevator.target_floor == 5
 
 
+def test_furthest_floor_uses_occupied_floors() -> None:
+    """Test that FurthestFloor picks the same floor whether the waiting people
+    come as a WaitingFloors or a plain dictionary, and that WaitingFloors keeps
+    track of the floors with people waiting.
+    """
+    from a1_entities import WaitingFloors
+
+    waiting = WaitingFloors(7)
+    waiting[2].append(Person(2, 6))
+    waiting[6].append(Person(6, 1))
+    waiting[7].append(Person(7, 1))
+    waiting[7].pop_going(-1, 1)
+    assert list(waiting.occupied) == [2, 6]
+
+    for current_floor, expected in [(4, 2), (5, 2), (1, 6)]:
+        for floors in [waiting, {floor: list(waiting[floor]) for floor in waiting}]:
+            elevator = Elevator(3)
+            elevator.current_floor = elevator.target_floor = current_floor
+            FurthestFloor().update_target_floors([elevator], floors, 7)
+            assert elevator.target_floor == expected
+
+
+def test_waiting_floors_track_calls() -> None:
+    """Test that WaitingFloors keeps track of the floors with people waiting to go
+    up and down as they arrive and board.
+    """
+    from a1_entities import WaitingFloors
+
+    waiting = WaitingFloors(6)
+    waiting[3].extend([Person(3, 5), Person(3, 1)])
+    waiting[5].append(Person(5, 2))
+    assert (waiting.occupied.up_calls, waiting.occupied.down_calls) == (0b1000, 0b101000)
+
+    waiting[3].pop_going(1, 1)
+    waiting[5].pop_going(0, 1)
+    assert (waiting.occupied.up_calls, waiting.occupied.down_calls) == (0, 0b1000)
+    assert list(waiting.occupied) == [3]
+
+    waiting.clear_queues()
+    assert (waiting.occupied.up_calls, waiting.occupied.down_calls) == (0, 0)
+
+
+def test_collective_control_sweeps() -> None:
+    """Test that CollectiveControl only answers the calls going an elevator's way,
+    stops at the nearest call ahead, and sends one free elevator to each call.
+    """
+    from a1_algorithms import CollectiveControl
+    from a1_entities import WaitingFloors
+
+    waiting = WaitingFloors(8)
+    waiting[5].append(Person(5, 8))
+    waiting[4].append(Person(4, 1))
+    riding, free, far = Elevator(3), Elevator(3), Elevator(3)
+    riding.current_floor = 3
+    riding.passengers.append(Person(1, 7))
+    far.current_floor = far.target_floor = 8
+    algorithm = CollectiveControl()
+
+    # The up call at 5 is on the riding elevator's way, but the down call at 4 isn't
+    algorithm.update_target_floors([riding, free, far], waiting, 8)
+    assert (riding.target_floor, free.target_floor, far.target_floor) == (5, 4, 8)
+
+    # After picking the person at 5 up, it stops at 7 before going on to 8
+    riding.current_floor = 5
+    riding.passengers.append(waiting[5].pop_going(1, 1)[0])
+    algorithm.update_target_floors([riding, free, far], waiting, 8)
+    assert riding.target_floor == 7
+
+    # Once nothing is left ahead, it is free to answer calls the other way
+    riding.current_floor = 8
+    riding.passengers.clear()
+    waiting[4].pop_going(-1, 1)
+    waiting[2].append(Person(2, 1))
+    algorithm.update_target_floors([riding, free, far], waiting, 8)
+    assert [ele.target_floor for ele in [riding, free, far]].count(2) == 1
+    assert algorithm.idle_rounds([far], 8) is None
+
+
+def test_collective_control_beats_furthest_floor() -> None:
+    """Test that CollectiveControl serves people travelling between all floors, in
+    both directions, faster than FurthestFloor does.
+    """
+    from a1_algorithms import CollectiveControl
+    from a1_traffic import PoissonArrivals, interfloor
+
+    stats = {}
+    for algorithm in [CollectiveControl, FurthestFloor]:
+        config = {
+            'num_floors': 10,
+            'num_elevators': 3,
+            'elevator_capacity': 6,
+            'arrival_generator': PoissonArrivals(10, [(0, 0.4, interfloor(10))], seed=3),
+            'moving_algorithm': algorithm(),
+            'visualize': False,
+            'contract_checking': False
+        }
+        stats[algorithm] = Simulation(config).run(1000)
+
+    ours, theirs = stats[CollectiveControl], stats[FurthestFloor]
+    assert ours['people_completed'] > theirs['people_completed']
+    assert ours['avg_time'] < theirs['avg_time']
+    assert ours['p95_time'] < theirs['p95_time']
+
+
+def test_collective_control_serves_the_top_floor() -> None:
+    """Test that CollectiveControl doesn't starve the people at the top of the
+    building when everybody is going down, and nearer calls keep coming in.
+    """
+    from a1_algorithms import CollectiveControl
+    from a1_traffic import PoissonArrivals, down_peak
+
+    config = {
+        'num_floors': 15,
+        'num_elevators': 2,
+        'elevator_capacity': 4,
+        'arrival_generator': PoissonArrivals(15, [(0, 0.3, down_peak(15))], seed=5),
+        'moving_algorithm': CollectiveControl(),
+        'visualize': False,
+        'contract_checking': False
+    }
+    sim = Simulation(config)
+    stats = sim.run(1000)
+
+    # Nobody takes, or has been waiting, longer than four trips to the top and back
+    bound = 4 * 2 * (15 - 1)
+    assert stats['max_time'] <= bound
+    assert all(person.wait_time <= bound for floor in sim.waiting.values() for person in floor)
+
+
+def test_destination_dispatch_splits_calls() -> None:
+    """Test that DestinationDispatch sends different elevators to different groups
+    of waiting people, and more than one elevator to a crowded floor.
+    """
+    from a1_dispatch import DestinationDispatch
+    from a1_entities import WaitingFloors
+
+    waiting = WaitingFloors(10)
+    waiting[2].append(Person(2, 5))
+    waiting[9].append(Person(9, 1))
+    elevators = [Elevator(3), Elevator(3)]
+    elevators[1].current_floor = elevators[1].target_floor = 10
+    DestinationDispatch('greedy').update_target_floors(elevators, waiting, 10)
+    assert [ele.target_floor for ele in elevators] == [2, 9]
+
+    waiting = WaitingFloors(10)
+    waiting[1].extend([Person(1, target) for target in range(2, 7)])
+    DestinationDispatch('greedy').update_target_floors(elevators, waiting, 10)
+    assert [ele.target_floor for ele in elevators] == [1, 1]
+
+
+def test_destination_dispatch_leaves_loaded_elevators_on_their_way() -> None:
+    """Test that DestinationDispatch doesn't give an elevator with passengers a
+    group it could only get to after its trip, even if it is the nearest.
+    """
+    from a1_dispatch import DestinationDispatch
+    from a1_entities import WaitingFloors
+
+    waiting = WaitingFloors(20)
+    waiting[4].append(Person(4, 8))
+    elevators = [Elevator(3), Elevator(3)]
+    elevators[0].current_floor = 5
+    elevators[0].target_floor = 9
+    elevators[0].passengers.append(Person(1, 9))
+    elevators[1].current_floor = elevators[1].target_floor = 20
+    DestinationDispatch('greedy').update_target_floors(elevators, waiting, 20)
+    assert [ele.target_floor for ele in elevators] == [9, 4]
+
+
+def test_destination_dispatch_optimal_solver_beats_greedy() -> None:
+    """Test that the optimal solver finds a cheaper assignment than the greedy one
+    where there is one, and that neither makes pairs with an infinite cost.
+    """
+    pytest.importorskip('scipy')
+    import numpy as np
+    from a1_dispatch import DestinationDispatch
+
+    costs = np.array([[1.0, 2.0, np.inf],
+                      [2.0, 100.0, np.inf],
+                      [np.inf, np.inf, np.inf]])
+    assert sorted(DestinationDispatch('greedy').assign(costs)) == [(0, 0), (1, 1)]
+    assert sorted(DestinationDispatch('optimal').assign(costs)) == [(0, 1), (1, 0)]
+
+
+###############################################################################
+# Skip-ahead tests
+###############################################################################
+def test_skip_idle_matches_stepping(tmp_path) -> None:
+    """Test that skipping idle rounds gives the same statistics and leaves the
+    elevators in the same place as stepping through every round.
+    """
+    trace = tmp_path / 'sparse.csv'
+    trace.write_text('0,1,4\n3,5,2,2,6\n30,6,1\n')
+
+    for moving_algorithm in [EndToEndLoop, FurthestFloor]:
+        results = []
+        for skip_idle in [False, True]:
+            config = get_example_config()
+            config['arrival_generator'] = FileArrivals(6, str(trace))
+            config['moving_algorithm'] = moving_algorithm()
+            config['skip_idle'] = skip_idle
+            sim = Simulation(config)
+            stats = sim.run(45)
+            results.append((stats, [(ele.current_floor, ele.target_floor)
+                                    for ele in sim.elevators]))
+
+        assert results[0] == results[1]
+
+
+def test_file_arrivals_next_arrival_round(tmp_path) -> None:
+    """Test that FileArrivals.next_arrival_round finds the next round with arrivals."""
+    trace = tmp_path / 'sparse.csv'
+    trace.write_text('2,1,4\n10,5,2\n')
+    generator = FileArrivals(5, str(trace))
+
+    assert generator.next_arrival_round(0) == 2
+    assert generator.next_arrival_round(3) == 10
+    assert generator.next_arrival_round(11) is None
+
+
+###############################################################################
+# Snapshot tests
+###############################################################################
+def test_snapshot_resume_and_fork(tmp_path) -> None:
+    """Test that a simulation restored from a snapshot, or forked, continues exactly
+    like the original would have, without sharing any state with it.
+    """
+    trace = tmp_path / 'trace.csv'
+    trace.write_text('0,1,4,6,2\n2,3,5,5,1,2,6\n5,4,1\n9,6,3,1,5\n12,2,4\n')
+
+    def make_config(arrivals: bool = True) -> dict:
+        config = get_example_config()
+        if arrivals:
+            config['arrival_generator'] = StreamingFileArrivals(6, str(trace))
+            config['moving_algorithm'] = FurthestFloor()
+        config['contract_checking'] = False
+        return config
+
+    expected = Simulation(make_config()).run(20)
+    sim = Simulation(make_config())
+    sim.run(7)
+    snapshot = sim.snapshot()
+
+    restored = Simulation(make_config(False))
+    restored.restore(snapshot)
+    forked = sim.fork(make_config(False))
+    assert sim.run(20) == expected
+    assert restored.run(20) == expected
+    assert forked.run(20) == expected
+
+    config = make_config(False)
+    config['num_floors'] = 7
+    with pytest.raises(ValueError):
+        Simulation(config).restore(snapshot)
+
+
+###############################################################################
+# Reuse tests
+###############################################################################
+def test_reset_with_recycled_people_matches_fresh_run() -> None:
+    """Test that a simulation that recycles people, run again after a reset, gives
+    the same statistics as a new simulation.
+    """
+    from a1_algorithms import CollectiveControl
+
+    def make_config(recycle: bool) -> dict:
+        config = get_example_config()
+        config['moving_algorithm'] = CollectiveControl()
+        config['contract_checking'] = False
+        config['recycle_people'] = recycle
+        return config
+
+    expected = Simulation(make_config(False)).run(30)
+    sim = Simulation(make_config(True))
+    assert sim.run(30) == expected
+
+    # Everybody still in the building goes back to the pool
+    sim.reset()
+    assert len(sim._pool) == expected['people_in_system']
+    assert sim.run(30) == expected
+    sim.reset(SingleArrivals(6), CollectiveControl())
+    assert sim.run(30) == expected
+
+
+###############################################################################
+# Event log tests
+###############################################################################
+def test_event_log_replay_seeks_to_recorded_states(tmp_path) -> None:
+    """Test that a replay of a saved event log can jump forwards and backwards to
+    the state the simulation was in at the start of any round.
+    """
+    from a1_algorithms import CollectiveControl
+    from a1_events import EventLog, Replay, load_event_log
+
+    log = EventLog(keyframe_every=10)
+    config = get_example_config()
+    config['moving_algorithm'] = CollectiveControl()
+    config['contract_checking'] = False
+    config['event_log'] = log
+    sim = Simulation(config)
+    expected = {}
+    for num_rounds in [3, 25, 37]:
+        sim.run(num_rounds)
+        expected[num_rounds] = get_simulation_state(sim)
+    log.save(str(tmp_path / 'run.events'))
+
+    replay = Replay(load_event_log(str(tmp_path / 'run.events')), visualize=False)
+    for num_rounds in [37, 3, 25]:
+        replay.seek(num_rounds)
+        assert get_state(replay.elevators, replay.waiting) == expected[num_rounds]
+    replay.seek(20)
+    replay.play(25)
+    assert get_state(replay.elevators, replay.waiting) == expected[25]
+
+
+def test_event_log_starts_over_when_simulation_is_reset_or_restored() -> None:
+    """Test that a simulation's event log only holds the rounds run since it was
+    last reset or restored from a snapshot.
+    """
+    from a1_algorithms import CollectiveControl
+    from a1_events import EventLog, Replay
+
+    log = EventLog(keyframe_every=10)
+    config = get_example_config()
+    config['moving_algorithm'] = CollectiveControl()
+    config['contract_checking'] = False
+    config['event_log'] = log
+    sim = Simulation(config)
+    sim.run(25)
+    sim.reset()
+    sim.run(25)
+    assert log.num_rounds == 25
+    replay = Replay(log, visualize=False)
+    replay.seek(25)
+    assert get_state(replay.elevators, replay.waiting) == get_simulation_state(sim)
+
+    # People already in the building when the log starts over are replayed too
+    sim.run(32)
+    snapshot = sim.snapshot()
+    sim.run(45)
+    expected = get_simulation_state(sim)
+    sim.restore(snapshot)
+    sim.run(45)
+    assert (log.first_round, log.num_rounds) == (32, 13)
+    replay = Replay(log, visualize=False)
+    replay.seek(13)
+    assert get_state(replay.elevators, replay.waiting) == expected
+
+
+###############################################################################
+# Streaming arrival tests
+###############################################################################
+def test_streaming_file_arrivals_matches_file_arrivals(tmp_path) -> None:
+    """Test that StreamingFileArrivals generates the same arrivals as FileArrivals,
+    for sorted and unsorted traces, gzip-compressed or not, where a round's last
+    row wins, and that it only indexes a trace once it finds a row out of order.
+    """
+    import gzip
+
+    rows = {'sorted.csv': '0,1,4,5,2\n2,3,1\n2,2,6,1,3\n7,4,2\n',
+            'unsorted.csv': '7,4,2\n2,3,1\n0,1,4,5,2\n2,2,6,1,3\n'}
+    for name, text in rows.items():
+        plain = tmp_path / name
+        plain.write_text(text)
+        compressed = tmp_path / (name + '.gz')
+        compressed.write_bytes(gzip.compress(text.encode()))
+
+        expected = FileArrivals(6, str(plain))
+        for path in [plain, compressed]:
+            if path == compressed and name == 'unsorted.csv':
+                with pytest.raises(ValueError):
+                    StreamingFileArrivals(6, str(path))
+                continue
+            generator = StreamingFileArrivals(6, str(path))
+            for round_num in list(range(9)) * 2:
+                assert repr(generator.generate(round_num)) == repr(expected.generate(round_num))
+            generator.close()
+
+    late = tmp_path / 'late.csv'
+    late.write_text('0,1,4\n2,3,1\n7,4,2\n5,2,6\n')
+    generator = StreamingFileArrivals(6, str(late))
+    generator.generate(2)
+    assert generator._index is None
+    assert generator.next_arrival_round(3) == 5
+    assert generator._index is not None
+    generator.close()
+
+
+def test_mapped_arrivals_matches_file_arrivals(tmp_path) -> None:
+    """Test that a binary trace converted from a CSV trace generates the same
+    arrivals as FileArrivals, including after pickling.
+    """
+    import pickle
+    pytest.importorskip('numpy')
+    import a1_trace
+
+    csv_trace = tmp_path / 'trace.csv'
+    csv_trace.write_text('0,1,4,5,2,1,3\n2,3,1\n5,2,6\n2,2,6,1,3\n')
+    assert a1_trace.convert_csv(str(csv_trace), str(tmp_path / 'trace.a1t')) == 6
+
+    expected = FileArrivals(6, str(csv_trace))
+    generator = a1_trace.MappedArrivals(6, str(tmp_path / 'trace.a1t'))
+    copy = pickle.loads(pickle.dumps(generator))
+    for round_num in range(7):
+        assert repr(generator.generate(round_num)) == repr(expected.generate(round_num))
+        assert repr(copy.generate(round_num)) == repr(expected.generate(round_num))
+    assert generator.next_arrival_round(3) == 5
+
+
+###############################################################################
+# Stochastic traffic tests
+###############################################################################
+def test_poisson_arrivals_follow_profile() -> None:
+    """Test that PoissonArrivals draws the same arrivals no matter which rounds
+    are asked for first, and only for the floor pairs in the current phase.
+    """
+    pytest.importorskip('numpy')
+    import a1_traffic
+
+    profile = [(0, 3.0, a1_traffic.up_peak(6)), (50, 3.0, a1_traffic.down_peak(6))]
+    forwards = a1_traffic.PoissonArrivals(6, profile, seed=1, block_size=16)
+    backwards = a1_traffic.PoissonArrivals(6, profile, seed=1, block_size=16)
+    backwards.generate(99)
+
+    for round_num in range(100):
+        arrivals = forwards.generate(round_num)
+        assert repr(arrivals) == repr(backwards.generate(round_num))
+        for people in arrivals.values():
+            for person in people:
+                assert (person.start == 1) == (round_num < 50)
+                assert (person.target == 1) == (round_num >= 50)
+
+
+def test_poisson_arrivals_rejects_trips_to_the_same_floor() -> None:
+    """Test that PoissonArrivals refuses an od matrix with a nonzero diagonal."""
+    pytest.importorskip('numpy')
+    import a1_traffic
+
+    matrix = a1_traffic.interfloor(6)
+    matrix[2, 2] = 0.1
+    profile = [(0, 1.0, a1_traffic.up_peak(6)), (50, 1.0, matrix)]
+    with pytest.raises(ValueError):
+        a1_traffic.PoissonArrivals(6, profile)
+
+
+###############################################################################
+# Recorder tests
+###############################################################################
+def test_recorder_rows_match_simulation(tmp_path) -> None:
+    """Test that a RoundRecorder writes one row per round to its CSV file, and
+    that the rows agree with the simulation statistics.
+    """
+    import csv
+    from a1_recorder import RoundRecorder
+
+    config = get_example_config()
+    recorder = RoundRecorder(6, 2, str(tmp_path / 'rounds.csv'), chunk_rounds=4)
+    config['recorder'] = recorder
+    stats = Simulation(config).run(10)
+    recorder.close()
+
+    with open(tmp_path / 'rounds.csv') as file:
+        rows = list(csv.DictReader(file))
+    assert [int(row['round']) for row in rows] == list(range(10))
+    assert sum(int(row['disembarkings']) for row in rows) == stats['people_completed']
+    assert int(rows[-1]['people_in_system']) == stats['people_in_system']
+    assert int(rows[-1]['people_in_system']) == sum(
+        int(rows[-1][name]) for name in recorder.header() if name.startswith(('queue', 'load')))
+
+
+def test_recorder_starts_over_when_simulation_is_reset(tmp_path) -> None:
+    """Test that a reset simulation's recorder records the next run exactly like a
+    new recorder of a new simulation would.
+    """
+    from a1_recorder import RoundRecorder
+
+    def recorded_rows(reset: bool) -> str:
+        filename = str(tmp_path / f'{reset}.csv')
+        config = get_example_config()
+        config['recorder'] = RoundRecorder(6, 2, filename, chunk_rounds=4)
+        sim = Simulation(config)
+        if reset:
+            sim.run(7)
+            sim.reset()
+        sim.run(10)
+        config['recorder'].close()
+        with open(filename) as file:
+            return file.read()
+
+    assert recorded_rows(True) == recorded_rows(False)
+
+
+###############################################################################
+# Profiler tests
+###############################################################################
+def test_profiler_times_every_stage() -> None:
+    """Test that a StageProfiler profiles every round, records traced memory at
+    the requested rounds, and stops tracing memory even if a round raises.
+    """
+    import tracemalloc
+    from a1_profiler import STAGES, StageProfiler
+
+    config = get_example_config()
+    profiler = StageProfiler(memory_every=4)
+    config['profiler'] = profiler
+    Simulation(config).run(10)
+    report = profiler.report()
+
+    assert report['rounds'] == 10
+    assert list(report['stages']) == STAGES
+    assert [recording[0] for recording in report['memory']] == [0, 4, 8]
+    assert not tracemalloc.is_tracing()
+
+    class FailingAlgorithm(EndToEndLoop):
+        def update_target_floors(self, elevators: list[Elevator], waiting: dict,
+                                 max_floor: int) -> None:
+            raise RuntimeError('round failed')
+
+    config['moving_algorithm'] = FailingAlgorithm()
+    config['profiler'] = StageProfiler(memory_every=1)
+    with pytest.raises(RuntimeError):
+        Simulation(config).run(10)
+    assert not tracemalloc.is_tracing()
+
+
+###############################################################################
+# Benchmark tests
+###############################################################################
+def test_benchmark_scenarios_run() -> None:
+    """Test that every benchmark scenario makes a valid simulation config."""
+    pytest.importorskip('numpy')
+    import a1_benchmark
+
+    for make_config, _ in a1_benchmark.SCENARIOS.values():
+        config = make_config()
+        config['contract_checking'] = False
+        stats = Simulation(config).run(20)
+        assert stats['num_rounds'] == 20
+
+
+###############################################################################
+# Vectorized simulation tests
+###############################################################################
+def test_vector_simulation_matches_simulation(tmp_path) -> None:
+    """Test that VectorSimulation reports the same statistics as Simulation for
+    both supported moving algorithms, including on traces of people going up and
+    down between any floors.
+    """
+    pytest.importorskip('numpy')
+    from a1_traffic import PoissonArrivals, interfloor
+    from a1_vector_simulation import VectorSimulation
+
+    trace = tmp_path / 'trace.csv'
+    trace.write_text('0,1,9,5,2,9,1\n1,4,3,4,8,7,2\n3,2,6,6,2,8,4,1,3\n6,9,4,3,7\n'
+                     '10,5,1,5,9,2,8\n')
+    generators = [lambda: SingleArrivals(9),
+                  lambda: FileArrivals(9, str(trace)),
+                  lambda: PoissonArrivals(9, [(0, 0.5, interfloor(9))], seed=5)]
+    for moving_algorithm in [EndToEndLoop, FurthestFloor]:
+        for make_generator in generators:
+            config = get_example_config()
+            config['num_floors'] = 9
+            config['num_elevators'] = 3
+            config['contract_checking'] = False
+            config['moving_algorithm'] = moving_algorithm()
+            config['arrival_generator'] = make_generator()
+            expected = Simulation(config).run(100)
+
+            config['moving_algorithm'] = moving_algorithm()
+            config['arrival_generator'] = make_generator()
+            assert VectorSimulation(config).run(100) == expected
+
+
+def test_vector_simulation_rejects_other_algorithms() -> None:
+    """Test that VectorSimulation refuses moving algorithms it can't vectorize."""
+    pytest.importorskip('numpy')
+    from a1_vector_simulation import VectorSimulation
+
+    class StayPut(EndToEndLoop):
+        """A moving algorithm that never changes any target floor."""
+        def update_target_floors(self, elevators, waiting, max_floor) -> None:
+            """Leave every target floor unchanged."""
+
+    config = get_example_config()
+    config['moving_algorithm'] = StayPut()
+    with pytest.raises(ValueError):
+        VectorSimulation(config)
+
+
+###############################################################################
+# Parameter sweep tests
+###############################################################################
+def test_sweep_matches_single_runs(tmp_path) -> None:
+    """Test that a parallel sweep writes one result per task, with the same
+    statistics as running each simulation on its own.
+    """
+    import json
+    import a1_sweep
+
+    grid = {'num_floors': [6], 'num_elevators': [1, 2], 'elevator_capacity': [2],
+            'arrival_generator': ['SingleArrivals'],
+            'moving_algorithm': ['EndToEndLoop', 'FurthestFloor']}
+    tasks = a1_sweep.expand_grid(grid, 20)
+    out = tmp_path / 'sweep.jsonl'
+    assert a1_sweep.write_results(a1_sweep.run_sweep(tasks, max_workers=2), str(out)) == 4
+
+    results = sorted((json.loads(line) for line in out.read_text().splitlines()),
+                     key=lambda result: result['task_id'])
+    for task, result in zip(tasks, results):
+        config = get_example_config()
+        config['num_elevators'] = task['num_elevators']
+        config['moving_algorithm'] = a1_sweep.MOVING_ALGORITHMS[task['moving_algorithm']]()
+        config['contract_checking'] = False
+        stats = Simulation(config).run(20)
+        assert {key: result[key] for key in stats} == stats
+
+
+###############################################################################
+# Replication tests
+###############################################################################
+def test_replicate_stops_at_target_width() -> None:
+    """Test that replication stops once every interval is narrow enough, and
+    summarizes exactly the replicas it reports.
+    """
+    from statistics import fmean
+    import a1_replicate
+
+    task = {'num_floors': 6, 'num_elevators': 2, 'elevator_capacity': 3,
+            'arrival_generator': 'OfficeDay:1/100', 'moving_algorithm': 'CollectiveControl',
+            'num_rounds': 100}
+    summary = a1_replicate.replicate(task, {'avg_time': 4.0}, min_replicas=3,
+                                     max_replicas=40, max_workers=2)
+
+    assert summary['converged']
+    assert 3 <= summary['replicas'] == len(summary['results']) <= 40
+    interval = summary['statistics']['avg_time']
+    assert 2 * interval['half_width'] <= 4.0
+    assert interval['mean'] == fmean(result['avg_time'] for result in summary['results'])
+    assert [result['task_id'] for result in summary['results']] == \
+        list(range(summary['replicas']))
+
+
+###############################################################################
+# Contract checking tests
+###############################################################################
+def test_contract_checking_config_key() -> None:
+    """Test that the 'contract_checking' config key turns contract checks off while
+    the simulation runs, and only then.
+    """
+    unchecked = []
+
+    class CheckingProbe(EndToEndLoop):
+        def update_target_floors(self, elevators: list[Elevator], waiting: dict,
+                                 max_floor: int) -> None:
+            person = Person(1, 5)
+            person.start = 0  # Violates a representation invariant, but isn't checked
+            unchecked.append(person.start == 0)
+            super().update_target_floors(elevators, waiting, max_floor)
+
+    config = get_example_config()
+    config['moving_algorithm'] = CheckingProbe()
+    config['contract_checking'] = False
+    Simulation(config).run(3)
+
+    assert unchecked == [True, True, True]
+    assert a1_contracts.get_check_period() == a1_contracts.IMPORT_CHECK_PERIOD
+    if a1_contracts.contracts_enabled():
+        with a1_contracts.checking_period(1), pytest.raises(AssertionError):
+            Person(1, 5).start = 0
+
+
+###############################################################################
+# Visualizer tests
+###############################################################################
+def test_person_sprites_share_cached_images(monkeypatch) -> None:
+    """Test that person sprites use the shared per-anger-level images, and only
+    swap images when their person's anger level changes.
+    """
+    images = [pygame.Surface((1, 1)) for _ in range(5)]
+    monkeypatch.setattr(a1_visualizer, '_PERSON_IMAGES', images)
+    calm, angry = Person(1, 5), Person(2, 5)
+    calm_sprite, angry_sprite = PersonSprite(calm), PersonSprite(angry)
+    assert calm_sprite.image is angry_sprite.image is images[0]
+
+    calm.wait_time = 1
+    angry.wait_time = 5
+    calm_sprite.refresh_image()
+    angry_sprite.refresh_image()
+
+    assert calm_sprite.image is images[0]
+    assert angry_sprite.image is images[2]
+
+
+def test_visualizer_batches_boardings_and_redraws_dirty_sprites(monkeypatch) -> None:
+    """Test that the visualizer animates a batch of boardings in one pass, and only
+    redraws the parts of the screen that changed.
+    """
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    monkeypatch.setattr(a1_visualizer, 'FPS', 0)
+    monkeypatch.setattr(a1_visualizer, '_PERSON_IMAGES',
+                        [pygame.Surface((1, 1)) for _ in range(5)])
+    elevators = [Elevator(2), Elevator(2)]
+    visualizer = a1_visualizer.Visualizer(elevators, 3, True)
+    try:
+        people = [Person(1, 2), Person(1, 3), Person(1, 3)]
+        visualizer.show_arrivals({1: people})
+        frames = []
+        monkeypatch.setattr(visualizer, 'render', lambda: frames.append(True))
+
+        visualizer.show_boardings([(people[0], elevators[0]), (people[1], elevators[1]),
+                                   (people[2], elevators[1])])
+        assert len(frames) == 22
+        for person, elevator in [(people[0], elevators[0]), (people[2], elevators[1])]:
+            centerx = visualizer._elevator_sprites[elevator].rect.centerx
+            assert abs(visualizer._person_sprites[person].rect.centerx - centerx) <= 3
+
+        screen = visualizer._screen
+        assert visualizer._sprite_group.draw(screen)
+        assert visualizer._sprite_group.draw(screen) == []
+    finally:
+        pygame.display.quit()
+
+
+def test_frame_writer_records_headless_runs(monkeypatch, tmp_path) -> None:
+    """Test that a visualized simulation with a frame writer runs without pausing
+    or waiting for its window, writing every few frames as PNG images or raw RGB.
+    """
+    from a1_frames import FrameWriter
+
+    monkeypatch.delenv('SDL_VIDEODRIVER', raising=False)
+    monkeypatch.setattr(a1_visualizer, '_PERSON_IMAGES',
+                        [pygame.Surface((1, 1)) for _ in range(5)])
+    monkeypatch.setattr(a1_visualizer.time, 'sleep', pytest.fail)
+    for path in [tmp_path / 'frames', tmp_path / 'frames.raw']:
+        frames = FrameWriter(str(path), every=7)
+        config = get_example_config()
+        config['visualize'] = True
+        config['frame_writer'] = frames
+        config['contract_checking'] = False
+        try:
+            Simulation(config).run(3)
+        finally:
+            frames.close()
+
+        assert frames.frames_written == -(-frames.frames_rendered // 7) > 1
+        if frames.is_raw():
+            assert path.stat().st_size == frames.frames_written * 900 * 700 * 3
+        else:
+            assert len(list(path.glob('*.png'))) == frames.frames_written
+
+    # The dummy video driver was only used while the display was initialized
+    assert 'SDL_VIDEODRIVER' not in os.environ
+
+
 ###############################################################################
 # Helpers
 ###############################################################################
@@ -168,7 +1000,22 @@ def get_example_config() -> dict:
     }
 
 
-if __name__ == '__main__':
-    import pytest
+def get_state(elevators: list[Elevator], waiting: dict) -> tuple:
+    """Return the floor and passengers of each of the given elevators, and the
+    people waiting on each floor of waiting, which lists them in arrival order.
+    """
+    return ([(ele.current_floor, sorted((person.start, person.target, person.wait_time)
+                                        for person in ele.passengers))
+             for ele in elevators],
+            {floor: [(person.start, person.target, person.wait_time) for person in people]
+             for floor, people in waiting.items() if len(people) > 0})
+
+
+def get_simulation_state(sim: Simulation) -> tuple:
+    """Return the state of the given simulation, as get_state does."""
+    return get_state(sim.elevators, {floor: queue.in_arrival_order()
+                                     for floor, queue in sim.waiting.items()})
 
+
+if __name__ == '__main__':
     pytest.main(['a1_sample_test.py'])
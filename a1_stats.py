@@ -0,0 +1,125 @@
+"""CSC148 Assignment 1 - Statistics
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains WaitStats, which accumulates the wait times of the people
+who complete their trips during a simulation, one at a time, so that a simulation
+doesn't have to keep everybody around until the end of its run.
+"""
+from __future__ import annotations
+from typing import Iterable
+from a1_contracts import check_contracts
+
+# The wait time percentiles reported by WaitStats.report, by statistic name
+PERCENTILES = {'p50_time': 50, 'p95_time': 95, 'p99_time': 99}
+
+
+@check_contracts
+class WaitStats:
+    """Running statistics of a collection of wait times.
+
+    Wait times are counted in a histogram with one bucket per wait time, so memory
+    grows with the longest wait time (which is at most the number of rounds), not
+    with the number of wait times, and percentiles are exact.
+
+    Instance Attributes:
+    - count: the number of wait times added
+    - total: the sum of the wait times added
+    - max_time: the longest wait time added, or -1 if there are none
+
+    Representation Invariants:
+    - self.count >= 0
+    - self.total >= 0
+    - self.max_time >= -1
+    """
+    count: int
+    total: int
+    max_time: int
+    # Private Instance Attributes:
+    # - _histogram: _histogram[w] is the number of wait times equal to w that were added
+    _histogram: list[int]
+
+    def __init__(self) -> None:
+        """Initialize a new WaitStats without any wait times."""
+        self.count = 0
+        self.total = 0
+        self.max_time = -1
+        self._histogram = []
+
+    def add(self, wait_time: int) -> None:
+        """Add the given wait time.
+
+        Preconditions:
+        - wait_time >= 0
+        """
+        if wait_time >= len(self._histogram):
+            self._histogram.extend([0] * (wait_time + 1 - len(self._histogram)))
+        self._histogram[wait_time] += 1
+        self.count += 1
+        self.total += wait_time
+        self.max_time = max(self.max_time, wait_time)
+
+    def extend(self, wait_times: Iterable[int]) -> None:
+        """Add each of the given wait times.
+
+        Preconditions:
+        - every wait time is >= 0
+        """
+        for wait_time in wait_times:
+            self.add(wait_time)
+
+    def average(self) -> int:
+        """Return the average wait time, rounded down, or -1 if there are none."""
+        return self.total // self.count if self.count else -1
+
+    def percentile(self, percent: int) -> int:
+        """Return the given percentile of the wait times (the smallest wait time that
+        at least percent% of the wait times are at most), or -1 if there are none.
+
+        Preconditions:
+        - 0 < percent <= 100
+
+        >>> stats = WaitStats()
+        >>> stats.extend([4, 1, 3, 2, 10])
+        >>> stats.percentile(50)
+        3
+        >>> stats.percentile(95)
+        10
+        """
+        needed = percent * self.count / 100
+        seen = 0
+        for wait_time, count in enumerate(self._histogram):
+            seen += count
+            if count and seen >= needed:
+                return wait_time
+        return -1
+
+    def report(self) -> dict[str, int]:
+        """Return the statistics of the wait times, as reported by a simulation.
+
+        >>> WaitStats().report()
+        {'people_completed': 0, 'max_time': -1, 'avg_time': -1, 'p50_time': -1, \
+'p95_time': -1, 'p99_time': -1}
+        """
+        stats = {
+            'people_completed': self.count,
+            'max_time': self.max_time,
+            'avg_time': self.average()
+        }
+        for name, percent in PERCENTILES.items():
+            stats[name] = self.percentile(percent)
+        return stats
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    # import python_ta
+    # python_ta.check_all(config={
+    #     'extra-imports': ['a1_contracts'],
+    #     'max-line-length': 100
+    # })
@@ -0,0 +1,270 @@
+"""CSC148 Assignment 1 - Parameter sweeps
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module runs many headless simulations in parallel, one for every combination
+of the values in a parameter grid, and streams their statistics to a file as they
+finish. Run it from the command line, for example:
+
+    python a1_sweep.py --floors 10 20 --elevators 2 4 --capacity 5 10 \\
+        --arrivals SingleArrivals FileArrivals:data/sample_arrivals.csv \\
+        --algorithms EndToEndLoop FurthestFloor --rounds 500 --out results.csv
+
+A grid maps each of the keys in SWEEP_KEYS to a list of values. Arrival generators
+and moving algorithms are given by name (see ARRIVAL_GENERATORS and
+MOVING_ALGORITHMS), so that tasks can be sent to worker processes. An arrival
+generator name may be followed by a colon and an argument, such as the file that
+FileArrivals reads.
+
+Every task gets a seed derived from the sweep's base seed and the task's id, so a
+sweep always produces the same results no matter how its tasks are scheduled.
+"""
+from __future__ import annotations
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import json
+import random
+import time
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import a1_algorithms
+from a1_simulation import Simulation
+
+# The simulation config keys that a grid assigns values to, in task order.
+SWEEP_KEYS = ['num_floors', 'num_elevators', 'elevator_capacity',
+              'arrival_generator', 'moving_algorithm']
+
+# Arrival generators by name. Each factory is called with the number of floors, the
+# argument after the colon in the generator's name (or None), and the task's seed.
+ARRIVAL_GENERATORS: dict[str, Callable[[int, Optional[str], int],
+                                       a1_algorithms.ArrivalGenerator]] = {
+    'SingleArrivals': lambda max_floor, arg, seed: a1_algorithms.SingleArrivals(max_floor),
+    'FileArrivals': lambda max_floor, arg, seed: a1_algorithms.FileArrivals(max_floor, arg),
+    'StreamingFileArrivals':
+        lambda max_floor, arg, seed: a1_algorithms.StreamingFileArrivals(max_floor, arg),
+    'MappedArrivals': lambda max_floor, arg, seed: _mapped_arrivals(max_floor, arg),
+    'OfficeDay': lambda max_floor, arg, seed: _office_day_arrivals(max_floor, arg, seed),
+}
+
+
+def _destination_dispatch() -> a1_algorithms.MovingAlgorithm:
+    """Return a DestinationDispatch moving algorithm.
+
+    a1_dispatch is only imported here, since it needs NumPy.
+    """
+    import a1_dispatch
+    return a1_dispatch.DestinationDispatch()
+
+
+# Moving algorithms by name.
+MOVING_ALGORITHMS: dict[str, Callable[[], a1_algorithms.MovingAlgorithm]] = {
+    'EndToEndLoop': a1_algorithms.EndToEndLoop,
+    'FurthestFloor': a1_algorithms.FurthestFloor,
+    'CollectiveControl': a1_algorithms.CollectiveControl,
+    'DestinationDispatch': _destination_dispatch,
+}
+
+# The simulation each worker process last ran, by its number of floors, number of
+# elevators, elevator capacity and whether it skips idle rounds. Reusing it saves
+# rebuilding the building (and the people it recycles) for every task.
+_SIMULATIONS: dict[tuple[int, int, int, bool], Simulation] = {}
+
+
+###############################################################################
+# Tasks
+###############################################################################
+def _mapped_arrivals(max_floor: int, filename: str) -> a1_algorithms.ArrivalGenerator:
+    """Return a MappedArrivals generator for the given binary trace.
+
+    a1_trace is only imported here, since it needs NumPy.
+    """
+    import a1_trace
+    return a1_trace.MappedArrivals(max_floor, filename)
+
+
+def _office_day_arrivals(max_floor: int, arg: Optional[str],
+                         seed: int) -> a1_algorithms.ArrivalGenerator:
+    """Return a PoissonArrivals generator for a repeating office day (see
+    a1_traffic.office_day). arg is the peak number of people per round, optionally
+    followed by a slash and the number of rounds per day, such as '2.5/1000'.
+
+    a1_traffic is only imported here, since it needs NumPy.
+    """
+    import a1_traffic
+    rate, _, rounds_per_day = (arg or '1').partition('/')
+    rounds_per_day = int(rounds_per_day or 1000)
+    return a1_traffic.PoissonArrivals(
+        max_floor, a1_traffic.office_day(max_floor, float(rate), rounds_per_day),
+        seed, rounds_per_day)
+
+
+def task_seed(base_seed: int, task_id: int) -> int:
+    """Return the seed for the task with the given id in a sweep with the given base seed.
+
+    >>> task_seed(0, 3) == task_seed(0, 3)
+    True
+    >>> task_seed(0, 3) == task_seed(1, 3)
+    False
+    """
+    return random.Random(f'{base_seed}:{task_id}').getrandbits(32)
+
+
+def expand_grid(grid: dict[str, list[Any]], num_rounds: int,
+                base_seed: int = 0) -> list[dict[str, Any]]:
+    """Return a task for every combination of the values in grid.
+
+    Each task is a dictionary with a value for each key in SWEEP_KEYS, as well as
+    'task_id', 'seed' and 'num_rounds'.
+
+    Preconditions:
+    - grid has a non-empty list of values for every key in SWEEP_KEYS
+    - num_rounds >= 1
+
+    >>> tasks = expand_grid({'num_floors': [5, 10], 'num_elevators': [1],
+    ...                      'elevator_capacity': [2], 'arrival_generator': ['SingleArrivals'],
+    ...                      'moving_algorithm': ['EndToEndLoop', 'FurthestFloor']}, 100)
+    >>> [(task['num_floors'], task['moving_algorithm']) for task in tasks]
+    [(5, 'EndToEndLoop'), (5, 'FurthestFloor'), (10, 'EndToEndLoop'), (10, 'FurthestFloor')]
+    """
+    tasks = []
+    for task_id, values in enumerate(itertools.product(*(grid[key] for key in SWEEP_KEYS))):
+        task = {'task_id': task_id, 'seed': task_seed(base_seed, task_id),
+                'num_rounds': num_rounds}
+        task.update(zip(SWEEP_KEYS, values))
+        tasks.append(task)
+    return tasks
+
+
+def make_config(task: dict[str, Any]) -> dict[str, Any]:
+    """Return the headless simulation config for the given task.
+
+    Contract checking is turned off and people are recycled, since sweeps are about
+    speed.
+    """
+    name, _, arg = task['arrival_generator'].partition(':')
+    return {
+        'num_floors': task['num_floors'],
+        'num_elevators': task['num_elevators'],
+        'elevator_capacity': task['elevator_capacity'],
+        'arrival_generator': ARRIVAL_GENERATORS[name](task['num_floors'], arg or None,
+                                                      task['seed']),
+        'moving_algorithm': MOVING_ALGORITHMS[task['moving_algorithm']](),
+        'visualize': False,
+        'skip_idle': task.get('skip_idle', False),
+        'contract_checking': False,
+        'recycle_people': True
+    }
+
+
+def run_task(task: dict[str, Any]) -> dict[str, Any]:
+    """Run the simulation for the given task, and return the task together with
+    the simulation statistics and the number of seconds the run took.
+    """
+    random.seed(task['seed'])
+    config = make_config(task)
+    start = time.perf_counter()
+    stats = _simulation(config).run(task['num_rounds'])
+    result = dict(task)
+    result.update(stats)
+    result['seconds'] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def _simulation(config: dict[str, Any]) -> Simulation:
+    """Return a simulation for the given config, reusing (after resetting it) the
+    last simulation this process made for the same building, if there is one.
+    """
+    key = (config['num_floors'], config['num_elevators'], config['elevator_capacity'],
+           config['skip_idle'])
+    sim = _SIMULATIONS.get(key)
+    if sim is None:
+        _SIMULATIONS.clear()
+        sim = _SIMULATIONS[key] = Simulation(config)
+    else:
+        sim.reset(config['arrival_generator'], config['moving_algorithm'])
+    return sim
+
+
+###############################################################################
+# Running sweeps
+###############################################################################
+def run_sweep(tasks: list[dict[str, Any]],
+              max_workers: Optional[int] = None) -> Iterator[dict[str, Any]]:
+    """Run the given tasks across a pool of worker processes, and yield their results
+    in the order they finish.
+
+    max_workers defaults to the number of CPUs.
+    """
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(run_task, task) for task in tasks]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+def write_results(results: Iterable[dict[str, Any]], filename: str) -> int:
+    """Write each result to the given file as soon as it arrives, and return the
+    number of results written.
+
+    The file is written as JSON lines if its name ends with .json or .jsonl, and as
+    CSV otherwise (with a header taken from the first result).
+    """
+    count = 0
+    with open(filename, 'w', newline='') as file:
+        writer = None
+        for result in results:
+            if filename.endswith(('.json', '.jsonl')):
+                file.write(json.dumps(result) + '\n')
+            else:
+                if writer is None:
+                    writer = csv.DictWriter(file, fieldnames=list(result))
+                    writer.writeheader()
+                writer.writerow(result)
+            file.flush()
+            count += 1
+    return count
+
+
+###############################################################################
+# Command-line interface
+###############################################################################
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the sweep described on the command line."""
+    parser = argparse.ArgumentParser(description='Run a grid of elevator simulations.')
+    parser.add_argument('--floors', type=int, nargs='+', required=True)
+    parser.add_argument('--elevators', type=int, nargs='+', required=True)
+    parser.add_argument('--capacity', type=int, nargs='+', required=True)
+    parser.add_argument('--arrivals', nargs='+', default=['SingleArrivals'])
+    parser.add_argument('--algorithms', nargs='+', choices=list(MOVING_ALGORITHMS),
+                        default=list(MOVING_ALGORITHMS))
+    parser.add_argument('--rounds', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--skip-idle', action='store_true')
+    parser.add_argument('--out', default='sweep.csv')
+    args = parser.parse_args(argv)
+
+    for name in args.arrivals:
+        if name.partition(':')[0] not in ARRIVAL_GENERATORS:
+            parser.error(f'unknown arrival generator: {name}')
+
+    grid = {
+        'num_floors': args.floors,
+        'num_elevators': args.elevators,
+        'elevator_capacity': args.capacity,
+        'arrival_generator': args.arrivals,
+        'moving_algorithm': args.algorithms
+    }
+    tasks = expand_grid(grid, args.rounds, args.seed)
+    for task in tasks:
+        task['skip_idle'] = args.skip_idle
+    count = write_results(run_sweep(tasks, args.workers), args.out)
+    print(f'wrote {count} results to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""CSC148 Assignment 1 - Binary arrival traces
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains a compact binary format for arrival traces, and
+MappedArrivals, an arrival generator that reads it through a memory map. Convert a
+CSV trace (in the format read by FileArrivals, possibly gzip-compressed) with:
+
+    python a1_trace.py data/sample_arrivals.csv data/sample_arrivals.a1t
+
+A binary trace consists of:
+- a header: the bytes b'A1TR', the format version, the number of records and the
+  number of rounds with arrivals (see TRACE_HEADER)
+- the records: one (round, start, target) triple of int32s per person, sorted by
+  round, with each round's people in the order FileArrivals generates them
+- the rounds with arrivals, in increasing order, as int32s
+- the offset table: for each of those rounds, the index of its first record,
+  followed by the number of records, as int64s
+
+Since the file is never parsed, many processes (such as the workers of a sweep in
+a1_sweep.py) can share one trace through the operating system's page cache.
+"""
+from __future__ import annotations
+import argparse
+import mmap
+import struct
+from typing import Any, Optional
+
+import numpy as np
+from a1_contracts import check_contracts
+
+import a1_algorithms
+from a1_entities import Person
+
+TRACE_MAGIC = b'A1TR'
+TRACE_VERSION = 1
+# The header layout: magic, version, number of records, number of rounds
+TRACE_HEADER = struct.Struct('<4sIqq')
+
+_RECORD_DTYPE = np.dtype('<i4')
+_OFFSET_DTYPE = np.dtype('<i8')
+
+
+###############################################################################
+# Conversion
+###############################################################################
+def convert_csv(csv_filename: str, trace_filename: str) -> int:
+    """Convert the CSV arrival trace in csv_filename to a binary trace in
+    trace_filename, and return the number of records written.
+
+    The CSV file is streamed (see a1_algorithms.StreamingFileArrivals), so it does
+    not need to fit in memory. As in FileArrivals, a round's last row wins: if the
+    rows turn out not to be sorted by round, the conversion starts over with the
+    generator's offset index.
+
+    Preconditions:
+    - <csv_filename> refers to a valid CSV file, following the specified
+      format and restrictions from the assignment handout.
+    """
+    try:
+        return _convert(csv_filename, trace_filename, True)
+    except ValueError:
+        return _convert(csv_filename, trace_filename, False)
+
+
+def _convert(csv_filename: str, trace_filename: str, sorted_rounds: bool) -> int:
+    """Convert the CSV arrival trace like convert_csv, streaming it if sorted_rounds
+    is True (raising ValueError if it isn't sorted), or reading it through the
+    offset index otherwise.
+    """
+    # max_floor only matters for the generator's own checks
+    arrivals = a1_algorithms.StreamingFileArrivals(2, csv_filename, sorted_rounds)
+    rounds = []
+    offsets = [0]
+    try:
+        with open(trace_filename, 'wb') as file:
+            file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, 0, 0))
+            round_num = arrivals.next_arrival_round(0)
+            while round_num is not None:
+                records = [(round_num, person.start, person.target)
+                           for people in arrivals.generate(round_num).values()
+                           for person in people]
+                file.write(np.array(records, dtype=_RECORD_DTYPE).tobytes())
+                rounds.append(round_num)
+                offsets.append(offsets[-1] + len(records))
+                round_num = arrivals.next_arrival_round(round_num + 1)
+
+            file.write(np.array(rounds, dtype=_RECORD_DTYPE).tobytes())
+            file.write(bytes(-file.tell() % _OFFSET_DTYPE.itemsize))
+            file.write(np.array(offsets, dtype=_OFFSET_DTYPE).tobytes())
+            file.seek(0)
+            file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, offsets[-1], len(rounds)))
+    finally:
+        arrivals.close()
+    return offsets[-1]
+
+
+###############################################################################
+# Arrival generator
+###############################################################################
+@check_contracts
+class MappedArrivals(a1_algorithms.ArrivalGenerator):
+    """Generate arrivals from a binary trace written by convert_csv.
+
+    The trace is memory-mapped rather than read, and generate_arrays returns
+    views into the map, so each round's arrivals are served without copying.
+    generate returns the same arrivals as FileArrivals on the original CSV file.
+
+    MappedArrivals can be pickled: the copy maps the same file again.
+
+    Instance Attributes:
+    - filename: the binary trace this generator reads
+    """
+    filename: str
+    # Private Instance Attributes:
+    # - _map: the memory map of the trace
+    # - _records: the (round, start, target) records of the trace
+    # - _rounds: the rounds with arrivals, in increasing order
+    # - _offsets: the index of the first record of each round in _rounds, and then
+    #   the number of records
+    _map: mmap.mmap
+    _records: np.ndarray
+    _rounds: np.ndarray
+    _offsets: np.ndarray
+
+    def __init__(self, max_floor: int, filename: str) -> None:
+        """Initialize a new MappedArrivals algorithm from the given binary trace.
+
+        Raise ValueError if the file is not a binary trace.
+
+        Preconditions:
+        - max_floor >= 2
+        - every floor in the trace is between 1 and max_floor
+        """
+        a1_algorithms.ArrivalGenerator.__init__(self, max_floor)
+        self.filename = filename
+        with open(filename, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, num_records, num_rounds = TRACE_HEADER.unpack_from(self._map)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            self._map.close()
+            raise ValueError(f'{filename} is not a version {TRACE_VERSION} arrival trace')
+
+        position = TRACE_HEADER.size
+        self._records = np.frombuffer(self._map, _RECORD_DTYPE, 3 * num_records,
+                                      position).reshape(num_records, 3)
+        position += self._records.nbytes
+        self._rounds = np.frombuffer(self._map, _RECORD_DTYPE, num_rounds, position)
+        position += self._rounds.nbytes
+        position += -position % _OFFSET_DTYPE.itemsize
+        self._offsets = np.frombuffer(self._map, _OFFSET_DTYPE, num_rounds + 1, position)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        """Pickle this generator as the arguments needed to map its trace again."""
+        return MappedArrivals, (self.max_floor, self.filename)
+
+    def close(self) -> None:
+        """Unmap the trace. This generator can't be used afterwards."""
+        self._records = self._rounds = self._offsets = np.empty(0, _RECORD_DTYPE)
+        self._map.close()
+
+    def generate(self, round_num: int) -> dict[int, list[Person]]:
+        """Return the new arrivals for the simulation at the given round.
+
+        Order matters: if there two people with the same starting floor
+        in the returned list, the person who appears first in the list
+        is considered to have arrived at the floor first.
+
+        Note: only floors with at least one new arrival should be included
+        in the returned dictionary. In other words, there should not be
+        any empty lists in the returned dictionary.
+
+        Preconditions:
+        - round_num >= 0
+        """
+        starts, targets = self.generate_arrays(round_num)
+        generated = {}
+        for start, target in zip(starts.tolist(), targets.tolist()):
+            generated.setdefault(start, []).append(self.new_person(start, target))
+        return generated
+
+    def generate_arrays(self, round_num: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the start and target floors of the arrivals at the given round,
+        in arrival order, as read-only views into the trace.
+
+        Preconditions:
+        - round_num >= 0
+        """
+        first, last = self._record_range(round_num)
+        return self._records[first:last, 1], self._records[first:last, 2]
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round at or after round_num with any new arrivals,
+        or None if nobody arrives from round_num on.
+
+        Preconditions:
+        - round_num >= 0
+        """
+        i = int(np.searchsorted(self._rounds, round_num))
+        return int(self._rounds[i]) if i < len(self._rounds) else None
+
+    def _record_range(self, round_num: int) -> tuple[int, int]:
+        """Return the range of indexes of the records for the given round."""
+        i = int(np.searchsorted(self._rounds, round_num))
+        if i == len(self._rounds) or self._rounds[i] != round_num:
+            return 0, 0
+        return int(self._offsets[i]), int(self._offsets[i + 1])
+
+
+###############################################################################
+# Command-line interface
+###############################################################################
+def main(argv: Optional[list[str]] = None) -> None:
+    """Convert the CSV trace named on the command line to a binary trace."""
+    parser = argparse.ArgumentParser(description='Convert a CSV arrival trace to binary.')
+    parser.add_argument('csv_file')
+    parser.add_argument('trace_file')
+    args = parser.parse_args(argv)
+    count = convert_csv(args.csv_file, args.trace_file)
+    print(f'wrote {count} arrivals to {args.trace_file}')
+
+
+if __name__ == '__main__':
+    main()
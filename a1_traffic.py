@@ -0,0 +1,271 @@
+"""CSC148 Assignment 1 - Stochastic traffic
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains PoissonArrivals, an arrival generator that draws random
+arrivals from a traffic profile, along with functions that build common profiles.
+
+A traffic profile is a list of phases (start_round, rate, od_matrix), sorted by
+start_round, where the first phase starts at round 0. From start_round until the
+next phase starts:
+- rate is the expected number of people arriving per round in the whole building
+- od_matrix is the "origin-destination" matrix: od_matrix[i][j] is the share of
+  those people who start on floor i + 1 and go to floor j + 1. The shares are
+  normalized, so they don't have to add up to 1. Nobody goes from a floor to
+  itself, so the diagonal od_matrix[i][i] must be 0.
+
+The number of people arriving for each pair of floors in each round is Poisson
+distributed. Arrivals are drawn for a whole block of rounds at once with NumPy
+(the number of people per round, and then the pair of floors of each of them),
+and each block has its own seed derived from the generator's seed, so a generator
+produces the same arrivals no matter which rounds it is asked for, or in what order.
+"""
+from __future__ import annotations
+from typing import Any, Optional
+
+import numpy as np
+from a1_contracts import check_contracts
+
+import a1_algorithms
+from a1_entities import Person
+
+# A phase of a traffic profile: (start_round, rate, od_matrix)
+Phase = tuple[int, float, np.ndarray]
+
+# The number of rounds drawn at once by default
+DEFAULT_BLOCK_SIZE = 1024
+
+
+###############################################################################
+# Origin-destination matrices and profiles
+###############################################################################
+def up_peak(num_floors: int, lobby: int = 1) -> np.ndarray:
+    """Return the od matrix of everybody going from the lobby to the other floors,
+    evenly.
+
+    >>> up_peak(3)
+    array([[0. , 0.5, 0.5],
+           [0. , 0. , 0. ],
+           [0. , 0. , 0. ]])
+    """
+    matrix = np.zeros((num_floors, num_floors))
+    matrix[lobby - 1, :] = 1 / (num_floors - 1)
+    matrix[lobby - 1, lobby - 1] = 0
+    return matrix
+
+
+def down_peak(num_floors: int, lobby: int = 1) -> np.ndarray:
+    """Return the od matrix of everybody going from the other floors to the lobby,
+    evenly.
+    """
+    return up_peak(num_floors, lobby).T.copy()
+
+
+def interfloor(num_floors: int) -> np.ndarray:
+    """Return the od matrix of people going between every pair of different floors,
+    evenly.
+    """
+    matrix = np.ones((num_floors, num_floors)) / (num_floors * (num_floors - 1))
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
+def office_day(num_floors: int, rate: float, rounds_per_day: int = 1000) -> list[Phase]:
+    """Return the traffic profile of an office building over one day, lasting
+    rounds_per_day rounds, whose busiest phases average rate people per round.
+
+    The day has a morning up-peak, a quiet morning, a lunch rush both ways, a
+    quiet afternoon, an evening down-peak and a nearly empty night.
+
+    Preconditions:
+    - num_floors >= 2
+    - rate >= 0
+    - rounds_per_day >= 12
+    """
+    lunch = (up_peak(num_floors) + down_peak(num_floors)) / 2
+    phases = [(0.0, 1.0, up_peak(num_floors)),
+              (0.2, 0.2, interfloor(num_floors)),
+              (0.4, 0.6, lunch),
+              (0.5, 0.2, interfloor(num_floors)),
+              (0.7, 1.0, down_peak(num_floors)),
+              (0.9, 0.02, interfloor(num_floors))]
+    return [(int(start * rounds_per_day), share * rate, matrix)
+            for start, share, matrix in phases]
+
+
+###############################################################################
+# Arrival generator
+###############################################################################
+@check_contracts
+class PoissonArrivals(a1_algorithms.ArrivalGenerator):
+    """Generate random arrivals following a traffic profile.
+
+    People arriving at the same round start in a random order.
+
+    Instance Attributes:
+    - cycle: the number of rounds after which the profile starts over, or None if
+      its last phase lasts forever
+    - seed: the seed of the random arrivals
+
+    Representation Invariants:
+    - self.cycle is None or self.cycle >= 1
+    """
+    cycle: Optional[int]
+    seed: int
+    # Private Instance Attributes:
+    # - _profile: the traffic profile, as given to the initializer
+    # - _block_size: the number of rounds drawn at once
+    # - _phase_starts: the start round of each phase
+    # - _rates: the expected arrivals per round in each phase
+    # - _pair_probs: the probability of each floor pair in each phase
+    # - _pair_starts, _pair_targets: the start and target floor of each floor pair
+    # - _block: the index of the block currently drawn, or -1
+    # - _starts, _targets: the start and target floors of everybody in _block
+    # - _offsets: the index in _starts of the first arrival of each round in _block,
+    #   followed by the number of arrivals in _block
+    _profile: list[Phase]
+    _block_size: int
+    _phase_starts: np.ndarray
+    _rates: np.ndarray
+    _pair_probs: np.ndarray
+    _pair_starts: np.ndarray
+    _pair_targets: np.ndarray
+    _block: int
+    _starts: np.ndarray
+    _targets: np.ndarray
+    _offsets: np.ndarray
+
+    def __init__(self, max_floor: int, profile: list[Phase], seed: int = 0,
+                 cycle: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        """Initialize a new PoissonArrivals algorithm with the given traffic profile.
+
+        Raise ValueError if the od matrix of any phase has a nonzero share on its
+        diagonal, which would make people whose start floor is their target floor.
+
+        Preconditions:
+        - max_floor >= 2
+        - profile is a traffic profile for max_floor floors
+        - block_size >= 1
+        """
+        a1_algorithms.ArrivalGenerator.__init__(self, max_floor)
+        self.cycle = cycle
+        self.seed = seed
+        self._profile = profile
+        self._block_size = block_size
+
+        self._phase_starts = np.array([phase[0] for phase in profile])
+        self._rates = np.array([phase[1] for phase in profile], dtype=float)
+        matrices = np.array([np.ravel(phase[2]) for phase in profile], dtype=float)
+        diagonals = matrices[:, ::max_floor + 1]
+        if np.any(diagonals):
+            phase, i = np.argwhere(diagonals)[0]
+            raise ValueError(f'the od matrix of phase {phase} has a nonzero share for '
+                             f'going from floor {i + 1} to itself')
+        pairs = np.flatnonzero(matrices.sum(axis=0))
+        self._pair_starts = (pairs // max_floor + 1).astype(np.int32)
+        self._pair_targets = (pairs % max_floor + 1).astype(np.int32)
+        totals = matrices[:, pairs].sum(axis=1, keepdims=True)
+        self._pair_probs = matrices[:, pairs] / np.where(totals > 0, totals, 1)
+        self._rates[totals[:, 0] == 0] = 0
+        self._block = -1
+        self._starts = self._targets = np.empty(0, np.int32)
+        self._offsets = np.zeros(block_size + 1, np.int64)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        """Pickle this generator as the arguments needed to create it again."""
+        return PoissonArrivals, (self.max_floor, self._profile, self.seed, self.cycle,
+                                 self._block_size)
+
+    def generate(self, round_num: int) -> dict[int, list[Person]]:
+        """Return the new arrivals for the simulation at the given round.
+
+        Order matters: if there two people with the same starting floor
+        in the returned list, the person who appears first in the list
+        is considered to have arrived at the floor first.
+
+        Note: only floors with at least one new arrival should be included
+        in the returned dictionary. In other words, there should not be
+        any empty lists in the returned dictionary.
+
+        Preconditions:
+        - round_num >= 0
+        """
+        starts, targets = self.generate_arrays(round_num)
+        generated = {}
+        for start, target in zip(starts.tolist(), targets.tolist()):
+            generated.setdefault(start, []).append(self.new_person(start, target))
+        return generated
+
+    def generate_arrays(self, round_num: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the start and target floors of the arrivals at the given round,
+        in arrival order.
+
+        Preconditions:
+        - round_num >= 0
+        """
+        self._draw_block(round_num // self._block_size)
+        i = round_num % self._block_size
+        first, last = self._offsets[i], self._offsets[i + 1]
+        return self._starts[first:last], self._targets[first:last]
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round at or after round_num with any new arrivals,
+        or None if nobody arrives from round_num on.
+
+        Preconditions:
+        - round_num >= 0
+        """
+        if self.cycle is None:
+            last_start = self._phase_starts[-1] if self._rates[-1] == 0 else None
+        else:
+            last_start = None
+            if not self._rates[self._phase_starts < self.cycle].any():
+                return None
+        if not self._rates.any():
+            return None
+
+        block = round_num // self._block_size
+        while True:
+            self._draw_block(block)
+            first = max(round_num - block * self._block_size, 0)
+            later = np.flatnonzero(np.diff(self._offsets[first:]))
+            if len(later):
+                return block * self._block_size + first + int(later[0])
+            block += 1
+            # Nobody arrives once the last phase starts, if its rate is 0
+            if last_start is not None and block * self._block_size > last_start:
+                return None
+
+    def _draw_block(self, block: int) -> None:
+        """Draw the arrivals of every round in the given block, unless it is the
+        current block.
+        """
+        if block == self._block:
+            return
+        rng = np.random.default_rng([self.seed, block])
+        rounds = np.arange(block * self._block_size, (block + 1) * self._block_size)
+        if self.cycle is not None:
+            rounds %= self.cycle
+        phases = np.searchsorted(self._phase_starts, rounds, side='right') - 1
+        counts = rng.poisson(self._rates[phases])
+
+        # Each person's pair of floors is drawn independently, so the people arriving
+        # in the same round are already in a random order.
+        person_phases = np.repeat(phases, counts)
+        pairs = np.empty(len(person_phases), np.int64)
+        for phase in np.unique(person_phases).tolist():
+            in_phase = person_phases == phase
+            pairs[in_phase] = rng.choice(len(self._pair_probs[phase]), int(in_phase.sum()),
+                                         p=self._pair_probs[phase])
+        self._starts = self._pair_starts[pairs]
+        self._targets = self._pair_targets[pairs]
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._block = block
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
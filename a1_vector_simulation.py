@@ -0,0 +1,425 @@
+"""CSC148 Assignment 1 - Vectorized simulation
+
+=== CSC148 Fall 2023 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains VectorSimulation, an alternative to a1_simulation.Simulation
+for very large headless runs. It has the same interface:
+
+    stats = VectorSimulation(config).run(num_rounds)
+
+but stores people and elevators as NumPy arrays ("struct of arrays") instead of
+Person and Elevator objects, and runs each stage of a round as array operations.
+For the EndToEndLoop and FurthestFloor moving algorithms, it returns exactly the
+same statistics as Simulation on the same configuration.
+
+Arrival generators that can produce arrays directly should define a
+generate_arrays(round_num) method returning the (starts, targets) arrays of that
+round's arrivals, in arrival order. Otherwise the Person objects returned by
+generate(round_num) are converted.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Optional
+
+import numpy as np
+import a1_contracts
+from a1_contracts import check_contracts
+
+import a1_algorithms
+from a1_stats import WaitStats
+
+# The states of a person
+WAITING = 0
+RIDING = 1
+DONE = 2
+
+# The smallest number of people to allocate space for
+_MIN_PEOPLE_CAPACITY = 1024
+
+
+@check_contracts
+class VectorSimulation:
+    """A headless simulation that stores people and elevators as NumPy arrays.
+
+    People are numbered in the order they arrive, and each person's data is stored
+    at their number in a set of columns (start, target, arrival round, state,
+    elevator). The people waiting on each floor are kept as queues of person numbers,
+    one per direction, and the people riding elevators as an array of person numbers,
+    so each stage of a round only touches the people it affects.
+
+    Instance Attributes:
+    - arrival_generator: the algorithm used to generate new arrivals.
+    - moving_algorithm: the algorithm used to decide how to move elevators
+    - num_floors: the number of floors
+    - num_elevators: the number of elevators
+    - current_floor: the floor each elevator is on
+    - target_floor: the floor each elevator is headed towards
+    - load: the number of passengers on each elevator
+    - capacity: the maximum number of passengers on each elevator
+    - num_waiting: the number of people waiting on each floor (indexed by floor number)
+
+    Representation Invariants:
+    - self.num_elevators >= 1
+    - self.num_floors >= 2
+    - len(self.current_floor) == len(self.target_floor) == self.num_elevators
+    - len(self.load) == len(self.capacity) == self.num_elevators
+    - len(self.num_waiting) == self.num_floors + 1
+    """
+    arrival_generator: a1_algorithms.ArrivalGenerator
+    moving_algorithm: a1_algorithms.MovingAlgorithm
+    num_floors: int
+    num_elevators: int
+    current_floor: np.ndarray
+    target_floor: np.ndarray
+    load: np.ndarray
+    capacity: np.ndarray
+    num_waiting: np.ndarray
+    # Private Instance Attributes:
+    # - _start, _target, _arrival, _state, _elevator: the columns of person data,
+    #     indexed by person number. _arrival is the value of _clock when the person
+    #     arrived, and _elevator is the elevator they rode (or -1).
+    #     Only the first _size entries are used.
+    # - _size: the number of people who have arrived
+    # - _queues: the numbers of the people waiting on each floor, in arrival order;
+    #     _queues[2 * floor + 1] are going up, and _queues[2 * floor] are going down
+    # - _riders: the numbers of the people riding an elevator
+    # - _clock: the number of rounds of waiting counted so far
+    # - _wait_stats: the wait times of the people who have reached their target floor
+    # - _move: the vectorized version of moving_algorithm
+    # - _check_period: the contract check period while running, or None to keep
+    #     the current one
+    _start: np.ndarray
+    _target: np.ndarray
+    _arrival: np.ndarray
+    _state: np.ndarray
+    _elevator: np.ndarray
+    _size: int
+    _queues: list[_IdQueue]
+    _riders: np.ndarray
+    _clock: int
+    _wait_stats: WaitStats
+    _move: Callable[[VectorSimulation], None]
+    _check_period: Optional[int]
+
+    def __init__(self, config: dict[str, Any]) -> None:
+        """Initialize a new simulation using the given configuration.
+
+        The configuration has the same format as for Simulation. Only the
+        EndToEndLoop and FurthestFloor moving algorithms are supported, and
+        config['visualize'] must be False.
+
+        Preconditions:
+        - config['num_floors'] >= 2
+        - config['elevator_capacity'] >= 1
+        - config['num_elevators'] >= 1
+        """
+        if config.get('visualize', False):
+            raise ValueError('VectorSimulation cannot be visualized')
+        move = _MOVING_ALGORITHMS.get(type(config['moving_algorithm']))
+        if move is None:
+            raise ValueError(f'VectorSimulation does not support the moving algorithm '
+                             f'{type(config["moving_algorithm"]).__name__}')
+
+        self.arrival_generator = config['arrival_generator']
+        self.moving_algorithm = config['moving_algorithm']
+        self._move = move
+        self.num_floors = config['num_floors']
+        self.num_elevators = config['num_elevators']
+
+        self.current_floor = np.ones(self.num_elevators, dtype=np.int64)
+        self.target_floor = np.ones(self.num_elevators, dtype=np.int64)
+        self.load = np.zeros(self.num_elevators, dtype=np.int64)
+        self.capacity = np.full(self.num_elevators, config['elevator_capacity'], dtype=np.int64)
+        self.num_waiting = np.zeros(self.num_floors + 1, dtype=np.int64)
+
+        self._start = np.zeros(_MIN_PEOPLE_CAPACITY, dtype=np.int32)
+        self._target = np.zeros(_MIN_PEOPLE_CAPACITY, dtype=np.int32)
+        self._arrival = np.zeros(_MIN_PEOPLE_CAPACITY, dtype=np.int32)
+        self._state = np.zeros(_MIN_PEOPLE_CAPACITY, dtype=np.int8)
+        self._elevator = np.zeros(_MIN_PEOPLE_CAPACITY, dtype=np.int32)
+        self._size = 0
+        self._queues = [_IdQueue() for _ in range(2 * (self.num_floors + 1))]
+        self._riders = np.zeros(0, dtype=np.int64)
+        self._clock = 0
+
+        self._wait_stats = WaitStats()
+        self._check_period = None
+        if 'contract_checking' in config:
+            self._check_period = int(config['contract_checking'])
+
+    ############################################################################
+    # Handle rounds of simulation.
+    ############################################################################
+    def run(self, num_rounds: int) -> dict[str, int]:
+        """Run the simulation for the given number of rounds.
+
+        Return the same statistics as Simulation.run.
+
+        Preconditions:
+        - num_rounds >= 1
+        - This method is only called once for each VectorSimulation instance
+        """
+        if self._check_period is None:
+            return self._run_rounds(num_rounds)
+        with a1_contracts.checking_period(self._check_period):
+            return self._run_rounds(num_rounds)
+
+    def _run_rounds(self, num_rounds: int) -> dict[str, int]:
+        """Run the given number of rounds, and return the statistics (see run)."""
+        for i in range(num_rounds):
+            # Stage 1: elevator disembarking
+            self.handle_disembarking()
+
+            # Stage 2: new arrivals
+            self.generate_arrivals(i)
+
+            # Stage 3: elevator boarding
+            self.handle_boarding()
+
+            # Stage 4: move the elevators
+            self.move_elevators()
+
+            # Stage 5: update wait times
+            self.update_wait_times()
+
+        return self._calculate_stats(num_rounds)
+
+    def handle_disembarking(self) -> None:
+        """Remove every passenger who has reached their target floor."""
+        riders = self._riders
+        elevator = self._elevator[riders]
+        exiting = self._target[riders] == self.current_floor[elevator]
+        if not exiting.any():
+            return
+
+        done = riders[exiting]
+        wait_times = self._clock - self._arrival[done]
+        self._wait_stats.extend(wait_times.tolist())
+
+        self.load -= np.bincount(elevator[exiting], minlength=self.num_elevators)
+        self._state[done] = DONE
+        self._riders = riders[~exiting]
+
+    def generate_arrivals(self, round_num: int) -> int:
+        """Add the new arrivals for the given round, and return how many there were."""
+        starts, targets = arrival_arrays(self.arrival_generator, round_num)
+        count = len(starts)
+        if count == 0:
+            return 0
+
+        self._reserve(count)
+        ids = np.arange(self._size, self._size + count)
+        self._start[ids] = starts
+        self._target[ids] = targets
+        self._arrival[ids] = self._clock
+        self._state[ids] = WAITING
+        self._elevator[ids] = -1
+        self._size += count
+        self.num_waiting += np.bincount(starts, minlength=self.num_floors + 1)
+
+        # Add each arrival to the queue for their floor and direction, in order.
+        keys = 2 * starts.astype(np.int64) + (targets > starts)
+        order = np.argsort(keys, kind='stable')
+        keys, ids = keys[order], ids[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        for key, group in zip(keys[np.r_[0, bounds]].tolist(), np.split(ids, bounds)):
+            self._queues[key].push(group)
+        return count
+
+    def handle_boarding(self) -> None:
+        """Board waiting people onto elevators.
+
+        Elevators board in order. Each one takes people going its way (or either
+        way, if it is at its target floor), in the order they arrived, until full.
+        """
+        boarding = np.flatnonzero((self.load < self.capacity)
+                                  & (self.num_waiting[self.current_floor] > 0))
+        if len(boarding) == 0:
+            return
+
+        boarded = [self._riders]
+        for e in boarding.tolist():
+            floor = int(self.current_floor[e])
+            if self.num_waiting[floor] == 0:
+                continue  # An earlier elevator on this floor took everyone
+            free = int(self.capacity[e] - self.load[e])
+            direction = int(self.target_floor[e]) - floor
+            up, down = self._queues[2 * floor + 1], self._queues[2 * floor]
+            if direction > 0:
+                chosen = up.pop(free)
+            elif direction < 0:
+                chosen = down.pop(free)
+            else:
+                # Either direction: take the people who arrived first, which are
+                # the people in the front of each queue up to the last one chosen.
+                first_up = up.peek(free)
+                chosen = np.sort(np.concatenate([first_up, down.peek(free)]))[:free]
+                num_up = int(np.searchsorted(first_up, chosen[-1], side='right'))
+                chosen = np.concatenate([up.pop(num_up), down.pop(len(chosen) - num_up)])
+
+            self._state[chosen] = RIDING
+            self._elevator[chosen] = e
+            self.load[e] += len(chosen)
+            self.num_waiting[floor] -= len(chosen)
+            boarded.append(chosen)
+        self._riders = np.concatenate(boarded)
+
+    def move_elevators(self) -> None:
+        """Update elevator target floors and then move them."""
+        self._move(self)
+        self.current_floor += np.sign(self.target_floor - self.current_floor)
+
+    def update_wait_times(self) -> None:
+        """Count one more round of waiting for everyone in the simulation.
+
+        As in Simulation, waiting times are computed from the round each person
+        arrived, so this only advances the clock.
+        """
+        self._clock += 1
+
+    ############################################################################
+    # Helpers
+    ############################################################################
+    def riders(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the elevator and the target floor of every person riding an elevator."""
+        return self._elevator[self._riders], self._target[self._riders]
+
+    def waiting_floors(self) -> np.ndarray:
+        """Return the floors with at least one person waiting, in increasing order."""
+        return np.flatnonzero(self.num_waiting)
+
+    def _reserve(self, count: int) -> None:
+        """Make sure the person columns have room for count more people."""
+        needed = self._size + count
+        if needed <= len(self._start):
+            return
+        new_capacity = max(needed, 2 * len(self._start))
+        for name in ('_start', '_target', '_arrival', '_state', '_elevator'):
+            old = getattr(self, name)
+            new = np.zeros(new_capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _calculate_stats(self, num_rounds: int) -> dict[str, int]:
+        """Report the statistics for the current run of this simulation, the same way
+        as Simulation does.
+        """
+        stats = {'num_rounds': num_rounds, 'total_people': self._size}
+        stats.update(self._wait_stats.report())
+        stats['people_in_system'] = self._size - self._wait_stats.count
+        return stats
+
+
+class _IdQueue:
+    """A first-in, first-out queue of person numbers, stored in a NumPy array."""
+    __slots__ = ('_ids', '_head', '_tail')
+    # Private Instance Attributes:
+    # - _ids: the queued numbers are _ids[_head:_tail], oldest first
+    _ids: np.ndarray
+    _head: int
+    _tail: int
+
+    def __init__(self) -> None:
+        """Initialize an empty queue."""
+        self._ids = np.zeros(16, dtype=np.int64)
+        self._head = 0
+        self._tail = 0
+
+    def __len__(self) -> int:
+        """Return the number of queued person numbers."""
+        return self._tail - self._head
+
+    def push(self, ids: np.ndarray) -> None:
+        """Add the given person numbers to the back of this queue, in order."""
+        count = len(ids)
+        if self._tail + count > len(self._ids):
+            size = self._tail - self._head
+            if 2 * (size + count) > len(self._ids):
+                new_ids = np.zeros(2 * (size + count), dtype=np.int64)
+            else:
+                new_ids = self._ids
+            new_ids[:size] = self._ids[self._head:self._tail]
+            self._ids, self._head, self._tail = new_ids, 0, size
+        self._ids[self._tail:self._tail + count] = ids
+        self._tail += count
+
+    def peek(self, limit: int) -> np.ndarray:
+        """Return (without removing) up to limit person numbers from the front of this queue."""
+        return self._ids[self._head:min(self._head + limit, self._tail)]
+
+    def pop(self, limit: int) -> np.ndarray:
+        """Remove and return up to limit person numbers from the front of this queue."""
+        popped = self.peek(limit).copy()
+        self._head += len(popped)
+        return popped
+
+
+###############################################################################
+# Arrivals
+###############################################################################
+def arrival_arrays(generator: a1_algorithms.ArrivalGenerator,
+                   round_num: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return the start and target floors of the given generator's arrivals for
+    the given round, in arrival order.
+
+    Use the generator's generate_arrays method if it has one; otherwise convert
+    the people returned by its generate method.
+    """
+    generate_arrays = getattr(generator, 'generate_arrays', None)
+    if generate_arrays is not None:
+        return generate_arrays(round_num)
+
+    people = [person for floor_people in generator.generate(round_num).values()
+              for person in floor_people]
+    starts = np.fromiter((person.start for person in people), dtype=np.int32, count=len(people))
+    targets = np.fromiter((person.target for person in people), dtype=np.int32,
+                          count=len(people))
+    return starts, targets
+
+
+###############################################################################
+# Vectorized moving algorithms
+###############################################################################
+def _end_to_end_loop(sim: VectorSimulation) -> None:
+    """Update target floors as a1_algorithms.EndToEndLoop does."""
+    target = sim.target_floor
+    target[sim.current_floor == 1] = sim.num_floors
+    target[sim.current_floor == sim.num_floors] = 1
+
+
+def _furthest_floor(sim: VectorSimulation) -> None:
+    """Update target floors as a1_algorithms.FurthestFloor does."""
+    current, target = sim.current_floor, sim.target_floor
+
+    # Case 1: elevators with passengers go to the furthest passenger target.
+    loaded = sim.load > 0
+    if loaded.any():
+        elevator, rider_target = sim.riders()
+        lowest = np.full(sim.num_elevators, sim.num_floors + 1, dtype=np.int64)
+        highest = np.zeros(sim.num_elevators, dtype=np.int64)
+        np.minimum.at(lowest, elevator, rider_target)
+        np.maximum.at(highest, elevator, rider_target)
+        furthest = np.where(current - lowest >= highest - current, lowest, highest)
+        target[loaded] = furthest[loaded]
+
+    # Case 2: idle elevators with no passengers go to the furthest waiting floor.
+    idle = ~loaded & (current == target)
+    if idle.any():
+        floors = sim.waiting_floors()
+        if len(floors) > 0:
+            lowest, highest = floors[0], floors[-1]
+            furthest = np.where(current - lowest >= highest - current, lowest, highest)
+            target[idle] = furthest[idle]
+
+
+_MOVING_ALGORITHMS = {
+    a1_algorithms.EndToEndLoop: _end_to_end_loop,
+    a1_algorithms.FurthestFloor: _furthest_floor,
+}
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
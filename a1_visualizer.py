@@ -15,39 +15,45 @@ and in fact you aren't even submitting this file!
 """
 from __future__ import annotations
 from enum import Enum
+import os
 import random
 import time
-from typing import Any
+from typing import Any, Optional, TYPE_CHECKING
 
 import pygame
 
+if TYPE_CHECKING:
+    from a1_entities import Person, Elevator
+    from a1_frames import FrameWriter
+
 
 ###############################################################################
 # Public sprite classes (you need to read these)
 ###############################################################################
-class ElevatorSprite(pygame.sprite.Sprite):
+class ElevatorSprite(pygame.sprite.DirtySprite):
     """Sprite representing an elevator.
 
+    The Visualizer creates one of these for each Elevator it draws; headless
+    simulations never create any.
+
     Instance Attributes:
+    - elevator: the elevator drawn by this sprite
     - image: the Pygame surface on which to draw this sprite
     - rect: the rectangle representing the dimensions of this sprite
-    - passengers:
-        a list of the PersonSprites currently on this elevator
-        NOTE: since Person is a subclass of PersonSprite, you can (and should)
-        add Person objects to this list; see the add_passenger method below
+    - dirty: 1 if this sprite has changed since it was last drawn, and 0 otherwise
     """
+    elevator: Elevator
     image: pygame.Surface
     rect: pygame.Rect
-    passengers: list[PersonSprite]
 
-    def __init__(self) -> None:
-        """Initialize a new ElevatorSprite."""
+    def __init__(self, elevator: Elevator) -> None:
+        """Initialize a new ElevatorSprite for the given elevator."""
         super().__init__()
+        self.elevator = elevator
         self.image = pygame.Surface([ELEVATOR_WIDTH, ELEVATOR_HEIGHT])
         self.image.fill(GREEN)
         self.image.set_colorkey(WHITE)
         self.rect = self.image.get_rect()
-        self.passengers = []
 
     def update(self) -> None:
         """Update this elevator's image based on its fullness."""
@@ -56,63 +62,79 @@ class ElevatorSprite(pygame.sprite.Sprite):
         pygame.draw.rect(self.image, DARK_GREEN,
                          [0, ELEVATOR_HEIGHT * (1 - self.fullness()),
                           ELEVATOR_WIDTH, ELEVATOR_HEIGHT])
-
-    def add_passenger(self, person: PersonSprite) -> None:
-        """Add a passenger to this elevator."""
-        self.passengers.append(person)
+        self.dirty = 1
 
     def fullness(self) -> float:
-        """Return the fraction that this elevator is filled.
+        """Return the fraction that this sprite's elevator is filled.
 
-        The value returned should be a float between 0.0 (completely empty) and
+        The value returned is a float between 0.0 (completely empty) and
         1.0 (completely full).
         """
-        raise NotImplementedError
+        return self.elevator.fullness()
 
 
-class PersonSprite(pygame.sprite.Sprite):
+class PersonSprite(pygame.sprite.DirtySprite):
     """Sprite representing a person.
 
+    The Visualizer creates one of these for each Person it draws; headless
+    simulations never create any.
+
     Instance Attributes:
+    - person: the person drawn by this sprite
     - height: the height of the person sprite
     - width: the width of the person sprite
     - image: the Pygame surface on which to draw this sprite
     - rect: the rectangle representing the dimensions of this sprite
+    - dirty: 1 if this sprite has changed since it was last drawn, and 0 otherwise
 
     Representation Invariants:
     - self.height >= 0
     - self.width >= 0
     """
+    person: Person
     height: int
     width: int
     image: pygame.Surface
     rect: pygame.Rect
+    _anger_level: int
 
-    def __init__(self) -> None:
-        """Initialize a new person sprite."""
+    def __init__(self, person: Person) -> None:
+        """Initialize a new sprite for the given person."""
         super().__init__()
+        self.person = person
         self.width, self.height = PERSON_WIDTH, PERSON_HEIGHT
+        self._anger_level = self.get_anger_level()
         self.image = self.load_image()
         self.rect = self.image.get_rect()
         self.rect.bottom = 0
         self.rect.centerx = random.randint(-2, 2)
 
     def load_image(self) -> Any:
-        """Load the image for this sprite and redraws it
+        """Return the image for this sprite's current anger level.
         Lower indices are happier :)
+
+        The image is shared with every other sprite at the same anger level,
+        so it must not be drawn on.
         """
-        image = pygame.image.load(FIGURES[self.get_anger_level()])
-        return pygame.transform.scale(image, (self.width, self.height))
+        return _get_person_images()[self._anger_level]
+
+    def refresh_image(self) -> None:
+        """Swap this sprite's image if its person's anger level has changed."""
+        anger_level = self.get_anger_level()
+        if anger_level != self._anger_level:
+            self._anger_level = anger_level
+            self.image = self.load_image()
+            self.dirty = 1
 
     def get_anger_level(self) -> int:
-        """Return the anger level of this sprite.
+        """Return the anger level of this sprite's person.
 
         This determines the image used to render this sprite.
 
-        Anger level must be an integer between 0 and 4, inclusive.
+        Anger level is an integer between 0 and 4, inclusive.
         (0 means not at all angry, 4 is very angry)
         """
-        raise NotImplementedError
+        return self.person.get_anger_level()
 
 
 ###############################################################################
@@ -136,6 +158,16 @@ class Direction(Enum):
 class Visualizer:
     """Visualizer for the current state of a simulation.
 
+    Only the parts of the screen that changed are redrawn each frame: every sprite
+    is a DirtySprite, and moving or changing one marks it dirty.
+
+    If the visualizer has a frame writer, it records instead: it hands every frame
+    to the writer, and never throttles, pauses or waits for the window to be closed.
+    It renders offscreen with SDL's dummy video driver, unless Pygame's display has
+    already been initialized, in which case it renders to that display. The
+    SDL_VIDEODRIVER environment variable is only changed while the display is being
+    initialized, so later visualizers without a frame writer open a window as usual.
+
     All attributes of this class are private; you are not responsible for
     understanding them, and they are left undocumented.
     """
@@ -144,16 +176,24 @@ class Visualizer:
     _num_floors: int
     _clock: pygame.time.Clock
     _screen: pygame.Surface
-    _sprite_group: pygame.sprite.Group
-    _stats_group: pygame.sprite.Group
+    _background: pygame.Surface
+    _sprite_group: pygame.sprite.LayeredDirty
+    _stat_line: Optional[_StatLine]
+    _frames: Optional[FrameWriter]
+    _fps: float
+    _elevator_sprites: dict[Elevator, ElevatorSprite]
+    _person_sprites: dict[Person, PersonSprite]
 
     def __init__(self,
-                 elevators: list[ElevatorSprite],
+                 elevators: list[Elevator],
                  num_floors: int,
-                 visualize: bool) -> None:
-        """Initialize this visualization.
+                 visualize: bool,
+                 frames: Optional[FrameWriter] = None) -> None:
+        """Initialize this visualization, recording its frames with the given frame
+        writer if there is one.
 
-        If visualize is False, this instance does nothing.
+        If visualize is False, this instance does nothing: Pygame is never
+        initialized and no sprites are created.
         """
         self._visualize = visualize
         if not self._visualize:
@@ -161,36 +201,57 @@ class Visualizer:
 
         self._num_elevators = len(elevators)
         self._num_floors = num_floors
+        self._frames = frames
+        self._fps = FPS
 
         # pygame stuff
-        pygame.init()
+        if frames is not None and not pygame.display.get_init():
+            driver = os.environ.get('SDL_VIDEODRIVER')
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            pygame.init()
+            if driver is None:
+                del os.environ['SDL_VIDEODRIVER']
+            else:
+                os.environ['SDL_VIDEODRIVER'] = driver
+        else:
+            pygame.init()
         self._clock = pygame.time.Clock()
 
         self._screen = pygame.display.set_mode(
             (WIDTH, self._total_height()), pygame.HWSURFACE | pygame.DOUBLEBUF)
-        self._screen.fill(WHITE)
+        self._background = pygame.Surface(self._screen.get_size())
+        self._background.fill(WHITE)
+        self._screen.blit(self._background, (0, 0))
 
         # Contains all sprites in the simulation
-        self._sprite_group = pygame.sprite.Group()
-        self._stats_group = pygame.sprite.Group()
+        self._sprite_group = pygame.sprite.LayeredDirty()
+        self._sprite_group.clear(self._screen, self._background)
+        self._stat_line = None
+        self._elevator_sprites = {}
+        self._person_sprites = {}
 
         self._setup_sprites(elevators)
         # Initial render.
+        pygame.display.flip()
         self.render()
 
     def render_header(self, round_num: int) -> None:
         """Render text displaying the round number for this simulation."""
         if not self._visualize:
             return
-        self._stats_group.remove(list(self._stats_group))
-        self._stats_group.add(_StatLine(0, f'Round {round_num}'))
-        for sprite in self._sprite_group:
-            if isinstance(sprite, PersonSprite):
-                sprite.image = sprite.load_image()
+        if self._stat_line is not None:
+            self._sprite_group.remove(self._stat_line)
+        self._stat_line = _StatLine(0, f'Round {round_num}')
+        self._sprite_group.add(self._stat_line)
+        for sprite in self._person_sprites.values():
+            sprite.refresh_image()
         self.render()
 
     def render(self) -> None:
         """Draw the current state of the simulation to the screen.
+
+        Only the sprites that are dirty (and anything they overlap, before or after
+        they moved) are redrawn, and only their areas of the screen are updated.
         """
         if not self._visualize:
             return
@@ -198,14 +259,15 @@ class Visualizer:
         # Need this on OSX due to pygame bug
         pygame.event.peek(0)
 
-        self._screen.fill(WHITE)
-        self._sprite_group.draw(self._screen)
-        self._stats_group.draw(self._screen)
-        self._clock.tick(FPS)
-        pygame.display.flip()
+        changed = self._sprite_group.draw(self._screen)
+        if self._frames is not None:
+            self._frames.write(self._screen)
+            return
+        self._clock.tick(self._fps)
+        pygame.display.update(changed)
 
     def show_arrivals(self,
-                      arrivals: dict[int, list[PersonSprite]]) -> None:
+                      arrivals: dict[int, list[Person]]) -> None:
         """Show new arrivals."""
         if not self._visualize:
             return
@@ -214,49 +276,103 @@ class Visualizer:
         for floor, people in arrivals.items():
             y = self._get_y_of_floor(floor)
             for person in people:
-                person.rect.bottom = y
-                person.rect.centerx = x + random.randint(-3, 3)
-                self._sprite_group.add(person)
+                sprite = self._person_sprite(person)
+                sprite.rect.bottom = y
+                sprite.rect.centerx = x + random.randint(-3, 3)
+                sprite.dirty = 1
+                self._sprite_group.add(sprite)
         self.render()
 
-    def show_boarding(self, person: PersonSprite,
-                      elevator: ElevatorSprite) -> None:
+    def show_boarding(self, person: Person,
+                      elevator: Elevator) -> None:
         """Show boarding of the given person onto the given elevator.
 
         Preconditions:
         - the given person is on the same floor as the elevator.
         """
-        if not self._visualize:
-            return
+        self.show_boardings([(person, elevator)])
 
-        from_x = 10
-        target_x = elevator.rect.centerx + random.randint(-3, 3)
+    def show_boardings(self, boardings: list[tuple[Person, Elevator]]) -> None:
+        """Show the boarding of each given person onto the given elevator, all at
+        once.
 
-        for frame in range(21):  # Move in 20 seconds
-            person.rect.centerx = from_x + (target_x - from_x) * frame // 20
-            self.render()
+        Preconditions:
+        - each given person is on the same floor as their elevator.
+        """
+        if not self._visualize or not boardings:
+            return
+
+        moves = []
+        for person, elevator in boardings:
+            elevator_sprite = self._elevator_sprites[elevator]
+            moves.append((self._person_sprite(person), 10,
+                          elevator_sprite.rect.centerx + random.randint(-3, 3)))
+        self._animate_walks(moves)
 
-        elevator.update()
+        for elevator in {elevator for _, elevator in boardings}:
+            self._elevator_sprites[elevator].update()
         self.render()
 
-    def show_disembarking(self, person: PersonSprite,
-                          elevator: ElevatorSprite) -> None:
-        """Show disembarking of the given person from the given elevator."""
-        if not self._visualize:
+    def show_disembarking(self, person: Person,
+                          elevator: Elevator) -> None:
+        """Show disembarking of the given person from the given elevator.
+
+        Preconditions:
+        - the given person has already been removed from elevator.passengers.
+        """
+        self.show_disembarkings([(person, elevator)])
+
+    def show_disembarkings(self, disembarkings: list[tuple[Person, Elevator]]) -> None:
+        """Show the disembarking of each given person from the given elevator, all
+        at once.
+
+        Preconditions:
+        - each given person has already been removed from their elevator's passengers.
+        """
+        if not self._visualize or not disembarkings:
             return
 
-        from_x = person.rect.centerx
-        target_x = WIDTH - 10
+        for elevator in {elevator for _, elevator in disembarkings}:
+            self._elevator_sprites[elevator].update()
 
-        elevator.update()
+        moves = []
+        for person, _ in disembarkings:
+            person_sprite = self._person_sprite(person)
+            moves.append((person_sprite, person_sprite.rect.centerx, WIDTH - 10))
+        self._animate_walks(moves)
 
-        for frame in range(21):  # Move in 20 seconds
-            x = from_x + (target_x - from_x) * frame // 20
-            person.rect.centerx = x
-            self.render()
+        # The sprites stay where they are, but their people's anger levels won't
+        # change again
+        for person, _ in disembarkings:
+            del self._person_sprites[person]
+
+    def show_state(self, elevators: list[Elevator],
+                   waiting: dict[int, list[Person]]) -> None:
+        """Show the given elevators on their current floors, with their passengers,
+        and the given people waiting on each floor, in place of everybody shown so far.
+
+        Preconditions:
+        - elevators are the elevators this visualizer was created with
+        """
+        if not self._visualize:
+            return
+
+        self._sprite_group.remove([sprite for sprite in self._sprite_group.sprites()
+                                   if isinstance(sprite, PersonSprite)])
+        self._person_sprites = {}
+        for elevator in elevators:
+            elevator_sprite = self._elevator_sprites[elevator]
+            elevator_sprite.rect.bottom = self._get_y_of_floor(elevator.current_floor)
+            elevator_sprite.update()
+            for passenger in elevator.passengers:
+                sprite = self._person_sprite(passenger)
+                sprite.rect.bottom = elevator_sprite.rect.bottom
+                sprite.rect.centerx = elevator_sprite.rect.centerx + random.randint(-3, 3)
+                self._sprite_group.add(sprite)
+        self.show_arrivals(waiting)
 
     def show_elevator_moves(self,
-                            elevators: list[ElevatorSprite],
+                            elevators: list[Elevator],
                             directions: list[Direction]) -> None:
         """Show elevator moves. Note that all the elevators move at once."""
         if not self._visualize:
@@ -270,27 +386,44 @@ class Visualizer:
                     step = FLOOR_HEIGHT / 20
                 else:
                     step = 0
-                elevator.rect.bottom += step
-                for passenger in elevator.passengers:
-                    passenger.rect.bottom += step
+                if step:
+                    elevator_sprite = self._elevator_sprites[elevator]
+                    elevator_sprite.rect.bottom += step
+                    elevator_sprite.dirty = 1
+                    for passenger in elevator.passengers:
+                        person_sprite = self._person_sprite(passenger)
+                        person_sprite.rect.bottom += step
+                        person_sprite.dirty = 1
 
             self.render()
 
-    def wait(self, wait_time: int) -> None:
-        """Wait for the specified amount of time, in seconds.
+    def set_speed(self, speed: float) -> None:
+        """Animate speed times as fast as normal.
 
-        Only occurs if self._visualize is True, otherwise there's no need to
-        wait.
+        Preconditions:
+        - speed > 0
         """
         if self._visualize:
+            self._fps = FPS * speed
+
+    def wait(self, wait_time: float) -> None:
+        """Wait for the specified amount of time, in seconds.
+
+        Only occurs if self._visualize is True and frames aren't being recorded,
+        otherwise there's no need to wait.
+        """
+        if self._visualize and self._frames is None:
             time.sleep(wait_time)
 
     def wait_for_exit(self) -> None:
         """Wait until the user exits the pygame window (by pressing the close button).
 
-        Does nothing if self._visualize is False.
+        Does nothing if self._visualize is False. If frames are being recorded, there
+        is no window to close, so this only shuts the display down.
         """
-        if self._visualize:
+        if self._visualize and self._frames is not None:
+            pygame.display.quit()
+        elif self._visualize:
             # This waits for you to close the pygame window (by pressing the "close" button)
             while True:
                 for event in pygame.event.get():
@@ -301,7 +434,25 @@ class Visualizer:
     ###########################################################################
     # Private helper methods (you don't need to worry about these)
     ###########################################################################
-    def _setup_sprites(self, elevators: list[ElevatorSprite]) -> None:
+    def _animate_walks(self, moves: list[tuple[PersonSprite, int, int]]) -> None:
+        """Walk each given sprite from its start x-coordinate to its target
+        x-coordinate, all at the same time, in 20 steps.
+        """
+        for frame in range(21):  # Move in 20 seconds
+            for sprite, from_x, target_x in moves:
+                sprite.rect.centerx = from_x + (target_x - from_x) * frame // 20
+                sprite.dirty = 1
+            self.render()
+
+    def _person_sprite(self, person: Person) -> PersonSprite:
+        """Return the sprite for the given person, creating it on first use."""
+        sprite = self._person_sprites.get(person)
+        if sprite is None:
+            sprite = PersonSprite(person)
+            self._person_sprites[person] = sprite
+        return sprite
+
+    def _setup_sprites(self, elevators: list[Elevator]) -> None:
         """Set up the initial sprites for this visualization.
 
         Position them on the screen and spaces them based on:
@@ -316,11 +467,13 @@ class Visualizer:
             self._sprite_group.add(floor)
 
         for i, elevator in enumerate(elevators):
-            elevator.rect.centerx =\
+            sprite = ElevatorSprite(elevator)
+            sprite.rect.centerx =\
                 (i + 1) * WIDTH // (self._num_elevators + 1)
-            elevator.rect.bottom = self._total_height() - FLOOR_BORDER_HEIGHT
+            sprite.rect.bottom = self._total_height() - FLOOR_BORDER_HEIGHT
 
-            self._sprite_group.add(elevator)
+            self._elevator_sprites[elevator] = sprite
+            self._sprite_group.add(sprite)
 
     def _total_height(self) -> int:
         """Return the screen height for this visualization."""
@@ -365,17 +518,42 @@ FPS = 60
 
 # Images for people
 FIGURES = [f'images/person{i}.png' for i in range(1, 6)]
+_PERSON_IMAGES: list[pygame.Surface] = []
 
-# Fonts
+
+def _get_person_images() -> list[pygame.Surface]:
+    """Return the person images, scaled to size and indexed by anger level.
+
+    The images are loaded from disk the first time this is called and shared by
+    every PersonSprite afterwards.
+    """
+    if not _PERSON_IMAGES:
+        for figure in FIGURES:
+            image = pygame.transform.scale(pygame.image.load(figure),
+                                           (PERSON_WIDTH, PERSON_HEIGHT))
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha()
+            _PERSON_IMAGES.append(image)
+    return _PERSON_IMAGES
+
+
+# Fonts (created by _get_font on first use, so headless runs never initialize Pygame)
 FONT_HEIGHT = 30
-pygame.init()  # Need to call this before creating a new font
-COMIC_SANS = pygame.font.SysFont('Comic Sans MS', FONT_HEIGHT)
+_FONTS: dict[str, pygame.font.Font] = {}
+
+
+def _get_font() -> pygame.font.Font:
+    """Return the font used for all text sprites."""
+    if 'comic_sans' not in _FONTS:
+        pygame.init()  # Need to call this before creating a new font
+        _FONTS['comic_sans'] = pygame.font.SysFont('Comic Sans MS', FONT_HEIGHT)
+    return _FONTS['comic_sans']
 
 
 ###############################################################################
 # Private sprite classes (you don't need to worry about these)
 ###############################################################################
-class _FloorSprite(pygame.sprite.Sprite):
+class _FloorSprite(pygame.sprite.DirtySprite):
     """Sprite that draws a floor of the building.
     """
     def __init__(self, width: int, height: int, y: int) -> None:
@@ -389,26 +567,26 @@ class _FloorSprite(pygame.sprite.Sprite):
         self.rect.top = y
 
 
-class _FloorNum(pygame.sprite.Sprite):
+class _FloorNum(pygame.sprite.DirtySprite):
     """Text Sprite to Label the floor number.
     """
     def __init__(self, floor_y: int, text: str) -> None:
         """Initialize a floor number text sprite."""
         super().__init__()
-        self.floor_font = COMIC_SANS
+        self.floor_font = _get_font()
         self.image = self.floor_font.render(text, True, BLACK)
         self.rect = self.image.get_rect()
         self.rect.bottom = floor_y
         self.rect.right = WIDTH - 20
 
 
-class _StatLine(pygame.sprite.Sprite):
+class _StatLine(pygame.sprite.DirtySprite):
     """Text Sprite for displaying some text.
     """
     def __init__(self, y: int, text: str) -> None:
         """Initialize a text sprite."""
         super().__init__()
-        self.floor_font = COMIC_SANS
+        self.floor_font = _get_font()
         self.image = self.floor_font.render(text, True, BLACK)
         self.rect = self.image.get_rect()
         self.rect.top = y